@@ -1,6 +1,46 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+# Set by wsgi.py and asgi.py. Kept in the process, not in os.environ, so the
+# subprocesses a server starts don't inherit it
+_serving_process = False
+
+
+def mark_serving_process():
+    """Flag this process as a WSGI/ASGI server, call it before the application is loaded"""
+    global _serving_process
+    _serving_process = True
+
+
+def serves_requests():
+    """
+    Whether this process answers HTTP requests: a WSGI/ASGI server (flagged with
+    mark_serving_process) or one of the PREDICTION_WARMUP_COMMANDS of manage.py
+    """
+    if _serving_process:
+        return True
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    return command in getattr(settings, 'PREDICTION_WARMUP_COMMANDS', ['runserver'])
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .utils.warmup import warmup_state, start_warmup_thread, WarmupState
+
+        # migrate, shell, the workers and the pipeline commands never serve a prediction
+        if not getattr(settings, 'PREDICTION_WARMUP', False) or not serves_requests():
+            warmup_state.update(status=WarmupState.DISABLED)
+            return
+
+        # runserver's autoreloader imports the project in a watcher process that never serves
+        if ('runserver' in sys.argv and '--noreload' not in sys.argv
+                and os.environ.get('RUN_MAIN') != 'true'):
+            return
+
+        start_warmup_thread()
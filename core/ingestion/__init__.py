@@ -0,0 +1,13 @@
+from .pipeline import STAGES, IngestionPipeline, StageTimings, fetch_step, load_step, merge_step, settings_data_dir
+from .fetch import EsiosFetcher
+
+__all__ = [
+    'STAGES',
+    'EsiosFetcher',
+    'IngestionPipeline',
+    'StageTimings',
+    'fetch_step',
+    'load_step',
+    'merge_step',
+    'settings_data_dir',
+]
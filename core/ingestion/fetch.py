@@ -0,0 +1,331 @@
+import html
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+import pandas as pd
+import requests
+
+from ..utils.esios import (
+    ESIOS_BASE_ENDPOINT, DATA_TO_DOWNLOAD, EsiosClient, esios_headers, month_date_range, monthly_endpoint
+)
+from ..utils.esios_stream import (
+    compact_values, iter_json_array, read_expanded_chunk, write_chunk, write_yearly_file
+)
+from ..utils.esios_sync import EMPTY_MONTH, EsiosManifest, merge_months_into_yearly_file, month_fingerprint
+from .pipeline import StageTimings, settings_data_dir
+
+# Values used when neither the options nor the Django settings have them
+DEFAULT_OPTIONS = {
+    'ESIOS_DOWNLOAD_WORKERS': 6,
+    'ESIOS_REQUESTS_PER_SECOND': 5.0,
+    'ESIOS_MAX_RETRIES': 5,
+    'ESIOS_SYNC_SETTLE_DAYS': 7,
+    'ESIOS_CHUNK_DIR': None,
+}
+
+
+def _timed_chunks(chunks, waited):
+    """Yield the response chunks, adding the seconds spent waiting for them to waited[0]"""
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        waited[0] += time.perf_counter() - start
+        if chunk is None:
+            return
+        yield chunk
+
+
+class EsiosFetcher:
+    """
+    Fetch and normalize stages of the ingestion pipeline: downloads the ESIOS
+    indicators and the five minute values of every indicator into yearly CSVs
+    of data_dir, parsing each month into compact columns as it arrives.
+
+    DownloadDataView, the download jobs, esios_sync and scripts/download_data.py
+    all run it through IngestionPipeline. Settings come from _option(): `options`
+    first, then the `settings` object given (from_settings() passes the Django
+    ones) and DEFAULT_OPTIONS last. Time waiting on the network goes to the
+    'fetch' stage of self.timings, parsing and writing the files to 'normalize'.
+    """
+
+    def __init__(self, data_dir=None, options=None, timings=None, settings=None, indicators=None):
+        self.data_dir = data_dir
+        self.options = options or {}
+        self.settings = settings
+        self.timings = timings or StageTimings()
+        self.BASE_ENDPOINT = self._option('ESIOS_BASE_ENDPOINT', ESIOS_BASE_ENDPOINT)
+        # category -> indicator ids to download, every one of DATA_TO_DOWNLOAD by default
+        self.DATA_TO_DOWNLOAD = DATA_TO_DOWNLOAD if indicators is None else indicators
+        self.client = None
+
+    @classmethod
+    def from_settings(cls, options=None, timings=None):
+        """Fetcher into the project's data directory, configured from the Django settings unless options override them"""
+        # Imported here so scripts can use the fetcher without Django
+        from django.conf import settings
+
+        return cls(settings_data_dir(), options, timings, settings=settings)
+
+    def _option(self, name, default=None):
+        if name in self.options:
+            return self.options[name]
+        if self.settings is not None and hasattr(self.settings, name):
+            return getattr(self.settings, name)
+        return DEFAULT_OPTIONS.get(name, default)
+
+    def _get_headers(self, token):
+        """Get API headers with the provided token"""
+        return esios_headers(token)
+
+    def _get_client(self, headers):
+        """Pooled, rate limited client shared by every request of this download"""
+        if self.client is None or self.client.headers != headers:
+            self.client = EsiosClient(
+                headers,
+                max_workers=self._option('ESIOS_DOWNLOAD_WORKERS'),
+                requests_per_second=self._option('ESIOS_REQUESTS_PER_SECOND'),
+                max_retries=self._option('ESIOS_MAX_RETRIES'),
+            )
+        return self.client
+
+    def _get_data_dir(self):
+        return self.data_dir
+
+    def _get_indicators(self, headers):
+        """Get all available indicators from the API."""
+        try:
+            with self.timings.measure('fetch'):
+                response_data = self._get_client(headers).get_json(self.BASE_ENDPOINT)
+
+            with self.timings.measure('normalize'):
+                return (pd
+                        .json_normalize(data=response_data['indicators'], errors='ignore')
+                        .assign(description=lambda df_: df_.apply(
+                            lambda df__: html.unescape(df__['description']
+                                                       .replace('</p>', '')
+                                                       .replace('<p>', '')
+                                                       .replace('<b>', '')
+                                                       .replace('</b>', ''))
+                            if isinstance(df__['description'], str) else df__['description'],
+                            axis=1)
+                        ))
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to fetch indicators: {str(e)}")
+
+    def _get_data_by_id_month(self, indicator_id, year, month, headers):
+        """Get data for a specific indicator by ID for a given month."""
+        start_date, end_date = month_date_range(year, month, datetime.today())
+        endpoint = monthly_endpoint(self.BASE_ENDPOINT, indicator_id, start_date, end_date)
+
+        start, waited = time.perf_counter(), [0.0]
+        try:
+            # The values are parsed as they arrive into compact columns, the JSON is never held whole
+            chunks = _timed_chunks(self._get_client(headers).iter_content(endpoint), waited)
+            return compact_values(iter_json_array(chunks, 'values'))
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to fetch data for indicator {indicator_id}: {str(e)}")
+        finally:
+            # Waiting for the response is fetching, parsing it as it arrives is the rest of the call
+            self.timings.add('fetch', waited[0])
+            self.timings.add('normalize', max(time.perf_counter() - start - waited[0], 0.0))
+
+    def _download_month(self, indicator_id, year, month, headers, chunk_dir):
+        """Download a month into a chunk file of chunk_dir. Returns (path, fingerprint), None if it's empty"""
+        monthly_data = self._get_data_by_id_month(indicator_id, year, month, headers)
+        if monthly_data.empty:
+            return None
+
+        with self.timings.measure('normalize'):
+            chunk_path = os.path.join(chunk_dir, f"{indicator_id}_{year}_{month:02d}.npz")
+            write_chunk(monthly_data, chunk_path)
+            return chunk_path, month_fingerprint(monthly_data)
+
+    def _save_data(self, data, file_path):
+        """Save DataFrame to CSV file."""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        data.to_csv(file_path, index=False)
+
+    def _save_chunks(self, chunk_paths, file_path):
+        """Save month chunks, in order, as one CSV file."""
+        write_yearly_file(file_path, chunk_paths)
+
+    def plan_download(self, data_dir, years_back=5, sync=False, since=None, manifest=None, today=None):
+        """
+        Months a download would request: (category, indicator_id, year, months,
+        skipped) for every indicator and year. Future months are left out, and so
+        are the months before `since` (a date). A sync also leaves out the months
+        the manifest has as closed, they're counted in skipped.
+        """
+        today = today or datetime.today()
+        if manifest is None:
+            manifest = EsiosManifest.load(data_dir)
+        settle_days = self._option('ESIOS_SYNC_SETTLE_DAYS')
+
+        start_year = (today - timedelta(days=years_back * 365)).year
+        if since is not None:
+            start_year = max(start_year, since.year)
+
+        plan = []
+        for category, indicator_ids in self.DATA_TO_DOWNLOAD.items():
+            for indicator_id in indicator_ids:
+                for year in range(start_year, today.year + 1):
+                    months = [month for month in range(1, 13)
+                              if not (year == today.year and month > today.month)
+                              and (since is None or (year, month) >= (since.year, since.month))]
+                    skipped = 0
+                    if sync:
+                        # A sync only asks for the months the manifest doesn't have as closed
+                        file_path = os.path.join(data_dir, category, f"{indicator_id}_{year}.csv")
+                        wanted = manifest.months_to_fetch(indicator_id, year, months, file_path, settle_days)
+                        skipped = len(months) - len(wanted)
+                        months = wanted
+                    plan.append((category, indicator_id, year, months, skipped))
+        return plan
+
+    def run_download(self, token, download_indicators=True, years_back=5, sync=False, progress=None, since=None):
+        """
+        Download the indicators and the monthly data of every indicator into the
+        data directory and return the results. progress, a DownloadProgress, gets
+        the planned months and every finished one. since (a date) leaves out the
+        months before it.
+        """
+        headers = self._get_headers(token)
+        data_dir = self._get_data_dir()
+
+        os.makedirs(data_dir, exist_ok=True)
+
+        results = {
+            'message': 'Data download completed',
+            'data_directory': data_dir,
+            'mode': 'sync' if sync else 'full',
+            'downloaded_files': [],
+            'fetched_months': 0,
+            'skipped_months': 0,
+            'errors': []
+        }
+
+        # One pooled client for the indicators and every month, closed however the run ends
+        client = self._get_client(headers)
+        try:
+            if progress is not None:
+                progress.client = client
+
+            if download_indicators:
+                if progress is not None:
+                    progress.stage('indicators')
+                try:
+                    indicators = self._get_indicators(headers)
+                    indicators_path = os.path.join(data_dir, "indicators.csv")
+                    self._save_data(indicators, indicators_path)
+                    results['downloaded_files'].append('indicators.csv')
+                except Exception as e:
+                    results['errors'].append(f"Failed to download indicators: {str(e)}")
+
+            today = datetime.today()
+            manifest = EsiosManifest.load(data_dir)
+            plan = self.plan_download(data_dir, years_back, sync, since, manifest, today)
+
+            # Every month of every indicator is queued at once, the client bounds the
+            # parallelism and the request rate. Months are spilled to chunk files as they
+            # arrive and years are written from them in order, one month in memory at a time
+            if progress is not None:
+                progress.stage('downloading')
+            chunk_dir = tempfile.mkdtemp(prefix='esios-', dir=self._option('ESIOS_CHUNK_DIR'))
+            with ThreadPoolExecutor(max_workers=client.max_workers) as executor:
+                yearly_downloads = []
+                for category, indicator_id, year, year_months, skipped in plan:
+                    category_dir = os.path.join(data_dir, category)
+                    os.makedirs(category_dir, exist_ok=True)
+                    file_name = f"{indicator_id}_{year}.csv"
+                    results['skipped_months'] += skipped
+                    if progress is not None:
+                        progress.plan(category, indicator_id, year, year_months, skipped)
+                    if not year_months:
+                        continue
+
+                    futures = []
+                    for month in year_months:
+                        future = executor.submit(
+                            self._download_month, indicator_id, year, month, headers, chunk_dir)
+                        if progress is not None:
+                            future.add_done_callback(
+                                lambda f, indicator_id=indicator_id, year=year, month=month:
+                                progress.month_finished(indicator_id, year, month, f.exception()))
+                        futures.append((month, future))
+                    yearly_downloads.append((category, category_dir, indicator_id, year, file_name, futures))
+
+                try:
+                    for category, category_dir, indicator_id, year, file_name, futures in yearly_downloads:
+                        yearly_chunks = {}
+                        empty_months = []
+                        for month, future in futures:
+                            try:
+                                if progress is not None:
+                                    progress.wait(future)
+                                downloaded = future.result()
+
+                                if downloaded is not None:
+                                    yearly_chunks[month] = downloaded
+                                else:
+                                    empty_months.append(month)
+
+                            except Exception as e:
+                                results['errors'].append(
+                                    f"Error downloading indicator {indicator_id} "
+                                    f"for {year}-{month:02d}: {str(e)}")
+                        futures.clear()
+
+                        # Combine and save yearly data
+                        if yearly_chunks:
+                            try:
+                                file_path = os.path.join(category_dir, file_name)
+                                fingerprints = {month: fingerprint for month, (_, fingerprint) in yearly_chunks.items()}
+                                with self.timings.measure('normalize'):
+                                    if sync:
+                                        # Months that came back identical leave the file alone
+                                        if any(manifest.changed(indicator_id, year, month, fingerprint)
+                                               for month, fingerprint in fingerprints.items()):
+                                            # Each month is read from its chunk when it is written
+                                            merge_months_into_yearly_file(file_path, year, {
+                                                month: partial(read_expanded_chunk, chunk_path)
+                                                for month, (chunk_path, _) in yearly_chunks.items()
+                                            })
+                                            results['downloaded_files'].append(f"{category}/{file_name}")
+                                    else:
+                                        self._save_chunks([yearly_chunks[month][0] for month in sorted(yearly_chunks)],
+                                                          file_path)
+                                        results['downloaded_files'].append(f"{category}/{file_name}")
+                                        manifest.forget_year(indicator_id, year)
+
+                                for month, fingerprint in fingerprints.items():
+                                    manifest.record(indicator_id, year, month, fingerprint, today)
+                                results['fetched_months'] += len(yearly_chunks)
+                            except Exception as e:
+                                results['errors'].append(
+                                    f"Failed to download indicator {indicator_id} "
+                                    f"in category {category}: {str(e)}")
+                            finally:
+                                for chunk_path, _ in yearly_chunks.values():
+                                    os.remove(chunk_path)
+
+                        # Empty months are recorded too, so a closed one isn't asked for on every sync
+                        for month in empty_months:
+                            manifest.record(indicator_id, year, month, EMPTY_MONTH, today)
+                        results['fetched_months'] += len(empty_months)
+                finally:
+                    # Also drops the chunks of the months still running when something failed
+                    executor.shutdown(wait=True)
+                    shutil.rmtree(chunk_dir, ignore_errors=True)
+        finally:
+            client.close()
+        manifest.save()
+        if progress is not None:
+            progress.flush(force=True)
+
+        return results
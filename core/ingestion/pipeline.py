@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ..utils.dataset_merge import MERGED_DATASET_NAME, SELECTED_GEO, build_merged_dataset
+
+# The stages every timing is reported under, in pipeline order
+STAGES = ('fetch', 'normalize', 'resample', 'merge', 'load')
+
+
+class StageTimings:
+    """
+    Seconds spent in each stage of an ingestion run. Threads add to it
+    concurrently, so a stage that runs on several of them can add up to more
+    than the wall clock. Every hook is called with (stage, seconds) for each
+    measurement, as it's taken.
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    def get(self, stage):
+        with self._lock:
+            return self.seconds.get(stage, 0.0)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def as_dict(self):
+        """Seconds per stage, in pipeline order"""
+        with self._lock:
+            return {stage: self.seconds[stage] for stage in sorted(self.seconds, key=_stage_order)}
+
+
+def settings_data_dir():
+    """BASE_DIR/data, the data directory the views, jobs and commands work on"""
+    from django.conf import settings
+
+    return os.path.join(getattr(settings, 'BASE_DIR', os.getcwd()), 'data')
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def fetch_step(pipeline, token=None, download_indicators=True, years_back=5, sync=False, progress=None,
+               since=None, **options):
+    """Download the ESIOS data into the data directory, needs the pipeline's fetcher and a token"""
+    if pipeline.fetcher is None or not token:
+        raise ValueError("Fetching needs an EsiosFetcher and an ESIOS token")
+    pipeline.fetcher.timings = pipeline.timings
+    return pipeline.fetcher.run_download(token, download_indicators, years_back, sync, progress, since=since)
+
+
+def merge_step(pipeline, workers=1, selected_geo=SELECTED_GEO, full=False, since=None, dry_run=False, **options):
+    """Merge the downloaded CSVs into merged_dataset.csv, see build_merged_dataset()"""
+    result = build_merged_dataset(pipeline.data_dir, workers=workers, selected_geo=selected_geo, full=full,
+                                  since=since, dry_run=dry_run)
+    timings = result['timings']
+    pipeline.timings.add('resample', timings.get('read_resample', 0.0))
+    pipeline.timings.add('merge', sum(seconds for stage, seconds in timings.items() if stage != 'read_resample'))
+    return result
+
+
+def load_step(pipeline, csv_path=None, batch_size=None, since=None, **options):
+    """Upsert the merged dataset (its hours from since on, when given) into TimeSeriesData, returns the rows in the table"""
+    # Django models are only needed by this stage, scripts can run the others without them
+    from ..utils.training import populate_database_from_csv
+
+    with pipeline.timings.measure('load'):
+        return populate_database_from_csv(csv_path or pipeline.merged_file, batch_size, since=since)
+
+
+class IngestionPipeline:
+    """
+    fetch -> normalize -> resample -> merge -> load over a data directory.
+
+    Steps are callables taking the pipeline and the run options: 'fetch' downloads
+    the ESIOS files (fetching and normalizing them), 'merge' resamples and merges
+    them into merged_dataset.csv and 'load' puts that into the database. Any
+    step can be replaced, or new ones added, through `steps`. Every step reports
+    the time of its stages to self.timings, whose hooks see them as they happen.
+    """
+
+    DEFAULT_STEPS = (('fetch', fetch_step), ('merge', merge_step), ('load', load_step))
+
+    def __init__(self, data_dir, fetcher=None, steps=None, timing_hooks=None):
+        self.data_dir = data_dir
+        self.fetcher = fetcher
+        self.steps = dict(self.DEFAULT_STEPS)
+        self.steps.update(steps or {})
+        self.timings = StageTimings(timing_hooks)
+
+    @property
+    def merged_file(self):
+        return os.path.join(self.data_dir, MERGED_DATASET_NAME)
+
+    def run(self, steps=None, **options):
+        """
+        Run the given steps (every one by default) in order with the options as
+        keyword arguments. Returns {step: result} plus the timings of the run
+        under 'timings'. A failing step stops the run.
+        """
+        results = {}
+        for name in steps or self.steps:
+            results[name] = self.steps[name](self, **options)
+        results['timings'] = self.timings.as_dict()
+        return results
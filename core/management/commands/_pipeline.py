@@ -0,0 +1,48 @@
+import argparse
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+
+def parse_since(value):
+    """--since YYYY-MM-DD as midnight UTC"""
+    try:
+        return datetime.combine(date.fromisoformat(value), time.min, tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a YYYY-MM-DD date")
+
+
+class PipelineCommand(BaseCommand):
+    """
+    Base of the commands running the heavy pipeline stages outside the web tier:
+    --workers, --since and --dry-run, plus the throughput report they print.
+    Subclasses without a parallel stage set workers_help to None. Help texts are in
+    English like the workers', the results they print in Spanish like the API's.
+    """
+
+    workers_help = 'Parallel processes or threads (defaults to the settings value)'
+    since_help = 'Only from this date on (YYYY-MM-DD, UTC)'
+
+    def add_arguments(self, parser):
+        if self.workers_help:
+            parser.add_argument('--workers', type=int, default=None, help=self.workers_help)
+        parser.add_argument('--since', type=parse_since, default=None, help=self.since_help)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show what would be done without downloading, writing or training anything')
+
+    def report(self, count, unit, seconds, detail=None):
+        """One line with a count, the time it took and the rate"""
+        rate = count / seconds if seconds > 0 else 0.0
+        line = f'✓ {count:,} {unit} en {seconds:.2f}s ({rate:,.1f} {unit}/s)'
+        if detail:
+            line += f', {detail}'
+        self.stdout.write(self.style.SUCCESS(line))
+
+    def report_timings(self, timings):
+        """Seconds per pipeline stage"""
+        if timings:
+            self.stdout.write('  ' + ' · '.join(f'{stage} {seconds:.2f}s' for stage, seconds in timings.items()))
+
+    def report_errors(self, errors):
+        for error in errors or []:
+            self.stderr.write(f'  {error}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.utils.download_jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run the ESIOS downloads queued through POST /data/download/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Run every queued job and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        jobs_run = run_worker(
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f'{jobs_run} trabajo(s) ejecutado(s)'))
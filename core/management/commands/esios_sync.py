@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.management.base import CommandError
+
+from core.ingestion import EsiosFetcher, IngestionPipeline
+from ._pipeline import PipelineCommand
+
+
+class Command(PipelineCommand):
+    help = 'Download the ESIOS months missing from data/ or still open, like POST /data/download/ with sync'
+
+    workers_help = 'Simultaneous requests to ESIOS (defaults to ESIOS_DOWNLOAD_WORKERS)'
+    since_help = 'Only the months from this date on (YYYY-MM-DD)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--token', default=os.getenv('TOKEN_ESIOS'),
+                            help='ESIOS API token (defaults to TOKEN_ESIOS)')
+        parser.add_argument('--years-back', type=int, default=5, help='Number of years back to download')
+        parser.add_argument('--full', action='store_true',
+                            help='Download every month, not only the missing or still open ones')
+        parser.add_argument('--no-indicators', action='store_true', help='Skip downloading the indicators list')
+
+    def handle(self, *args, **options):
+        fetcher = EsiosFetcher.from_settings({'ESIOS_DOWNLOAD_WORKERS': options['workers']} if options['workers'] else None)
+        data_dir = fetcher.data_dir
+        sync = not options['full']
+
+        if options['dry_run']:
+            plan = fetcher.plan_download(data_dir, options['years_back'], sync, options['since'])
+            for category, indicator_id, year, months, skipped in plan:
+                if months:
+                    self.stdout.write(f'{category}/{indicator_id}_{year}: {", ".join(f"{m:02d}" for m in months)}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{sum(len(months) for *_, months, _ in plan)} mes(es) por descargar, '
+                f'{sum(skipped for *_, skipped in plan)} ya cerrado(s)'))
+            return
+
+        if not options['token']:
+            raise CommandError('Falta el token de ESIOS: usa --token o TOKEN_ESIOS')
+
+        pipeline = IngestionPipeline(data_dir, fetcher)
+        start = time.perf_counter()
+        results = pipeline.run(['fetch'], token=options['token'], download_indicators=not options['no_indicators'],
+                               years_back=options['years_back'], sync=sync, since=options['since'])
+        seconds = time.perf_counter() - start
+        download = results['fetch']
+
+        megabytes = fetcher.client.bytes_received / 2 ** 20 if fetcher.client is not None else 0.0
+        self.report(download['fetched_months'], 'meses', seconds,
+                    f'{megabytes:.1f} MB ({megabytes / max(seconds, 1e-9):.2f} MB/s), '
+                    f'{download["skipped_months"]} omitido(s), {len(download["downloaded_files"])} archivo(s) escritos')
+        self.report_timings(results['timings'])
+        self.report_errors(download['errors'])
+        if download['errors'] and not download['downloaded_files']:
+            raise CommandError('La descarga falló')
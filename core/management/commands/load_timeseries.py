@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from core.ingestion import IngestionPipeline
+from core.utils.columnar_dataset import read_dataset
+from core.utils.training import since_timestamp
+from ._pipeline import PipelineCommand
+
+
+class Command(PipelineCommand):
+    help = 'Upsert the merged dataset into TimeSeriesData, the load stage POST /train/ runs with populate_database'
+
+    # The upsert runs in a single transaction on one connection
+    workers_help = None
+    since_help = 'Only the hours from this date on (YYYY-MM-DD, UTC)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--csv', default=None, help='Dataset to load (defaults to TIME_SERIES_CSV_PATH)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per executemany (defaults to TIME_SERIES_LOAD_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        csv_path = options['csv'] or getattr(settings, 'TIME_SERIES_CSV_PATH', None)
+        if not csv_path or not os.path.exists(csv_path):
+            raise CommandError(f'No se ha encontrado el dataset: {csv_path}')
+
+        TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+        if options['dry_run']:
+            df = read_dataset(csv_path)
+            if options['since'] is not None:
+                df = df[df['datetime_utc'] >= since_timestamp(options['since'])]
+            existing = TimeSeriesData.objects.filter(
+                datetime_utc__range=(df['datetime_utc'].min(), df['datetime_utc'].max())).count() if len(df) else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(df):,} fila(s) por cargar, {existing:,} ya en la tabla en ese rango'))
+            return
+
+        before = TimeSeriesData.objects.count()
+        pipeline = IngestionPipeline(os.path.dirname(csv_path))
+        start = time.perf_counter()
+        try:
+            results = pipeline.run(['load'], csv_path=csv_path, batch_size=options['batch_size'],
+                                   since=options['since'])
+        except Exception as e:
+            raise CommandError(str(e))
+        seconds = time.perf_counter() - start
+
+        # populate_database_from_csv prints the rows loaded per second
+        total = results['load']
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} filas en la tabla ({total - before:,} nuevas) en {seconds:.2f}s'))
+        self.report_timings(results['timings'])
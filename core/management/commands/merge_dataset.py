@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from core.ingestion import IngestionPipeline, settings_data_dir
+from core.utils.dataset_merge import SELECTED_GEO
+from ._pipeline import PipelineCommand
+
+
+class Command(PipelineCommand):
+    help = 'Merge the downloaded CSVs into data/merged_dataset.csv, like POST /data/merge/'
+
+    workers_help = 'Processes reading the CSVs (defaults to MERGE_WORKERS)'
+    since_help = 'Also recompute the hours from this date on (YYYY-MM-DD), even if their files did not change'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--full', action='store_true', help='Merge every file again instead of only the changed ones')
+
+    def handle(self, *args, **options):
+        data_dir = settings_data_dir()
+        if not os.path.exists(data_dir):
+            raise CommandError(f'Directorio de datos no encontrado: {data_dir}. Descarga los datos primero.')
+
+        workers = options['workers'] or getattr(settings, 'MERGE_WORKERS', 1)
+        start = time.perf_counter()
+        results = IngestionPipeline(data_dir).run(
+            ['merge'], workers=workers, selected_geo=SELECTED_GEO, full=options['full'],
+            since=options['since'], dry_run=options['dry_run'])
+        seconds = time.perf_counter() - start
+        merge = results['merge']
+
+        if options['dry_run']:
+            for path in merge['processed_files']:
+                self.stdout.write(os.path.relpath(path, data_dir))
+            self.stdout.write(self.style.SUCCESS(
+                f"Unión {merge['mode']}: {len(merge['processed_files'])} archivo(s) por leer"))
+            return
+
+        self.report_errors(merge['errors'])
+        merged = merge['merged']
+        if merged is None or merged.empty:
+            raise CommandError('No se han encontrado datos validos para construir el dataset de entrenamiento')
+
+        megabytes = sum(os.path.getsize(path) for path in merge['processed_files'] if os.path.exists(path)) / 2 ** 20
+        self.report(len(merge['processed_files']), 'archivos', seconds,
+                    f"{megabytes:.1f} MB leídos ({megabytes / max(seconds, 1e-9):.2f} MB/s), "
+                    f"{len(merged):,} filas x {len(merged.columns) - 1} columnas, unión {merge['mode']}")
+        self.report_timings(results['timings'])
+        self.stdout.write(f"  {merge['output_file']}")
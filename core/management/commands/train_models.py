@@ -0,0 +1,53 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from core.utils.columnar_dataset import read_dataset
+from core.utils.training import NoTrainingDataError, run_training, since_timestamp
+from ._pipeline import PipelineCommand
+
+
+class Command(PipelineCommand):
+    help = 'Train and publish every model in this process, what the training worker runs for POST /train/'
+
+    workers_help = 'Parallel training processes (defaults to TRAINING_WORKERS)'
+    since_help = 'Train only on the hours from this date on (YYYY-MM-DD, UTC)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--populate-database', action='store_true',
+                            help='Also load the dataset into the database')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            csv_path = getattr(settings, 'TIME_SERIES_CSV_PATH', None)
+            if not csv_path or not os.path.exists(csv_path):
+                raise CommandError(f'No se ha encontrado el dataset: {csv_path}')
+            df = read_dataset(csv_path)
+            if options['since'] is not None:
+                df = df[df['datetime_utc'] >= since_timestamp(options['since'])]
+            n = len(df)
+            # The 60/20/20 split of TimeSeriesPredictor.load_data_from_csv
+            self.stdout.write(self.style.SUCCESS(
+                f'{n:,} filas x {len(df.columns) - 1} columnas: {int(n * 0.6):,} entrenamiento, '
+                f'{int(n * 0.8) - int(n * 0.6):,} validación, {n - int(n * 0.8):,} test'))
+            return
+
+        start = time.perf_counter()
+        try:
+            result = run_training(
+                populate_database=options['populate_database'],
+                report_stage=lambda stage: self.stdout.write(f'→ {stage}'),
+                workers=options['workers'],
+                since=options['since'],
+            )
+        except NoTrainingDataError as e:
+            raise CommandError(str(e))
+        seconds = time.perf_counter() - start
+
+        for name, performance in result['performance'].items():
+            self.stdout.write(f'  {name}: {performance}')
+        self.report(result['training_rows'], 'filas', seconds,
+                    f"{len(result['models_saved'])} modelo(s) publicados")
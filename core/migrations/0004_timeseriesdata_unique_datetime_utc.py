@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:09
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_hours(apps, schema_editor):
+    """Keep the most recently loaded row (highest id) of every datetime_utc"""
+    TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+    latest_ids = (
+        TimeSeriesData.objects.order_by()
+        .values('datetime_utc')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    TimeSeriesData.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_trainingjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_hours, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timeseriesdata',
+            name='datetime_utc',
+            field=models.DateTimeField(unique=True),
+        ),
+    ]
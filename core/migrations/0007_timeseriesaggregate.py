@@ -0,0 +1,143 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:19
+
+import pandas as pd
+from django.db import migrations, models
+
+# The schema of this migration, frozen: later changes to core.utils.rollups don't apply here
+FEATURES = [
+    'hydraulic_71', 'hydraulic_36', 'hydraulic_1', 'solar_14', 'wind_12',
+    'nuclear_39', 'nuclear_4', 'nuclear_74', 'peninsula_forecast_460',
+    'scheduled_demand_365', 'scheduled_demand_358', 'scheduled_demand_372',
+    'daily_spot_market_600_España', 'daily_spot_market_600_Portugal',
+    'average_demand_price_573_Baleares', 'average_demand_price_573_Canarias',
+    'average_demand_price_573_Ceuta', 'average_demand_price_573_Melilla',
+]
+
+
+def build_rollups(apps, schema_editor):
+    """Aggregates of the hours loaded before the table existed"""
+    TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+    TimeSeriesAggregate = apps.get_model('core', 'TimeSeriesAggregate')
+
+    frame = pd.DataFrame(list(TimeSeriesData.objects.values_list('datetime_utc', *FEATURES)),
+                         columns=['datetime_utc'] + FEATURES)
+    if frame.empty:
+        return
+    datetimes = pd.DatetimeIndex(pd.to_datetime(frame['datetime_utc'], utc=True))
+    frame = frame[FEATURES].astype('float64')
+    days = datetimes.floor('D')
+    # UTC days, ISO weeks from Monday and months
+    period_starts = {
+        'day': days,
+        'week': days - pd.to_timedelta(days.weekday, unit='D'),
+        'month': days - pd.to_timedelta(days.day - 1, unit='D'),
+    }
+
+    for resolution, starts in period_starts.items():
+        grouped = frame.groupby(starts)
+        stats = {'min': grouped.min(), 'max': grouped.max(), 'mean': grouped.mean(), 'sum': grouped.sum(min_count=1)}
+        result = pd.DataFrame({'hours': grouped.size()})
+        for name in FEATURES:
+            for stat, values in stats.items():
+                result[f'{name}_{stat}'] = values[name]
+        result = result.astype(object).where(result.notna(), None)
+        TimeSeriesAggregate.objects.bulk_create([
+            TimeSeriesAggregate(resolution=resolution, period_start=period.to_pydatetime(), **row)
+            for period, row in zip(result.index, result.to_dict('records'))
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_downloadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateTimeField()),
+                ('hours', models.IntegerField(default=0)),
+                ('hydraulic_71_min', models.FloatField(blank=True, null=True)),
+                ('hydraulic_71_max', models.FloatField(blank=True, null=True)),
+                ('hydraulic_71_mean', models.FloatField(blank=True, null=True)),
+                ('hydraulic_71_sum', models.FloatField(blank=True, null=True)),
+                ('hydraulic_36_min', models.FloatField(blank=True, null=True)),
+                ('hydraulic_36_max', models.FloatField(blank=True, null=True)),
+                ('hydraulic_36_mean', models.FloatField(blank=True, null=True)),
+                ('hydraulic_36_sum', models.FloatField(blank=True, null=True)),
+                ('hydraulic_1_min', models.FloatField(blank=True, null=True)),
+                ('hydraulic_1_max', models.FloatField(blank=True, null=True)),
+                ('hydraulic_1_mean', models.FloatField(blank=True, null=True)),
+                ('hydraulic_1_sum', models.FloatField(blank=True, null=True)),
+                ('solar_14_min', models.FloatField(blank=True, null=True)),
+                ('solar_14_max', models.FloatField(blank=True, null=True)),
+                ('solar_14_mean', models.FloatField(blank=True, null=True)),
+                ('solar_14_sum', models.FloatField(blank=True, null=True)),
+                ('wind_12_min', models.FloatField(blank=True, null=True)),
+                ('wind_12_max', models.FloatField(blank=True, null=True)),
+                ('wind_12_mean', models.FloatField(blank=True, null=True)),
+                ('wind_12_sum', models.FloatField(blank=True, null=True)),
+                ('nuclear_39_min', models.FloatField(blank=True, null=True)),
+                ('nuclear_39_max', models.FloatField(blank=True, null=True)),
+                ('nuclear_39_mean', models.FloatField(blank=True, null=True)),
+                ('nuclear_39_sum', models.FloatField(blank=True, null=True)),
+                ('nuclear_4_min', models.FloatField(blank=True, null=True)),
+                ('nuclear_4_max', models.FloatField(blank=True, null=True)),
+                ('nuclear_4_mean', models.FloatField(blank=True, null=True)),
+                ('nuclear_4_sum', models.FloatField(blank=True, null=True)),
+                ('nuclear_74_min', models.FloatField(blank=True, null=True)),
+                ('nuclear_74_max', models.FloatField(blank=True, null=True)),
+                ('nuclear_74_mean', models.FloatField(blank=True, null=True)),
+                ('nuclear_74_sum', models.FloatField(blank=True, null=True)),
+                ('peninsula_forecast_460_min', models.FloatField(blank=True, null=True)),
+                ('peninsula_forecast_460_max', models.FloatField(blank=True, null=True)),
+                ('peninsula_forecast_460_mean', models.FloatField(blank=True, null=True)),
+                ('peninsula_forecast_460_sum', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_365_min', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_365_max', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_365_mean', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_365_sum', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_358_min', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_358_max', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_358_mean', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_358_sum', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_372_min', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_372_max', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_372_mean', models.FloatField(blank=True, null=True)),
+                ('scheduled_demand_372_sum', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_España_min', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_España_max', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_España_mean', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_España_sum', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_Portugal_min', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_Portugal_max', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_Portugal_mean', models.FloatField(blank=True, null=True)),
+                ('daily_spot_market_600_Portugal_sum', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Baleares_min', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Baleares_max', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Baleares_mean', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Baleares_sum', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Canarias_min', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Canarias_max', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Canarias_mean', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Canarias_sum', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Ceuta_min', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Ceuta_max', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Ceuta_mean', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Ceuta_sum', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Melilla_min', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Melilla_max', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Melilla_mean', models.FloatField(blank=True, null=True)),
+                ('average_demand_price_573_Melilla_sum', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['resolution', 'period_start'],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'period_start'), name='unique_aggregate_period')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
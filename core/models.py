@@ -1,7 +1,8 @@
 from django.db import models
 
 class TimeSeriesData(models.Model):
-    datetime_utc = models.DateTimeField()
+    # One row per hour, loads upsert on it
+    datetime_utc = models.DateTimeField(unique=True)
 
     hydraulic_71 = models.FloatField(null=True, blank=True)
     hydraulic_36 = models.FloatField(null=True, blank=True)
@@ -32,6 +33,121 @@ class TimeSeriesData(models.Model):
     class Meta:
         ordering = ['datetime_utc']
 
+# Statistics TimeSeriesAggregate keeps for every TimeSeriesData feature
+ROLLUP_STATS = ('min', 'max', 'mean', 'sum')
+
+
+class TimeSeriesAggregate(models.Model):
+    """
+    Rollup of the TimeSeriesData hours of one UTC day, ISO week or month: a
+    <feature>_<stat> column per feature and ROLLUP_STATS, over its non-null values.
+    A feature added to TimeSeriesData needs its four columns here too.
+    Every load recomputes the periods it touched, see core.utils.rollups.
+    """
+    RESOLUTION_DAY = 'day'
+    RESOLUTION_WEEK = 'week'
+    RESOLUTION_MONTH = 'month'
+    RESOLUTION_CHOICES = [
+        (RESOLUTION_DAY, 'Day'),
+        (RESOLUTION_WEEK, 'Week'),
+        (RESOLUTION_MONTH, 'Month'),
+    ]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    period_start = models.DateTimeField()
+    # TimeSeriesData rows in the period
+    hours = models.IntegerField(default=0)
+
+    hydraulic_71_min = models.FloatField(null=True, blank=True)
+    hydraulic_71_max = models.FloatField(null=True, blank=True)
+    hydraulic_71_mean = models.FloatField(null=True, blank=True)
+    hydraulic_71_sum = models.FloatField(null=True, blank=True)
+    hydraulic_36_min = models.FloatField(null=True, blank=True)
+    hydraulic_36_max = models.FloatField(null=True, blank=True)
+    hydraulic_36_mean = models.FloatField(null=True, blank=True)
+    hydraulic_36_sum = models.FloatField(null=True, blank=True)
+    hydraulic_1_min = models.FloatField(null=True, blank=True)
+    hydraulic_1_max = models.FloatField(null=True, blank=True)
+    hydraulic_1_mean = models.FloatField(null=True, blank=True)
+    hydraulic_1_sum = models.FloatField(null=True, blank=True)
+
+    solar_14_min = models.FloatField(null=True, blank=True)
+    solar_14_max = models.FloatField(null=True, blank=True)
+    solar_14_mean = models.FloatField(null=True, blank=True)
+    solar_14_sum = models.FloatField(null=True, blank=True)
+
+    wind_12_min = models.FloatField(null=True, blank=True)
+    wind_12_max = models.FloatField(null=True, blank=True)
+    wind_12_mean = models.FloatField(null=True, blank=True)
+    wind_12_sum = models.FloatField(null=True, blank=True)
+
+    nuclear_39_min = models.FloatField(null=True, blank=True)
+    nuclear_39_max = models.FloatField(null=True, blank=True)
+    nuclear_39_mean = models.FloatField(null=True, blank=True)
+    nuclear_39_sum = models.FloatField(null=True, blank=True)
+    nuclear_4_min = models.FloatField(null=True, blank=True)
+    nuclear_4_max = models.FloatField(null=True, blank=True)
+    nuclear_4_mean = models.FloatField(null=True, blank=True)
+    nuclear_4_sum = models.FloatField(null=True, blank=True)
+    nuclear_74_min = models.FloatField(null=True, blank=True)
+    nuclear_74_max = models.FloatField(null=True, blank=True)
+    nuclear_74_mean = models.FloatField(null=True, blank=True)
+    nuclear_74_sum = models.FloatField(null=True, blank=True)
+
+    peninsula_forecast_460_min = models.FloatField(null=True, blank=True)
+    peninsula_forecast_460_max = models.FloatField(null=True, blank=True)
+    peninsula_forecast_460_mean = models.FloatField(null=True, blank=True)
+    peninsula_forecast_460_sum = models.FloatField(null=True, blank=True)
+
+    scheduled_demand_365_min = models.FloatField(null=True, blank=True)
+    scheduled_demand_365_max = models.FloatField(null=True, blank=True)
+    scheduled_demand_365_mean = models.FloatField(null=True, blank=True)
+    scheduled_demand_365_sum = models.FloatField(null=True, blank=True)
+    scheduled_demand_358_min = models.FloatField(null=True, blank=True)
+    scheduled_demand_358_max = models.FloatField(null=True, blank=True)
+    scheduled_demand_358_mean = models.FloatField(null=True, blank=True)
+    scheduled_demand_358_sum = models.FloatField(null=True, blank=True)
+    scheduled_demand_372_min = models.FloatField(null=True, blank=True)
+    scheduled_demand_372_max = models.FloatField(null=True, blank=True)
+    scheduled_demand_372_mean = models.FloatField(null=True, blank=True)
+    scheduled_demand_372_sum = models.FloatField(null=True, blank=True)
+
+    daily_spot_market_600_España_min = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_España_max = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_España_mean = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_España_sum = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_Portugal_min = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_Portugal_max = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_Portugal_mean = models.FloatField(null=True, blank=True)
+    daily_spot_market_600_Portugal_sum = models.FloatField(null=True, blank=True)
+
+    average_demand_price_573_Baleares_min = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Baleares_max = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Baleares_mean = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Baleares_sum = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Canarias_min = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Canarias_max = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Canarias_mean = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Canarias_sum = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Ceuta_min = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Ceuta_max = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Ceuta_mean = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Ceuta_sum = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Melilla_min = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Melilla_max = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Melilla_mean = models.FloatField(null=True, blank=True)
+    average_demand_price_573_Melilla_sum = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['resolution', 'period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'period_start'], name='unique_aggregate_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.resolution} {self.period_start:%Y-%m-%d}"
+
+
 class PredictionHistory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     model_used = models.CharField(max_length=50)  
@@ -99,3 +215,98 @@ class PredictionHistory(models.Model):
                 
         except Exception as e:
             return None
+
+
+class TrainingJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    populate_database = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every progress write, a running job that stops updating lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    # {'stage': ..., 'models': {name: {'status', 'epoch', 'max_epochs', 'loss', 'val_loss', ...}}}
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"TrainingJob {self.id} - {self.status}"
+
+
+class DownloadJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Only kept until the job finishes, never returned by the API
+    esios_token = models.CharField(max_length=500, blank=True)
+    download_indicators = models.BooleanField(default=True)
+    years_back = models.IntegerField(default=5)
+    sync = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every progress write, a running job that stops updating lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    # {'stage', 'total_months', 'done_months', 'failed_months', 'skipped_months', 'bytes',
+    #  'eta_seconds', 'indicators': {id: {'category', 'total', 'done', 'failed', 'months': {...}}}, 'errors'}
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"DownloadJob {self.id} - {self.status}"
+
+
+class DataGeneration(models.Model):
+    """
+    Counter bumped in the same transaction as every write to a dataset, so other
+    processes can tell their cached copy is stale. range_start/range_end cover
+    the hours touched by the latest bump.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    generation = models.BigIntegerField(default=0)
+    range_start = models.DateTimeField(null=True, blank=True)
+    range_end = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.generation}"
@@ -1,6 +1,6 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from rest_framework import serializers
-from .models import TimeSeriesData, PredictionHistory
+from .models import TimeSeriesData, PredictionHistory, TrainingJob, DownloadJob
 from datetime import date
 
 class TimeSeriesDataSerializer(serializers.ModelSerializer):
@@ -38,6 +38,41 @@ class HistoricalDataRequestSerializer(serializers.Serializer):
     days = serializers.IntegerField(default=7, min_value=1, help_text="Number of days to retrieve data for")
     end_date = serializers.DateField(required=False, help_text="End date for data retrieval in YYYY-MM-DD format. If not provided, uses 2025-03-30.")
     columns = serializers.CharField(required=False, help_text="Comma-separated list of columns to retrieve")
+    format = serializers.ChoiceField(
+        choices=['json', 'ndjson', 'columnar', 'binary'],
+        default='json',
+        help_text="json for one document, ndjson for one JSON line per row (or per column), always streamed. "
+                  "columnar for one array per column over an hourly grid (start + step), binary for the same as float32"
+    )
+    shape = serializers.ChoiceField(
+        choices=['rows', 'columns'],
+        default='rows',
+        help_text="rows for one object per hour, columns for one array per column plus one of datetimes"
+    )
+    resolution = serializers.ChoiceField(
+        choices=['hour', 'day', 'week', 'month'],
+        default='hour',
+        help_text="hour for the loaded rows, day, week or month for one row per UTC period read from the rollups"
+    )
+    stat = serializers.ChoiceField(
+        choices=['mean', 'min', 'max', 'sum'],
+        default='mean',
+        help_text="Statistic of every column per period when resolution is not hour"
+    )
+    max_points = serializers.IntegerField(
+        required=False,
+        min_value=4,
+        help_text="Downsample the range on the server to at most this many rows, for charts"
+    )
+    downsample = serializers.ChoiceField(
+        choices=['lttb', 'minmax'],
+        default='lttb',
+        help_text="lttb keeps the rows of largest triangles (Largest-Triangle-Three-Buckets), minmax the min and max of every series per bucket"
+    )
+    stream = serializers.BooleanField(
+        default=False,
+        help_text="Stream the response from a database cursor instead of building it in memory. If HISTORICAL_STREAM_MIN_DAYS is set, ranges that long are always streamed"
+    )
     
     def validate_end_date(self, value):
         if value and value > date.today():
@@ -70,6 +105,11 @@ class DataDownloadRequestSerializer(serializers.Serializer):
         help_text="Number of years back to download data (1-5 years)"
     )
     
+    sync = serializers.BooleanField(
+        default=False,
+        help_text="Only download the months that are missing or still open and merge them into the existing yearly files"
+    )
+    
     def validate_esios_token(self, value):
         """
         Validate that the token is not empty
@@ -79,6 +119,13 @@ class DataDownloadRequestSerializer(serializers.Serializer):
         return value.strip()
 
 
+class DatasetMergeRequestSerializer(serializers.Serializer):
+    full = serializers.BooleanField(
+        default=False,
+        help_text="Merge every source again instead of only patching in the ones that changed"
+    )
+
+
 class PredictionHistorySerializer(serializers.ModelSerializer):
     """Serializer for PredictionHistory model"""
     
@@ -195,3 +242,47 @@ class PredictionHistoryFilterSerializer(serializers.Serializer):
         default=100,
         help_text="Maximum number of results to return"
     )
+
+
+class TrainingJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a background training job"""
+
+    class Meta:
+        model = TrainingJob
+        fields = [
+            'id',
+            'status',
+            'populate_database',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'heartbeat_at',
+            'worker',
+            'progress',
+            'result',
+            'error'
+        ]
+        read_only_fields = fields
+
+
+class DownloadJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a background ESIOS download, without the token"""
+
+    class Meta:
+        model = DownloadJob
+        fields = [
+            'id',
+            'status',
+            'download_indicators',
+            'years_back',
+            'sync',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'heartbeat_at',
+            'worker',
+            'progress',
+            'result',
+            'error'
+        ]
+        read_only_fields = fields
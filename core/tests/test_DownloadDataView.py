@@ -1,7 +1,9 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
 import os
+import json
 from datetime import datetime
 
 import django
@@ -33,19 +35,23 @@ if not settings.configured:
     )
     django.setup()
 
+from django.test import override_settings
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from core.ingestion import EsiosFetcher
 from core.views import DownloadDataView
+from core.utils.esios_stream import read_chunk
 
 
+@override_settings(DOWNLOAD_JOBS_EAGER=True)
 class TestDownloadDataView(APITestCase):
-    """Test cases for DownloadDataView class"""
+    """Test cases for DownloadDataView and the EsiosFetcher it runs"""
     
     def setUp(self):
         """Set up test data and client"""
         self.client = APIClient()
         self.url = '/data/download/'
-        self.view = DownloadDataView()
+        self.fetcher = EsiosFetcher.from_settings()
         
         self.sample_indicators_response = {
             'indicators': [
@@ -92,7 +98,7 @@ class TestDownloadDataView(APITestCase):
     def test_get_headers(self):
         """Test _get_headers method returns correct headers"""
         token = 'test-token-123'
-        headers = self.view._get_headers(token)
+        headers = self.fetcher._get_headers(token)
         
         expected_headers = {
             'Accept': 'application/json; application/vnd.esios-api-v2+json',
@@ -107,39 +113,40 @@ class TestDownloadDataView(APITestCase):
         
         self.assertEqual(headers, expected_headers)
 
-    @patch('core.views.settings')
-    def test_get_data_dir(self, mock_settings):
-        """Test _get_data_dir method returns correct path"""
-        mock_settings.BASE_DIR = '/test/project'
-        
-        data_dir = self.view._get_data_dir()
-        expected_path = os.path.join('/test/project', 'data')
-        
-        self.assertEqual(data_dir, expected_path)
+    def test_get_data_dir(self):
+        """Test that the fetcher from the settings downloads into BASE_DIR/data"""
+        with override_settings(BASE_DIR='/test/project'):
+            fetcher = EsiosFetcher.from_settings()
+
+        self.assertEqual(fetcher._get_data_dir(), os.path.join('/test/project', 'data'))
+
+    @override_settings(ESIOS_DOWNLOAD_WORKERS=3)
+    def test_options_override_settings(self):
+        """Test that explicit options win over the settings, which win over the defaults"""
+        self.assertEqual(EsiosFetcher.from_settings()._option('ESIOS_DOWNLOAD_WORKERS'), 3)
+        self.assertEqual(EsiosFetcher.from_settings({'ESIOS_DOWNLOAD_WORKERS': 8})._option('ESIOS_DOWNLOAD_WORKERS'), 8)
+        self.assertEqual(EsiosFetcher('/data')._option('ESIOS_DOWNLOAD_WORKERS'), 6)
 
 
-    @patch('core.views.requests.get')
-    @patch('core.views.pd.json_normalize')
+    @patch('core.ingestion.fetch.EsiosClient.get_json')
+    @patch('core.ingestion.fetch.pd.json_normalize')
     def test_get_indicators_success(self, mock_normalize, mock_get):
         """Test successful indicators retrieval"""
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.sample_indicators_response
-        mock_response.raise_for_status = MagicMock()
-        mock_get.return_value = mock_response
+        mock_get.return_value = self.sample_indicators_response
         
         mock_df = MagicMock()
         mock_df.assign.return_value = mock_df
         mock_normalize.return_value = mock_df
         
         headers = {'Authorization': 'Token token=test'}
-        result = self.view._get_indicators(headers)
+        result = self.fetcher._get_indicators(headers)
         
-        mock_get.assert_called_once_with(self.view.BASE_ENDPOINT, headers=headers)
-        mock_response.raise_for_status.assert_called_once()
+        mock_get.assert_called_once_with(self.fetcher.BASE_ENDPOINT)
+        self.assertEqual(self.fetcher.client.headers, headers)
         mock_normalize.assert_called_once()
         self.assertEqual(result, mock_df)
 
-    @patch('core.views.requests.get')
+    @patch('core.ingestion.fetch.EsiosClient.get_json')
     def test_get_indicators_request_exception(self, mock_get):
         """Test _get_indicators handles request exceptions"""
         mock_get.side_effect = Exception("Connection error")
@@ -147,56 +154,54 @@ class TestDownloadDataView(APITestCase):
         headers = {'Authorization': 'Token token=test'}
         
         with self.assertRaises(Exception) as context:
-            self.view._get_indicators(headers)
+            self.fetcher._get_indicators(headers)
         
         self.assertIn('Connection error', str(context.exception))
 
-    @patch('core.views.requests.get')
-    @patch('core.views.pd.json_normalize')
-    def test_get_data_by_id_month_success(self, mock_normalize, mock_get):
+    def _response_chunks(self, payload, size=16):
+        """JSON body split in chunks the way iter_content yields it"""
+        body = json.dumps(payload).encode()
+        return [body[i:i + size] for i in range(0, len(body), size)]
+
+    @patch('core.ingestion.fetch.EsiosClient.iter_content')
+    def test_get_data_by_id_month_success(self, mock_get):
         """Test successful data retrieval by indicator ID and month"""
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.sample_data_response
-        mock_response.raise_for_status = MagicMock()
-        mock_get.return_value = mock_response
-        
-        mock_df = pd.DataFrame([{'value': 1000, 'datetime': '2023-01-01'}])
-        mock_normalize.return_value = mock_df
+        mock_get.return_value = self._response_chunks(self.sample_data_response)
         
         headers = {'Authorization': 'Token token=test'}
-        result = self.view._get_data_by_id_month(358, 2023, 1, headers)
+        result = self.fetcher._get_data_by_id_month(358, 2023, 1, headers)
         
-        expected_endpoint = (f"{self.view.BASE_ENDPOINT}/358?"
+        expected_endpoint = (f"{self.fetcher.BASE_ENDPOINT}/358?"
                            f"start_date=2023-01-01T00:00&"
                            f"end_date=2023-01-31T23:59&"
                            f"time_trunc=five_minutes")
         
-        mock_get.assert_called_once_with(expected_endpoint, headers=headers)
-        self.assertEqual(result.equals(mock_df), True)
+        mock_get.assert_called_once_with(expected_endpoint)
+        np.testing.assert_allclose(result['value'], [1000.5, 1100.7], rtol=1e-6)
+        self.assertEqual(result['value'].dtype, 'float32')
+        self.assertEqual(result['datetime_utc'].dtype, 'int64')
+        self.assertEqual(result['utc_offset'].tolist(), [60, 60])
 
-    @patch('core.views.requests.get')
+    @patch('core.ingestion.fetch.EsiosClient.iter_content')
     def test_get_data_by_id_month_current_month(self, mock_get):
         """Test data retrieval for current month uses today as end date"""
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.sample_data_response
-        mock_response.raise_for_status = MagicMock()
-        mock_get.return_value = mock_response
+        mock_get.return_value = self._response_chunks(self.sample_data_response)
         
         headers = {'Authorization': 'Token token=test'}
         current_date = datetime.today()
         
-        with patch('core.views.datetime') as mock_datetime:
+        with patch('core.ingestion.fetch.datetime') as mock_datetime:
             mock_datetime.today.return_value = current_date
             mock_datetime.return_value = datetime
             mock_datetime.side_effect = lambda *args, **kw: datetime(*args, **kw)
             
-            self.view._get_data_by_id_month(358, current_date.year, current_date.month, headers)
+            self.fetcher._get_data_by_id_month(358, current_date.year, current_date.month, headers)
             
             expected_end_date = current_date.strftime('%Y-%m-%d')
             call_args = mock_get.call_args[0][0]
             self.assertIn(f"end_date={expected_end_date}T23:59", call_args)
 
-    @patch('core.views.requests.get')
+    @patch('core.ingestion.fetch.EsiosClient.iter_content')
     def test_get_data_by_id_month_request_exception(self, mock_get):
         """Test _get_data_by_id_month handles request exceptions"""
         mock_get.side_effect = Exception("API error")
@@ -204,7 +209,7 @@ class TestDownloadDataView(APITestCase):
         headers = {'Authorization': 'Token token=test'}
         
         with self.assertRaises(Exception) as context:
-            self.view._get_data_by_id_month(358, 2023, 1, headers)
+            self.fetcher._get_data_by_id_month(358, 2023, 1, headers)
         
         self.assertIn('API error', str(context.exception))
 
@@ -215,17 +220,18 @@ class TestDownloadDataView(APITestCase):
         mock_df = pd.DataFrame({'test': [1, 2, 3]})
         file_path = '/test/path/data.csv'
         
-        self.view._save_data(mock_df, file_path)
+        self.fetcher._save_data(mock_df, file_path)
         
         mock_makedirs.assert_called_once_with('/test/path', exist_ok=True)
         mock_to_csv.assert_called_once_with(file_path, index=False)
 
-    @patch('core.views.DownloadDataView._get_headers')
-    @patch('core.views.DownloadDataView._get_data_dir')
-    @patch('core.views.DownloadDataView._get_indicators')
-    @patch('core.views.DownloadDataView._save_data')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_headers')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_data_dir')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_indicators')
+    @patch('core.ingestion.fetch.EsiosFetcher._save_data')
+    @patch('core.ingestion.fetch.EsiosFetcher._save_chunks')
     @patch('os.makedirs')
-    def test_post_success_with_indicators(self, mock_makedirs, mock_save_data, 
+    def test_post_success_with_indicators(self, mock_makedirs, mock_save_chunks, mock_save_data,
                                         mock_get_indicators, mock_get_data_dir, 
                                         mock_get_headers):
         """Test successful POST request with indicators download"""
@@ -235,11 +241,11 @@ class TestDownloadDataView(APITestCase):
         
         mock_today = datetime(2023, 6, 15)
         
-        with patch('core.views.datetime') as mock_datetime:
+        with patch('core.ingestion.fetch.datetime') as mock_datetime:
             mock_datetime.today.return_value = mock_today
             mock_datetime.side_effect = lambda *args, **kw: datetime(*args, **kw)
             
-            with patch('core.views.DownloadDataView._get_data_by_id_month') as mock_get_data:
+            with patch('core.ingestion.fetch.EsiosFetcher._get_data_by_id_month') as mock_get_data:
                 mock_get_data.return_value = pd.DataFrame({'value': [100, 200]})
                 
                 response = self.client.post(self.url, self.valid_request_data, format='json')
@@ -249,6 +255,21 @@ class TestDownloadDataView(APITestCase):
         self.assertIn('downloaded_files', response.data)
         self.assertIn('indicators.csv', response.data['downloaded_files'])
 
+    def test_post_runs_fetch_step(self):
+        """Test that the view runs the fetch step of the pipeline with the fetcher of the settings"""
+        with override_settings(BASE_DIR='/test/project'), patch('core.views.IngestionPipeline') as mock_pipeline:
+            mock_pipeline.return_value.run.return_value = {
+                'fetch': {'errors': [], 'downloaded_files': ['indicators.csv']}, 'timings': {}
+            }
+            response = self.client.post(self.url, self.valid_request_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data_dir, fetcher = mock_pipeline.call_args.args
+        self.assertEqual(data_dir, os.path.join('/test/project', 'data'))
+        self.assertIsInstance(fetcher, EsiosFetcher)
+        self.assertNotIsInstance(DownloadDataView(), EsiosFetcher)
+        self.assertEqual(mock_pipeline.return_value.run.call_args.args, (['fetch'],))
+
     def test_post_invalid_serializer(self):
         """Test POST request with invalid data"""
         invalid_data = {
@@ -259,7 +280,7 @@ class TestDownloadDataView(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch('core.views.DownloadDataView._get_headers')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_headers')
     def test_post_general_exception(self, mock_get_headers):
         """Test POST request with general exception"""
         mock_get_headers.side_effect = Exception("General error")
@@ -270,23 +291,23 @@ class TestDownloadDataView(APITestCase):
         self.assertIn('error', response.data)
         self.assertIn('Download failed', response.data['error'])
 
-    @patch('core.views.DownloadDataView._get_headers')
-    @patch('core.views.DownloadDataView._get_data_dir')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_headers')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_data_dir')
     @patch('os.makedirs')
     def test_post_all_errors_no_success(self, mock_makedirs, mock_get_data_dir, mock_get_headers):
         """Test POST request where all operations fail"""
         mock_get_headers.return_value = {'Authorization': 'Token token=test'}
         mock_get_data_dir.return_value = '/test/data'
         
-        with patch('core.views.DownloadDataView._get_indicators') as mock_get_indicators:
+        with patch('core.ingestion.fetch.EsiosFetcher._get_indicators') as mock_get_indicators:
             mock_get_indicators.side_effect = Exception("Indicators failed")
             
-            with patch('core.views.DownloadDataView._get_data_by_id_month') as mock_get_data:
+            with patch('core.ingestion.fetch.EsiosFetcher._get_data_by_id_month') as mock_get_data:
                 mock_get_data.side_effect = Exception("Data failed")
                 
                 mock_today = datetime(2023, 6, 15)
                 
-                with patch('core.views.datetime') as mock_datetime:
+                with patch('core.ingestion.fetch.datetime') as mock_datetime:
                     mock_datetime.today.return_value = mock_today
                     mock_datetime.side_effect = lambda *args, **kw: datetime(*args, **kw)
                     
@@ -296,12 +317,11 @@ class TestDownloadDataView(APITestCase):
         self.assertIn('errors', response.data)
         self.assertEqual(len(response.data['downloaded_files']), 0)
 
-    @patch('core.views.DownloadDataView._get_headers')
-    @patch('core.views.DownloadDataView._get_data_dir')
-    @patch('core.views.DownloadDataView._save_data')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_headers')
+    @patch('core.ingestion.fetch.EsiosFetcher._get_data_dir')
+    @patch('core.ingestion.fetch.EsiosFetcher._save_chunks')
     @patch('os.makedirs')
-    @patch('core.views.pd.concat')
-    def test_monthly_data_combination(self, mock_concat, mock_makedirs, mock_save_data, 
+    def test_monthly_data_combination(self, mock_makedirs, mock_save_chunks,
                                     mock_get_data_dir, mock_get_headers):
         """Test that monthly data is properly combined into yearly files"""
         mock_get_headers.return_value = {'Authorization': 'Token token=test'}
@@ -309,10 +329,11 @@ class TestDownloadDataView(APITestCase):
         
         monthly_df1 = pd.DataFrame({'value': [100, 200], 'datetime': ['2023-01-01', '2023-01-02']})
         monthly_df2 = pd.DataFrame({'value': [300, 400], 'datetime': ['2023-02-01', '2023-02-02']})
-        combined_df = pd.DataFrame({'value': [100, 200, 300, 400], 
-                                  'datetime': ['2023-01-01', '2023-01-02', '2023-02-01', '2023-02-02']})
-        
-        mock_concat.return_value = combined_df
+
+        # The chunks are removed once the year is saved, read them while it is
+        saved = {}
+        mock_save_chunks.side_effect = lambda chunk_paths, file_path: saved.update(
+            {file_path: pd.concat([read_chunk(path) for path in chunk_paths], ignore_index=True)})
         
         request_data = {
             'esios_token': 'test-token-123',
@@ -322,18 +343,21 @@ class TestDownloadDataView(APITestCase):
         
         mock_today = datetime(2023, 3, 15)  
         
-        with patch('core.views.datetime') as mock_datetime:
+        with patch('core.ingestion.fetch.datetime') as mock_datetime:
             mock_datetime.today.return_value = mock_today
             mock_datetime.side_effect = lambda *args, **kw: datetime(*args, **kw)
             
-            with patch('core.views.DownloadDataView._get_data_by_id_month') as mock_get_data:
-                mock_get_data.side_effect = [monthly_df1, monthly_df2] * 50  
+            with patch('core.ingestion.fetch.EsiosFetcher._get_data_by_id_month') as mock_get_data:
+                # Months are downloaded concurrently, answer by month rather than by call order
+                mock_get_data.side_effect = lambda indicator_id, year, month, headers: (
+                    {1: monthly_df1, 2: monthly_df2}.get(month, pd.DataFrame()))
                 
                 response = self.client.post(self.url, request_data, format='json')
         
-        self.assertTrue(mock_concat.called)
-        
-        self.assertTrue(mock_save_data.called)
+        self.assertTrue(mock_save_chunks.called)
+        combined = saved['/test/data/price/daily_spot_market/600_2023.csv']
+        self.assertEqual(combined['value'].tolist(), [100, 200, 300, 400])
+        self.assertEqual(combined['datetime'].tolist(), ['2023-01-01', '2023-01-02', '2023-02-01', '2023-02-02'])
 
     def test_only_post_method_allowed(self):
         """Test that only POST method is allowed"""
@@ -360,9 +384,9 @@ class TestDownloadDataView(APITestCase):
         ]
         
         for category in expected_categories:
-            self.assertIn(category, self.view.DATA_TO_DOWNLOAD)
-            self.assertIsInstance(self.view.DATA_TO_DOWNLOAD[category], list)
-            self.assertTrue(len(self.view.DATA_TO_DOWNLOAD[category]) > 0)
+            self.assertIn(category, self.fetcher.DATA_TO_DOWNLOAD)
+            self.assertIsInstance(self.fetcher.DATA_TO_DOWNLOAD[category], list)
+            self.assertTrue(len(self.fetcher.DATA_TO_DOWNLOAD[category]) > 0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,321 @@
+import unittest
+import json
+import os
+import struct
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from core.utils.timeseries_store import timeseries_store, FEATURE_COLUMNS
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_HistoricalDataView.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+COLUMNS = 'scheduled_demand_372,daily_spot_market_600_España'
+
+
+def body(response):
+    """Content of a normal or a streaming response"""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+@override_settings(ROOT_URLCONF='core.urls', TIME_SERIES_CACHE=True, TIME_SERIES_CACHE_CHECK_SECONDS=0,
+                   HISTORICAL_STREAM_MIN_DAYS=90, HISTORICAL_STREAM_CHUNK_SIZE=5)
+class TestHistoricalDataView(TestCase):
+    """Test cases for GET /historical/, buffered and streamed"""
+
+    def setUp(self):
+        timeseries_store.reset()
+        self.addCleanup(timeseries_store.reset)
+        TimeSeriesData.objects.bulk_create([
+            TimeSeriesData(
+                datetime_utc=START + timedelta(hours=n),
+                scheduled_demand_372=1000.0 + n,
+                daily_spot_market_600_España=None if n % 7 == 0 else n / 4,
+            )
+            for n in range(48)
+        ])
+        self.client = APIClient()
+        self.params = {'days': 3, 'end_date': '2024-01-02', 'columns': COLUMNS}
+
+    def get(self, **params):
+        return self.client.get('/historical/', {**self.params, **params})
+
+    def test_stream_same_document(self):
+        """Test that a streamed response is the same JSON as the buffered one, in both shapes"""
+        for shape in ('rows', 'columns'):
+            with self.subTest(shape=shape):
+                buffered = self.get(shape=shape)
+                streamed = self.get(shape=shape, stream='true')
+
+                self.assertFalse(buffered.streaming)
+                self.assertTrue(streamed.streaming)
+                self.assertEqual(streamed['Content-Type'], 'application/json')
+                self.assertEqual(json.loads(body(streamed)), buffered.json())
+
+    def test_columns_shape(self):
+        data = self.get(shape='columns').json()
+
+        self.assertEqual(list(data['data']), ['datetime', 'scheduled_demand_372', 'daily_spot_market_600_España'])
+        self.assertEqual(data['count'], 48)
+        self.assertEqual(data['data']['scheduled_demand_372'][:3], [1000.0, 1001.0, 1002.0])
+        self.assertIsNone(data['data']['daily_spot_market_600_España'][0])
+        self.assertEqual(data['data']['datetime'][0], '2024-01-01T00:00:00Z')
+
+    def test_columns_stream_during_load(self):
+        """Test that an hour inserted while the columns stream doesn't reach the later arrays only"""
+        TimeSeriesData.objects.filter(datetime_utc=START + timedelta(hours=10)).delete()
+        response = self.get(shape='columns', stream='true')
+
+        parts = []
+        for part in response.streaming_content:
+            parts.append(part)
+            if part == b']' and parts.count(b']') == 1:
+                # The datetime array is written, a load commits before the columns are read
+                TimeSeriesData.objects.create(datetime_utc=START + timedelta(hours=10), scheduled_demand_372=1.0)
+        data = json.loads(b''.join(parts))
+
+        self.assertEqual(data['count'], 47)
+        self.assertEqual({name: len(values) for name, values in data['data'].items()},
+                         dict.fromkeys(data['data'], 47))
+
+    def test_ndjson_rows(self):
+        response = self.get(format='ndjson')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = body(response).decode().splitlines()
+        self.assertEqual(len(lines), 48)
+        self.assertEqual(json.loads(lines[1]), {
+            'datetime': '2024-01-01T01:00:00Z', 'scheduled_demand_372': 1001.0, 'daily_spot_market_600_España': 0.25
+        })
+
+    def test_ndjson_columns(self):
+        lines = body(self.get(format='ndjson', shape='columns')).decode().splitlines()
+
+        series = [json.loads(line) for line in lines]
+        self.assertEqual([line['column'] for line in series],
+                         ['datetime', 'scheduled_demand_372', 'daily_spot_market_600_España'])
+        self.assertTrue(all(len(line['values']) == 48 for line in series))
+
+    def test_long_range_streamed(self):
+        """Test that ranges of HISTORICAL_STREAM_MIN_DAYS days or more skip the buffered path"""
+        response = self.get(days=90)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(body(response))['count'], 48)
+
+    @override_settings(HISTORICAL_STREAM_MIN_DAYS=None)
+    def test_long_range_buffered_by_default(self):
+        """Test that without HISTORICAL_STREAM_MIN_DAYS only stream=true streams a long range"""
+        buffered = self.get(days=90)
+        streamed = self.get(days=90, stream='true')
+
+        self.assertFalse(buffered.streaming)
+        self.assertEqual(buffered.json()['count'], 48)
+        self.assertEqual(buffered.json(), json.loads(body(streamed)))
+
+    def test_stream_empty_range(self):
+        response = self.get(stream='true', end_date='2023-06-01')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
+
+    def test_invalid_format(self):
+        """Test that `format` is validated by the view, not taken by DRF as a renderer"""
+        response = self.get(format='xml')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json())
+
+    def test_columnar(self):
+        """Test that format=columnar has the values of the rows over start + step"""
+        rows = self.get().json()
+        columnar = self.get(format='columnar').json()
+
+        self.assertEqual(columnar['start'], '2024-01-01T00:00:00Z')
+        self.assertEqual(columnar['step'], 3600)
+        self.assertEqual(columnar['count'], rows['count'])
+        for column in ('scheduled_demand_372', 'daily_spot_market_600_España'):
+            self.assertEqual(columnar['data'][column], [row[column] for row in rows['data']])
+        self.assertLess(len(self.get(format='columnar').content) * 3, len(self.get().content))
+
+    def test_columnar_fills_gaps(self):
+        """Test that missing hours are nulls on the grid, with and without the cache"""
+        TimeSeriesData.objects.filter(datetime_utc=START + timedelta(hours=10)).delete()
+
+        cached = self.get(format='columnar').json()
+        with override_settings(TIME_SERIES_CACHE=False):
+            uncached = self.get(format='columnar').json()
+
+        self.assertEqual(cached, uncached)
+        self.assertEqual(cached['count'], 48)
+        self.assertIsNone(cached['data']['scheduled_demand_372'][10])
+        self.assertEqual(cached['data']['scheduled_demand_372'][11], 1011.0)
+
+    @override_settings(TIME_SERIES_CACHE=False)
+    def test_columnar_off_grid(self):
+        """Test that rows off the hourly grid keep their timestamps"""
+        TimeSeriesData.objects.create(datetime_utc=START + timedelta(minutes=30), scheduled_demand_372=1.0)
+
+        data = self.get(format='columnar').json()
+
+        self.assertIsNone(data['step'])
+        self.assertEqual(data['timestamps'][:2], ['2024-01-01T00:00:00Z', '2024-01-01T00:30:00Z'])
+        self.assertEqual(data['data']['scheduled_demand_372'][:2], [1000.0, 1.0])
+
+    def test_binary(self):
+        """Test that format=binary decodes to the float32 columns of format=columnar"""
+        columnar = self.get(format='columnar').json()
+        response = self.get(format='binary')
+
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        content = response.content
+        (length,) = struct.unpack('<I', content[:4])
+        self.assertEqual((4 + length) % 4, 0)
+        header = json.loads(content[4:4 + length])
+        self.assertEqual(header['start'], columnar['start'])
+        self.assertEqual(header['count'], 48)
+        values = np.frombuffer(content, dtype='<f4', offset=4 + length).reshape(len(header['series']), -1)
+        for i, column in enumerate(header['series']):
+            expected = np.array(columnar['data'][column], dtype=np.float64)
+            np.testing.assert_allclose(values[i], expected.astype(np.float32))
+
+    def test_columnar_empty_range(self):
+        for output_format in ('columnar', 'binary'):
+            response = self.get(format=output_format, end_date='2023-06-01')
+
+            self.assertEqual(response.status_code, 404)
+
+    def test_max_points(self):
+        """Test that max_points bounds every format, LTTB to rows of the full range"""
+        rows = {row['datetime']: row for row in self.get().json()['data']}
+
+        for method in ('lttb', 'minmax'):
+            with self.subTest(method=method):
+                data = self.get(max_points=10, downsample=method).json()
+
+                self.assertLessEqual(data['count'], 10)
+                self.assertEqual(data['parameters']['max_points'], 10)
+                for row in data['data']:
+                    if method == 'lttb':
+                        self.assertEqual(row, rows[row['datetime']])
+                    else:
+                        self.assertIn(row['datetime'], rows)
+
+                columnar = self.get(max_points=10, downsample=method, format='columnar').json()
+                self.assertIsNone(columnar['step'])
+                self.assertEqual(columnar['timestamps'], [row['datetime'] for row in data['data']])
+
+    def test_max_points_minmax_envelope(self):
+        data = self.get(max_points=10, downsample='minmax', shape='columns').json()['data']
+
+        self.assertEqual(max(data['scheduled_demand_372']), 1047.0)
+        self.assertEqual(min(data['scheduled_demand_372']), 1000.0)
+
+    def test_max_points_above_count(self):
+        """Test that a range with fewer rows than max_points is sent whole"""
+        self.assertEqual(self.get(max_points=1000).json()['data'], self.get().json()['data'])
+
+    def test_max_points_ndjson(self):
+        response = self.get(max_points=10, format='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(response.content.decode().splitlines()), 10)
+
+    def test_max_points_minimum(self):
+        self.assertEqual(self.get(max_points=2).status_code, 400)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run streaming benchmarks")
+    @override_settings(HISTORICAL_STREAM_CHUNK_SIZE=2000, TIME_SERIES_CACHE=False)
+    def test_response_memory(self):
+        """Print the peak memory of a buffered vs a streamed response over growing ranges"""
+        TimeSeriesData.objects.all().delete()
+        n_hours = 5 * 365 * 24
+        first = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        TimeSeriesData.objects.bulk_create([
+            TimeSeriesData(datetime_utc=first + timedelta(hours=n), scheduled_demand_372=float(n))
+            for n in range(n_hours)
+        ], batch_size=1000)
+        end_date = (first + timedelta(hours=n_hours - 1)).date().isoformat()
+
+        print(f"\n{'days':<8}{'mode':<10}{'peak MB':>10}{'seconds':>10}{'MB sent':>10}")
+        for days in (30, 365, 5 * 365):
+            for mode, params in (('buffered', {'stream': 'false'}), ('stream', {'stream': 'true'}),
+                                 ('ndjson', {'format': 'ndjson'})):
+                with override_settings(HISTORICAL_STREAM_MIN_DAYS=None):
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    # Only the size of each chunk is kept, like a server writing it to the socket
+                    response = self.get(days=days, end_date=end_date, columns='', **params)
+                    size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming \
+                        else len(response.content)
+                    seconds = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                print(f"{days:<8}{mode:<10}{peak / 2 ** 20:>10.1f}{seconds:>10.2f}{size / 2 ** 20:>10.1f}")
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run streaming benchmarks")
+    def test_payload_size(self):
+        """Print the bytes of 90 days of every column in each format"""
+        TimeSeriesData.objects.all().delete()
+        rng = np.random.default_rng(0)
+        n_hours = 90 * 24
+        first = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        TimeSeriesData.objects.bulk_create([
+            TimeSeriesData(datetime_utc=first + timedelta(hours=n),
+                           **{name: round(float(value), 2) for name, value in zip(FEATURE_COLUMNS, rng.uniform(0, 30000, len(FEATURE_COLUMNS)))})
+            for n in range(n_hours)
+        ])
+        params = {'days': 90, 'end_date': '2024-03-30', 'columns': ''}
+
+        sizes = {
+            output_format: len(body(self.client.get('/historical/', {**params, 'format': output_format})))
+            for output_format in ('json', 'columnar', 'binary')
+        }
+        print(f"\n{'format':<10}{'KB':>10}{'ratio':>8}")
+        for output_format, size in sizes.items():
+            print(f"{output_format:<10}{size / 1024:>10.0f}{sizes['json'] / size:>8.1f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
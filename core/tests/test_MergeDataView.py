@@ -37,6 +37,8 @@ from rest_framework import status
 from core.views import MergeDataView
 
 
+# The tests mock pandas and the filesystem in this process, read the files here too
+@override_settings(MERGE_WORKERS=1)
 class TestMergeDataView(APITestCase):
     """Test cases for MergeDataView class"""
     
@@ -186,6 +188,22 @@ class TestMergeDataView(APITestCase):
         self.assertIn('error', response.data)
         self.assertIn('Hubo un error al unir los datos', response.data['error'])
 
+    @patch('core.views.os.path.exists', return_value=True)
+    @patch('core.views.IngestionPipeline')
+    def test_full_flag_parsed_as_boolean(self, mock_pipeline, mock_exists):
+        """Test that 'full' is read as a boolean, the string "false" included"""
+        mock_pipeline.return_value.run.side_effect = Exception("stop")
+
+        for value, expected in (('false', False), ('true', True), ('0', False), (None, False)):
+            with self.subTest(value=value):
+                mock_pipeline.return_value.run.reset_mock()
+                self.client.post(self.url, {} if value is None else {'full': value})
+                self.assertIs(mock_pipeline.return_value.run.call_args.kwargs['full'], expected)
+
+        response = self.client.post(self.url, {'full': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('full', response.data)
+
     def test_only_post_method_allowed(self):
         """Test that only POST method is allowed"""
         response = self.client.get(self.url)
@@ -63,8 +63,11 @@ class MockTimeSeriesPredictor:
 
 from core.views import PredictView
 from core.serializers import PredictionRequestSerializer
+from core.utils.model_registry import model_registry
 
 
+# These tests mock the ORM queryset, keep the columnar cache out of the way
+@override_settings(TIME_SERIES_CACHE=False)
 class TestPredictView(APITestCase):
     """Test cases for PredictView class"""
     
@@ -92,14 +95,17 @@ class TestPredictView(APITestCase):
             'input_hours': 24,
             'prediction_date': '2025-03-25'
         }
+        
+        # Models and sample data are cached process-wide, start every test cold
+        model_registry.reset()
 
     def tearDown(self):
         """Clean up after tests"""
-        pass
+        model_registry.reset()
 
     @patch('core.views.TimeSeriesData', MockTimeSeriesData)
     @patch('core.views.PredictionHistory', MockPredictionHistory)
-    @patch('core.views.TimeSeriesPredictor', MockTimeSeriesPredictor)
+    @patch('core.utils.time_series_utils.TimeSeriesPredictor', MockTimeSeriesPredictor)
     @patch('os.path.exists')
     @patch('builtins.open', new_callable=mock_open)
     @patch('pickle.load')
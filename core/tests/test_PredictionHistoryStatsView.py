@@ -116,6 +116,12 @@ class TestPredictionHistoryStatsView(APITestCase):
                 hours_ahead=4
             )
         ]
+        # The ETag/Last-Modified aggregate, the mocked manager only answers the stats one
+        state = patch('core.views._prediction_stats_state', return_value={
+            'total': 3, 'last_id': 3, 'recent': 2,
+        })
+        state.start()
+        self.addCleanup(state.stop)
 
     def tearDown(self):
         """Clean up after tests"""
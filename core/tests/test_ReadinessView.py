@@ -0,0 +1,205 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from core.utils.warmup import (
+    warmup_state,
+    WarmupState,
+    warm_up,
+    run_warmup,
+    get_warmup_input_hours,
+)
+
+
+class TestReadinessView(APITestCase):
+    """Test cases for ReadinessView and the warm-up it reports on"""
+
+    def setUp(self):
+        """Set up client and a pending warm-up"""
+        self.client = APIClient()
+        self.url = '/health/ready/'
+        self.previous_status = warmup_state.status
+        warmup_state.reset()
+
+    def tearDown(self):
+        """Restore whatever state AppConfig.ready() left"""
+        warmup_state.reset()
+        warmup_state.update(status=self.previous_status)
+
+    def _mock_predictor(self, model_names):
+        predictor = MagicMock()
+        predictor.models = {name: MagicMock() for name in model_names}
+        predictor.column_indices = {'a': 0, 'b': 1, 'c': 2}
+        return predictor
+
+    def test_not_ready_while_pending(self):
+        """Test that the probe fails before warm-up has run"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['status'], WarmupState.PENDING)
+
+    def test_not_ready_while_running(self):
+        """Test that the probe fails while warm-up is in progress"""
+        warmup_state.update(status=WarmupState.RUNNING)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_ready_after_warmup(self):
+        """Test that the probe passes once warm-up finished"""
+        warmup_state.update(status=WarmupState.READY, models=['linear', 'lstm'])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['models'], ['linear', 'lstm'])
+
+    def test_ready_when_warmup_disabled(self):
+        """Test that workers without warm-up are always ready"""
+        warmup_state.update(status=WarmupState.DISABLED)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_warm_up_runs_every_model_and_width(self):
+        """Test that warm_up sends a dummy batch for each model and input width"""
+        predictor = self._mock_predictor(['linear', 'dense', 'conv', 'lstm'])
+
+        skipped = warm_up(predictor, [1, 24, 168])
+
+        self.assertEqual(predictor.predict.call_count, 12)
+        self.assertEqual(skipped, [])
+        model_name, dummy_data = predictor.predict.call_args_list[-1][0]
+        self.assertEqual(model_name, 'lstm')
+        self.assertEqual(dummy_data.shape, (168, 3))
+
+    def test_warm_up_skips_unsupported_widths(self):
+        """Test that a width a model can't handle is reported, not fatal"""
+        predictor = self._mock_predictor(['conv'])
+        predictor.predict.side_effect = [ValueError("kernel too big"), None]
+
+        skipped = warm_up(predictor, [1, 24])
+
+        self.assertEqual(len(skipped), 1)
+        self.assertEqual(skipped[0]['input_hours'], 1)
+
+    @override_settings(PREDICTION_WARMUP_INPUT_HOURS=[24, 1, 24])
+    def test_warmup_input_hours_setting(self):
+        """Test that the configured widths are deduplicated and sorted"""
+        self.assertEqual(get_warmup_input_hours(), [1, 24])
+
+    @override_settings(PREDICTION_WARMUP_INPUT_HOURS=None)
+    def test_warmup_input_hours_default(self):
+        """Test that only the API and frontend default widths are warmed by default"""
+        self.assertEqual(get_warmup_input_hours(), [24, 168])
+
+    @override_settings(PREDICTION_WARMUP_INPUT_HOURS=[24])
+    def test_run_warmup_marks_ready(self):
+        """Test a full warm-up through the registry"""
+        predictor = self._mock_predictor(['linear', 'dense'])
+
+        with patch('core.utils.model_registry.model_registry') as mock_registry:
+            mock_registry.get_predictor.return_value = predictor
+            with patch('builtins.print'):
+                run_warmup()
+
+        self.assertEqual(warmup_state.status, WarmupState.READY)
+        self.assertEqual(warmup_state.models, ['linear', 'dense'])
+        self.assertIsNotNone(warmup_state.finished_at)
+
+    def test_run_warmup_without_models_is_ready(self):
+        """Test that an untrained deployment still becomes ready so it can be trained"""
+        with patch('core.utils.model_registry.model_registry') as mock_registry:
+            mock_registry.get_predictor.return_value = None
+            with patch('builtins.print'):
+                run_warmup()
+
+        self.assertEqual(warmup_state.status, WarmupState.READY)
+        self.assertEqual(warmup_state.models, [])
+
+    def test_run_warmup_failure(self):
+        """Test that an unexpected error keeps the worker out of rotation"""
+        with patch('core.utils.model_registry.model_registry') as mock_registry:
+            mock_registry.get_predictor.side_effect = Exception("disk error")
+            with patch('builtins.print'):
+                run_warmup()
+
+        self.assertEqual(warmup_state.status, WarmupState.FAILED)
+        self.assertIn('disk error', warmup_state.error)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @override_settings(PREDICTION_WARMUP=True, PREDICTION_WARMUP_COMMANDS=['runserver'])
+    def test_warmup_only_in_serving_processes(self):
+        """Test that migrate, shell and the workers skip warm-up, runserver and WSGI servers run it"""
+        cases = [
+            (['manage.py', 'migrate'], False, False),
+            (['manage.py', 'training_worker'], False, False),
+            (['manage.py', 'load_timeseries'], False, False),
+            (['manage.py', 'runserver', '--noreload'], False, True),
+            (['gunicorn', 'time_series_tfg.wsgi'], True, True),
+        ]
+        for argv, server, expected in cases:
+            with self.subTest(argv=argv), \
+                    patch('sys.argv', argv), \
+                    patch('core.apps._serving_process', server), \
+                    patch('core.utils.warmup.start_warmup_thread') as mock_start:
+                warmup_state.reset()
+                apps.get_app_config('core').ready()
+
+                self.assertEqual(mock_start.called, expected)
+                if not expected:
+                    self.assertEqual(warmup_state.status, WarmupState.DISABLED)
+
+    def test_serving_flag_not_inherited(self):
+        """Test that flagging a server process leaves os.environ alone, so its subprocesses don't warm up"""
+        import os
+        from core.apps import mark_serving_process, serves_requests
+
+        with patch('core.apps._serving_process', False), \
+                patch.dict('os.environ', {}), \
+                patch('sys.argv', ['gunicorn', 'time_series_tfg.wsgi']):
+            environ = dict(os.environ)
+            mark_serving_process()
+
+            self.assertTrue(serves_requests())
+            self.assertEqual(dict(os.environ), environ)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -65,6 +65,7 @@ class MockTimeSeriesData:
 
 # Import your modules after mocking
 from core.views import TrainModelsView  
+from core.utils.training import populate_database_from_csv
 
 
 class TestTrainModelsView(APITestCase):
@@ -91,9 +92,9 @@ class TestTrainModelsView(APITestCase):
             'lstm': {'mae': 6.9, 'mse': 95.8}
         }
 
-    @patch('core.views.TimeSeriesData', MockTimeSeriesData)
-    @patch('core.views.TimeSeriesPredictor')
-    @override_settings(MEDIA_ROOT='/media')
+    @patch('core.utils.training.TimeSeriesData', MockTimeSeriesData)
+    @patch('core.utils.time_series_utils.TimeSeriesPredictor')
+    @override_settings(MEDIA_ROOT='/media', TRAINING_JOBS_EAGER=True)
     def test_train_models_from_database_success(self, mock_predictor_class):
         """Test successful model training from database"""
         # Setup mocks - no CSV path in settings
@@ -122,7 +123,7 @@ class TestTrainModelsView(APITestCase):
         mock_queryset.count.return_value = 100
         MockTimeSeriesData.objects.all.return_value.order_by.return_value = mock_queryset
         
-        with patch('os.makedirs'):
+        with patch('os.makedirs'), patch('core.utils.training.write_generation_marker'):
             with patch('builtins.open', mock_open()):
                 with patch('pickle.dump'):
                     response = self.client.post(self.url, {})
@@ -140,7 +141,8 @@ class TestTrainModelsView(APITestCase):
         self.assertEqual(response.data['database_records'], 100)
         self.assertFalse(response.data['database_populated'])
 
-    @patch('core.views.TimeSeriesData', MockTimeSeriesData)
+    @patch('core.utils.training.TimeSeriesData', MockTimeSeriesData)
+    @override_settings(TRAINING_JOBS_EAGER=True)
     def test_train_models_empty_database_no_csv(self):
         """Test training with empty database and no CSV path"""
         # Mock empty database
@@ -156,9 +158,9 @@ class TestTrainModelsView(APITestCase):
         self.assertEqual(response.data['error'], 'No se han encontrado los datos.')
 
 
-    @patch('core.views.TimeSeriesData', MockTimeSeriesData)
-    @patch('core.views.TimeSeriesPredictor')
-    @override_settings(TIME_SERIES_CSV_PATH='/path/to/test.csv')
+    @patch('core.utils.training.TimeSeriesData', MockTimeSeriesData)
+    @patch('core.utils.time_series_utils.TimeSeriesPredictor')
+    @override_settings(TIME_SERIES_CSV_PATH='/path/to/test.csv', TRAINING_JOBS_EAGER=True)
     def test_train_models_predictor_exception(self, mock_predictor_class):
         """Test handling of predictor exceptions"""
         # Setup mock to raise exception
@@ -173,10 +175,10 @@ class TestTrainModelsView(APITestCase):
         self.assertIn('error', response.data)
         self.assertIn('El entrenamiento ha fallado', response.data['error'])
 
-    @patch('core.views.TimeSeriesData', MockTimeSeriesData)
-    @patch('core.views.TimeSeriesPredictor')
+    @patch('core.utils.training.TimeSeriesData', MockTimeSeriesData)
+    @patch('core.utils.time_series_utils.TimeSeriesPredictor')
     @patch('pandas.read_csv')
-    @override_settings(TIME_SERIES_CSV_PATH='/path/to/test.csv')
+    @override_settings(TIME_SERIES_CSV_PATH='/path/to/test.csv', TRAINING_JOBS_EAGER=True)
     def test_populate_database_csv_exception(self, mock_read_csv, mock_predictor_class):
         """Test handling of CSV population exceptions"""
         # Setup mock to raise exception during CSV reading for population
@@ -205,8 +207,7 @@ class TestTrainModelsView(APITestCase):
         self.assertIn('error', response.data)
 
     def test_populate_database_from_csv_method(self):
-        """Test the _populate_database_from_csv method directly"""
-        view = TrainModelsView()
+        """Test the populate_database_from_csv function directly"""
         
         # Create mock DataFrame
         mock_df = pd.DataFrame({
@@ -220,19 +221,24 @@ class TestTrainModelsView(APITestCase):
             with patch('pandas.to_datetime') as mock_to_datetime:
                 mock_to_datetime.return_value = mock_df['datetime_utc']
                 
-                with patch('core.views.TimeSeriesData') as mock_model:
-                    mock_model.objects.bulk_create = MagicMock()
+                with patch('core.utils.training.TimeSeriesData') as mock_model, \
+                        patch('core.utils.training.connection') as mock_connection, \
+                        patch('core.utils.training.bump_data_generation') as mock_bump, \
+                        patch('core.utils.training.update_rollups') as mock_rollups:
                     mock_model.objects.count.return_value = 2
+                    mock_connection.ops.quote_name.side_effect = lambda name: f'"{name}"'
+                    mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
                     
-                    result = view._populate_database_from_csv('/path/to/test.csv')
+                    result = populate_database_from_csv('/path/to/test.csv')
                     
                     # Assertions
                     self.assertEqual(result, 2)
-                    mock_model.objects.bulk_create.assert_called()
+                    mock_cursor.executemany.assert_called_once()
+                    rows = mock_cursor.executemany.call_args.args[1]
+                    self.assertEqual([row[1:] for row in rows], [(1000, 50, 45), (1100, 55, 50)])
 
     def test_populate_database_batch_processing(self):
-        """Test batch processing in _populate_database_from_csv"""
-        view = TrainModelsView()
+        """Test batch processing in populate_database_from_csv"""
         
         # Create large DataFrame to test batching (batch_size = 1000)
         large_data = {
@@ -247,24 +253,33 @@ class TestTrainModelsView(APITestCase):
             with patch('pandas.to_datetime') as mock_to_datetime:
                 mock_to_datetime.return_value = mock_df['datetime_utc']
                 
-                with patch('core.views.TimeSeriesData') as mock_model:
-                    mock_model.objects.bulk_create = MagicMock()
+                with patch('core.utils.training.TimeSeriesData') as mock_model, \
+                        patch('core.utils.training.connection') as mock_connection, \
+                        patch('core.utils.training.bump_data_generation') as mock_bump, \
+                        patch('core.utils.training.update_rollups') as mock_rollups:
                     mock_model.objects.count.return_value = 1500
+                    mock_connection.ops.quote_name.side_effect = lambda name: f'"{name}"'
+                    mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
                     
-                    result = view._populate_database_from_csv('/path/to/test.csv')
+                    result = populate_database_from_csv('/path/to/test.csv')
                     
                     # Should be called twice (1000 + 500 records)
-                    self.assertEqual(mock_model.objects.bulk_create.call_count, 2)
+                    self.assertEqual(mock_cursor.executemany.call_count, 2)
+                    batch_sizes = [len(call.args[1]) for call in mock_cursor.executemany.call_args_list]
+                    self.assertEqual(batch_sizes, [1000, 500])
                     self.assertEqual(result, 1500)
+                    mock_bump.assert_called_once()
+                    mock_rollups.assert_called_once()
 
-    @patch('core.views.TimeSeriesData', MockTimeSeriesData)
-    @patch('core.views.TimeSeriesPredictor')
+    @patch('core.utils.training.TimeSeriesData', MockTimeSeriesData)
+    @patch('core.utils.time_series_utils.TimeSeriesPredictor')
+    @patch('core.utils.training.write_generation_marker')
     @patch('os.makedirs')
     @patch('builtins.open', new_callable=mock_open)
     @patch('pickle.dump')
-    @override_settings(MEDIA_ROOT='/test/media')
+    @override_settings(MEDIA_ROOT='/test/media', TRAINING_JOBS_EAGER=True)
     def test_model_saving_file_operations(self, mock_pickle_dump, mock_file, 
-                                        mock_makedirs, mock_predictor_class):
+                                        mock_makedirs, mock_marker, mock_predictor_class):
         """Test file operations for saving models and normalization parameters"""
         mock_predictor = MagicMock()
         mock_predictor_class.return_value = mock_predictor
@@ -297,10 +312,56 @@ class TestTrainModelsView(APITestCase):
         
         # Assertions
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        mock_makedirs.assert_called_with('/test/media/models', exist_ok=True)
-        mock_model1.save.assert_called_with('/test/media/models/linear_model.h5')
-        mock_model2.save.assert_called_with('/test/media/models/dense_model.h5')
+        # Everything goes to a new generation directory, published once it is complete
+        generation = mock_marker.call_args.args[1]
+        generation_dir = f'/test/media/models/generation-{generation}'
+        mock_marker.assert_called_once_with('/test/media/models', generation)
+        mock_makedirs.assert_called_with(generation_dir, exist_ok=True)
+        mock_model1.save.assert_called_with(f'{generation_dir}/linear_model.h5')
+        mock_model2.save.assert_called_with(f'{generation_dir}/dense_model.h5')
         mock_pickle_dump.assert_called_once()
+        mock_predictor.export_tflite.assert_called_once_with(generation_dir)
+
+    @patch('core.views.enqueue_training_job')
+    def test_train_models_queues_job(self, mock_enqueue):
+        """Test that by default the request only queues a job"""
+        mock_enqueue.return_value = MagicMock(id=7, status='queued')
+
+        response = self.client.post(self.url, {'populate_database': True}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['job_id'], 7)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertTrue(response.data['status_url'].endswith('/train/7/'))
+        mock_enqueue.assert_called_once_with(populate_database=True)
+
+    @patch('core.views.TrainingJob')
+    def test_training_job_detail(self, mock_job_class):
+        """Test the status endpoint of a job"""
+        mock_job = MagicMock(
+            id=7, status='running', populate_database=False, created_at=None, started_at=None,
+            finished_at=None, heartbeat_at=None, worker='host:1', result=None, error=None,
+            progress={'stage': 'training', 'models': {'linear': {'status': 'training', 'epoch': 3, 'max_epochs': 20}}}
+        )
+        mock_job_class.objects.get.return_value = mock_job
+
+        response = self.client.get(f'{self.url}7/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'running')
+        self.assertEqual(response.data['progress']['models']['linear']['epoch'], 3)
+        mock_job_class.objects.get.assert_called_once_with(pk=7)
+
+    @patch('core.views.TrainingJob')
+    def test_training_job_not_found(self, mock_job_class):
+        """Test the status endpoint with an unknown job id"""
+        mock_job_class.DoesNotExist = Exception
+        mock_job_class.objects.get.side_effect = mock_job_class.DoesNotExist
+
+        response = self.client.get(f'{self.url}99/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('error', response.data)
 
     def test_only_post_method_allowed(self):
         """Test that only POST method is allowed"""
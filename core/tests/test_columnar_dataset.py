@@ -0,0 +1,127 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from core.utils.columnar_dataset import (
+    columnar_dataset_paths, write_columnar_dataset, read_columnar_dataset, read_dataset
+)
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_columnar_dataset.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+
+class TestColumnarDataset(unittest.TestCase):
+    """Test cases for the binary copy of the dataset CSVs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'merged_dataset.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, df):
+        df.to_csv(self.csv_path, index=False)
+        return write_columnar_dataset(df, self.csv_path)
+
+    def test_same_frame_as_csv(self):
+        """Test that the binary copy reads back as the parsed CSV"""
+        sample = pd.read_csv(SAMPLE_DATA)
+        sample['datetime_utc'] = pd.to_datetime(sample['datetime_utc'])
+        self._write(sample)
+
+        expected = pd.read_csv(self.csv_path)
+        expected['datetime_utc'] = pd.to_datetime(expected['datetime_utc'])
+        df = read_columnar_dataset(self.csv_path)
+
+        pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+        self.assertEqual(str(df['datetime_utc'].dt.tz), 'UTC')
+
+    def test_values_memory_mapped(self):
+        """Test that the values aren't copied out of the file and writes stay in memory"""
+        self._write(pd.DataFrame({
+            'datetime_utc': pd.date_range('2023-01-01', periods=3, freq='h', tz='UTC'),
+            'value': [1.0, np.nan, 3.0],
+        }))
+        values_path, _, _ = columnar_dataset_paths(self.csv_path)
+
+        df = read_columnar_dataset(self.csv_path)
+        base = df['value'].values
+        while base.base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+
+        df.loc[0, 'value'] = 100.0
+        self.assertEqual(np.load(values_path)[0, 0], 1.0)
+
+    def test_changed_csv_ignored(self):
+        """Test that a CSV rewritten after the binary copy is read as text"""
+        self._write(pd.DataFrame({'datetime_utc': ['2023-01-01 00:00:00+00:00'], 'value': [1.0]}))
+        pd.DataFrame({'datetime_utc': ['2023-01-01 00:00:00+00:00', '2023-01-01 01:00:00+00:00'],
+                      'value': [1.0, 2.0]}).to_csv(self.csv_path, index=False)
+
+        self.assertIsNone(read_columnar_dataset(self.csv_path))
+        self.assertEqual(len(read_dataset(self.csv_path)), 2)
+
+    def test_missing_copy_falls_back_to_csv(self):
+        """Test that read_dataset parses the CSV when there's no binary copy"""
+        pd.DataFrame({'datetime_utc': ['2023-01-01 00:00:00'], 'value': [1.0]}).to_csv(self.csv_path, index=False)
+
+        with patch('pandas.read_csv', wraps=pd.read_csv) as mock_read_csv:
+            df = read_dataset(self.csv_path)
+
+        mock_read_csv.assert_called_once_with(self.csv_path)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['datetime_utc']))
+
+    def test_corrupt_copy_falls_back_to_csv(self):
+        """Test that a broken binary copy is reported and skipped"""
+        self._write(pd.DataFrame({'datetime_utc': ['2023-01-01 00:00:00+00:00'], 'value': [1.0]}))
+        values_path, _, _ = columnar_dataset_paths(self.csv_path)
+        np.save(values_path, np.zeros((5, 5)))
+
+        with redirect_stdout(StringIO()) as output:
+            df = read_dataset(self.csv_path)
+
+        self.assertIn('Warning', output.getvalue())
+        self.assertEqual(df['value'].tolist(), [1.0])
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run dataset loading benchmarks")
+    def test_load_time(self):
+        """Print the load time of 5 years of hourly data from CSV vs the binary copy"""
+        sample = pd.read_csv(SAMPLE_DATA)
+        n_rows = 5 * 365 * 24
+        df = pd.DataFrame(
+            np.tile(sample.drop(columns=['datetime_utc']).values, (n_rows // len(sample) + 1, 1))[:n_rows],
+            columns=sample.columns[1:]
+        )
+        df.insert(0, 'datetime_utc', pd.date_range('2020-01-01', periods=n_rows, freq='h', tz='UTC'))
+        self._write(df)
+        repeats = 5
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            csv_df = pd.read_csv(self.csv_path)
+            csv_df['datetime_utc'] = pd.to_datetime(csv_df['datetime_utc'])
+        csv_ms = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            read_columnar_dataset(self.csv_path)
+        binary_ms = (time.perf_counter() - start) / repeats * 1000
+
+        print(f"\n{'format':<10}{'ms':>10}")
+        print(f"{'csv':<10}{csv_ms:>10.1f}")
+        print(f"{'binary':<10}{binary_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
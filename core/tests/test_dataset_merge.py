@@ -0,0 +1,257 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from unittest.mock import patch
+
+from core.utils import dataset_merge
+from core.utils.dataset_merge import SELECTED_GEO, build_merged_dataset, find_source_files, merge_sources
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_dataset_merge.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+
+def legacy_merge(sources):
+    """The groupby + pairwise outer merge MergeDataView did before, as a reference"""
+    data = {}
+    for path, data_id in sources:
+        df = pd.read_csv(path)
+        df['datetime_utc'] = pd.to_datetime(df['datetime_utc'], utc=True)
+        df['hour'] = df['datetime_utc'].dt.floor('h')
+        if 'geo_name' in df.columns:
+            df = df.groupby(['hour', 'geo_name'])['value'].mean().reset_index()
+        else:
+            df = df.groupby('hour')['value'].mean().reset_index()
+        df.rename(columns={'hour': 'datetime_utc'}, inplace=True)
+
+        if 'geo_name' in df.columns:
+            df = df[df['geo_name'].isin(SELECTED_GEO)]
+            if df['geo_name'].nunique() > 1:
+                df = df.pivot_table(index='datetime_utc', columns='geo_name', values='value', aggfunc='first')
+                df = df.rename(columns=lambda g: f"{data_id}_{g}").reset_index()
+                data.setdefault(data_id, []).append(df)
+                continue
+        data.setdefault(data_id, []).append(df[['datetime_utc', 'value']])
+
+    merged = None
+    for data_id, dfs in data.items():
+        combined = pd.concat(dfs, ignore_index=True)
+        combined = combined.sort_values('datetime_utc', kind='stable').drop_duplicates('datetime_utc')
+        combined = combined.rename(columns={'value': data_id})
+        merged = combined if merged is None else pd.merge(merged, combined, on='datetime_utc', how='outer')
+    return merged.sort_values('datetime_utc').reset_index(drop=True)
+
+
+def write_source(path, start, periods, geos=None, freq='5min', seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=periods, freq=freq, tz='UTC')
+    if geos:
+        df = pd.DataFrame({
+            'datetime_utc': np.repeat(index, len(geos)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'geo_name': np.tile(geos, periods),
+            'value': rng.normal(100, 10, periods * len(geos)).round(2),
+        })
+    else:
+        df = pd.DataFrame({'datetime_utc': index.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           'value': rng.normal(50, 5, periods).round(2)})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+
+
+class TestDatasetMerge(unittest.TestCase):
+    """Test cases for the parallel merge of the downloaded CSVs"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+
+        # Two years of a multi-geo indicator, one with a single selected geo and one without geos
+        write_source(os.path.join(self.data_dir, 'price', '600_2023.csv'), '2023-12-30', 600,
+                     geos=['España', 'Portugal', 'Francia'])
+        write_source(os.path.join(self.data_dir, 'price', '600_2024.csv'), '2024-01-01', 600,
+                     geos=['España', 'Portugal', 'Francia'], seed=1)
+        write_source(os.path.join(self.data_dir, 'demand', '460_2024.csv'), '2024-01-01 03:00', 500,
+                     geos=['Península', 'Francia'], seed=2)
+        write_source(os.path.join(self.data_dir, 'solar', '14_2024.csv'), '2024-01-02', 48, freq='h', seed=3)
+        pd.DataFrame({'id': [1]}).to_csv(os.path.join(self.data_dir, 'indicators.csv'), index=False)
+
+    def test_same_result_as_pairwise_merge(self):
+        """Test that the wide table matches the groupby + pairwise merge it replaces"""
+        sources = find_source_files(self.data_dir)
+        expected = legacy_merge(sources)
+
+        result = merge_sources(sources)
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(len(result['processed_files']), 4)
+        pd.testing.assert_frame_equal(result['merged'], expected, check_like=True, check_dtype=False)
+        self.assertEqual(set(result['timings']), {'read_resample', 'assemble'})
+
+    def test_process_pool_same_result(self):
+        """Test that reading the files in worker processes gives the same frame"""
+        sources = find_source_files(self.data_dir)
+
+        pd.testing.assert_frame_equal(merge_sources(sources, workers=2)['merged'],
+                                      merge_sources(sources, workers=1)['merged'])
+
+    def test_unreadable_file_reported(self):
+        """Test that a broken file is an error and the others are still merged"""
+        with open(os.path.join(self.data_dir, 'solar', '14_2023.csv'), 'w') as f:
+            f.write('not,a\nvalid,file\n')
+
+        result = merge_sources(find_source_files(self.data_dir))
+
+        self.assertEqual(len(result['errors']), 1)
+        self.assertIn('14_2023.csv', result['errors'][0])
+        self.assertIn('solar_14', result['merged'].columns)
+
+    def test_no_sources(self):
+        result = merge_sources([])
+
+        self.assertIsNone(result['merged'])
+        self.assertEqual(result['data_ids'], [])
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run merge benchmarks")
+    def test_merge_time(self):
+        """Print the time of merging 14 indicators x 5 years of 5 minute data, pairwise vs concat"""
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        for indicator in range(14):
+            geos = ['Península', 'España', 'Portugal'] if indicator % 2 else None
+            for year in range(2020, 2025):
+                write_source(os.path.join(data_dir, f'category{indicator}', f'{indicator}_{year}.csv'),
+                             f'{year}-01-01', 365 * 24 * 12, geos=geos, seed=indicator * 10 + year)
+        sources = find_source_files(data_dir)
+
+        start = time.perf_counter()
+        legacy_merge(sources)
+        rows = [('pairwise', None, time.perf_counter() - start)]
+        for workers in (1, 4):
+            start = time.perf_counter()
+            result = merge_sources(sources, workers=workers)
+            rows.append((f'concat/{workers}', result['timings'], time.perf_counter() - start))
+
+        print(f"\n{'merge':<12}{'read s':>10}{'assemble s':>12}{'total s':>10}")
+        for name, timings, seconds in rows:
+            read = f"{timings['read_resample']:.2f}" if timings else '-'
+            assemble = f"{timings['assemble']:.2f}" if timings else '-'
+            print(f"{name:<12}{read:>10}{assemble:>12}{seconds:>10.2f}")
+
+
+class TestIncrementalMerge(unittest.TestCase):
+    """Test cases for the manifest driven merge that only recomputes changed sources"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.output_file = os.path.join(self.data_dir, 'merged_dataset.csv')
+
+        write_source(os.path.join(self.data_dir, 'price', '600_2023.csv'), '2023-12-30', 600,
+                     geos=['España', 'Portugal', 'Francia'])
+        write_source(os.path.join(self.data_dir, 'price', '600_2024.csv'), '2024-01-01', 600,
+                     geos=['España', 'Portugal'], seed=1)
+        write_source(os.path.join(self.data_dir, 'solar', '14_2024.csv'), '2024-01-01', 60, freq='h', seed=3)
+        build_merged_dataset(self.data_dir)
+
+    def assert_same_as_full_merge(self):
+        expected = merge_sources(find_source_files(self.data_dir))['merged']
+        written = pd.read_csv(self.output_file)
+        written['datetime_utc'] = pd.to_datetime(written['datetime_utc'])
+
+        pd.testing.assert_frame_equal(written, expected, check_like=True, check_dtype=False)
+
+    def read_files(self, data_dir, **kwargs):
+        """Run build_merged_dataset and return it plus the files it parsed"""
+        with patch.object(dataset_merge, 'hourly_source', wraps=dataset_merge.hourly_source) as hourly:
+            result = build_merged_dataset(data_dir, **kwargs)
+        return result, sorted(os.path.basename(call.args[0]) for call in hourly.call_args_list)
+
+    def test_unchanged_sources_read_nothing(self):
+        """Test that a merge without changes reads no source and leaves the file alone"""
+        mtime = os.stat(self.output_file).st_mtime_ns
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'unchanged')
+        self.assertEqual(read, [])
+        self.assertEqual(os.stat(self.output_file).st_mtime_ns, mtime)
+
+    def test_touched_file_is_not_changed(self):
+        """Test that a new mtime with the same content doesn't trigger a merge"""
+        path = os.path.join(self.data_dir, 'solar', '14_2024.csv')
+        os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'unchanged')
+        self.assertEqual(read, [])
+
+    def test_grown_file_is_appended(self):
+        """Test that new hours of the current year only re-read that year and extend the CSV"""
+        write_source(os.path.join(self.data_dir, 'solar', '14_2024.csv'), '2024-01-01', 120, freq='h', seed=3)
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertEqual(read, ['14_2024.csv'])
+        self.assertTrue(result['appended'])
+        self.assert_same_as_full_merge()
+
+    def test_revised_values_are_patched(self):
+        """Test that changing a year that overlaps another re-reads both and matches a full merge"""
+        write_source(os.path.join(self.data_dir, 'price', '600_2023.csv'), '2023-12-30', 400,
+                     geos=['España', 'Portugal', 'Francia'], seed=7)
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertEqual(read, ['600_2023.csv', '600_2024.csv'])
+        self.assert_same_as_full_merge()
+
+    def test_new_indicator_adds_columns(self):
+        write_source(os.path.join(self.data_dir, 'wind', '10_2024.csv'), '2024-01-01 12:00', 30, freq='h', seed=4)
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertEqual(read, ['10_2024.csv'])
+        self.assertFalse(result['appended'])
+        self.assert_same_as_full_merge()
+
+    def test_deleted_source_merges_everything(self):
+        os.remove(os.path.join(self.data_dir, 'solar', '14_2024.csv'))
+
+        result, read = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'full')
+        self.assertEqual(read, ['600_2023.csv', '600_2024.csv'])
+        self.assert_same_as_full_merge()
+
+    def test_edited_output_merges_everything(self):
+        """Test that a merged file the manifest doesn't describe isn't patched"""
+        with open(self.output_file, 'a') as f:
+            f.write('\n')
+
+        result, _ = self.read_files(self.data_dir)
+
+        self.assertEqual(result['mode'], 'full')
+        self.assert_same_as_full_merge()
+
+    def test_manifest_records_hours(self):
+        with open(os.path.join(self.data_dir, 'merge_manifest.json')) as f:
+            entry = json.load(f)['sources']['solar/14_2024.csv']
+
+        self.assertEqual(entry['data_id'], 'solar_14')
+        self.assertEqual(entry['columns'], ['solar_14'])
+        self.assertEqual(entry['hour_start'], '2024-01-01T00:00:00+00:00')
+        self.assertEqual(entry['hour_end'], '2024-01-03T11:00:00+00:00')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from core.utils.download_jobs import enqueue_download_job, fail_stale_download_jobs, run_job, run_worker
+from core.utils.training_jobs import claim_next_job
+from core.utils.esios import DATA_TO_DOWNLOAD
+from test_esios_client import StubEsiosServerMixin
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+DownloadJob = apps.get_model('core', 'DownloadJob')
+
+
+@override_settings(ROOT_URLCONF='core.urls', ESIOS_REQUESTS_PER_SECOND=None, ESIOS_DOWNLOAD_WORKERS=4,
+                   DOWNLOAD_JOBS_EAGER=False)
+class TestDownloadJobs(StubEsiosServerMixin, APITestCase):
+    """Test cases for the background ESIOS downloads, against the stub server"""
+
+    def setUp(self):
+        self.start_stub_server()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.client = APIClient()
+
+    def _run_worker(self, **overrides):
+        with override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint, **overrides):
+            return run_worker(once=True)
+
+    def test_post_queues_job(self):
+        """Test that the download is queued and the token isn't echoed back"""
+        response = self.client.post('/data/download/', {
+            'esios_token': 'test-token', 'years_back': 1
+        }, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], DownloadJob.STATUS_QUEUED)
+        self.assertTrue(response.data['status_url'].endswith(f"/data/download/{response.data['job_id']}/"))
+        self.assertNotIn('test-token', str(response.data))
+        self.assertEqual(self.server.requests, 0)
+
+        job = DownloadJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.esios_token, 'test-token')
+        self.assertEqual(job.years_back, 1)
+
+    def test_worker_reports_progress(self):
+        """Test that the worker downloads every month and records per-indicator progress"""
+        job_id = self.client.post('/data/download/', {
+            'esios_token': 'test-token', 'years_back': 1
+        }, format='json').data['job_id']
+
+        self.assertEqual(self._run_worker(), 1)
+
+        response = self.client.get(f'/data/download/{job_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], DownloadJob.STATUS_SUCCEEDED, response.data['error'])
+        self.assertNotIn('esios_token', response.data)
+
+        today = datetime.today()
+        n_months = 12 + today.month
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        progress = response.data['progress']
+        self.assertEqual(progress['stage'], 'done')
+        self.assertEqual(progress['total_months'], n_indicators * n_months)
+        self.assertEqual(progress['done_months'], n_indicators * n_months)
+        self.assertEqual(progress['failed_months'], 0)
+        self.assertEqual(progress['eta_seconds'], 0)
+        self.assertGreater(progress['bytes'], 0)
+        self.assertEqual(progress['indicators']['600']['category'], 'price/daily_spot_market')
+        self.assertEqual(progress['indicators']['600']['months'][f'{today.year}-{today.month:02d}'], 'done')
+        self.assertIn('indicators.csv', response.data['result']['downloaded_files'])
+        # The job runs the fetch step of the ingestion pipeline, with its stage timings
+        self.assertGreater(response.data['result']['timings']['fetch'], 0)
+
+        job = DownloadJob.objects.get(pk=job_id)
+        self.assertEqual(job.esios_token, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_month_recorded(self):
+        """Test that a month that keeps failing is marked without failing the whole job"""
+        year = datetime.today().year
+        self.server.failures['/indicators/600'] = [500]
+        job = enqueue_download_job('test-token', download_indicators=False, years_back=1)
+
+        self._run_worker(ESIOS_MAX_RETRIES=0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DownloadJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress['failed_months'], 1)
+        self.assertEqual(list(job.progress['indicators']['600']['months'].values()).count('failed'), 1)
+        self.assertEqual(len(job.progress['errors']), 1)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.tmp_dir, 'data', 'price', 'daily_spot_market', f'600_{year}.csv')))
+
+    def test_job_fails_when_nothing_downloaded(self):
+        """Test that a job whose every request failed ends as failed"""
+        self.server.failures = {
+            f'/indicators/{indicator_id}': [500] * 30
+            for indicator_ids in DATA_TO_DOWNLOAD.values() for indicator_id in indicator_ids
+        }
+        self.server.failures['/indicators'] = [500]
+        job = enqueue_download_job('test-token', years_back=1)
+
+        self._run_worker(ESIOS_MAX_RETRIES=0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DownloadJob.STATUS_FAILED)
+        self.assertIn('La descarga ha fallado', job.error)
+        self.assertEqual(job.esios_token, '')
+
+    def test_stale_job_failed(self):
+        """Test that a running download without heartbeats is marked as failed"""
+        job = enqueue_download_job('test-token')
+        DownloadJob.objects.filter(id=job.id).update(
+            status=DownloadJob.STATUS_RUNNING, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(fail_stale_download_jobs(stale_after=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DownloadJob.STATUS_FAILED)
+        self.assertIn('descarga', job.error)
+        # A crashed worker never got to clear the token, failing the job does
+        self.assertEqual(job.esios_token, '')
+
+    def test_stale_failed_job_keeps_status(self):
+        """Test that a job failed as stale while it ran isn't marked as succeeded when it ends"""
+        enqueue_download_job('test-token', download_indicators=False, years_back=1)
+        job = claim_next_job('worker-a', job_model=DownloadJob)
+        DownloadJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        fail_stale_download_jobs(stale_after=60)
+
+        with override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint):
+            job = run_job(job)
+
+        self.assertEqual(job.status, DownloadJob.STATUS_FAILED)
+        self.assertIn('dejó de responder', job.error)
+        self.assertIsNone(job.result)
+
+    def test_job_not_found(self):
+        """Test that an unknown job id returns 404"""
+        response = self.client.get('/data/download/999/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error'], 'Trabajo de descarga no encontrado')
@@ -0,0 +1,99 @@
+import unittest
+import os
+import time
+
+import numpy as np
+
+from core.utils.downsampling import lttb_indices, minmax_buckets
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_downsampling.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+
+def random_walks(n_rows, n_series, seed=0):
+    return np.cumsum(np.random.default_rng(seed).normal(size=(n_rows, n_series)), axis=0)
+
+
+class TestLTTB(unittest.TestCase):
+    """Test cases for the shared-row Largest-Triangle-Three-Buckets"""
+
+    def test_keeps_ends_and_order(self):
+        values = random_walks(1000, 3)
+
+        indices = lttb_indices(values, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_keeps_spike(self):
+        """Test that a one-row spike of a small series survives next to a large one"""
+        values = np.column_stack([np.linspace(0, 30000, 1000), np.zeros(1000)])
+        values[437, 1] = 5.0
+
+        self.assertIn(437, lttb_indices(values, 50))
+
+    def test_short_series_unchanged(self):
+        np.testing.assert_array_equal(lttb_indices(random_walks(10, 2), 50), np.arange(10))
+
+    def test_nan_values(self):
+        values = random_walks(500, 2)
+        values[100:300, 0] = np.nan
+        values[:, 1] = np.nan
+
+        indices = lttb_indices(values, 40)
+
+        self.assertEqual(len(indices), 40)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+
+class TestMinMaxBuckets(unittest.TestCase):
+    """Test cases for the min/max bucket downsampling"""
+
+    def test_envelope(self):
+        """Test that every series keeps its extremes within max_points rows"""
+        values = random_walks(1001, 4)
+
+        positions, out = minmax_buckets(values, 100)
+
+        self.assertLessEqual(len(positions), 100)
+        self.assertEqual(len(positions), len(out))
+        self.assertTrue(np.all(np.diff(positions) > 0))
+        np.testing.assert_array_equal(out.max(axis=0), values.max(axis=0))
+        np.testing.assert_array_equal(out.min(axis=0), values.min(axis=0))
+
+    def test_order_within_bucket(self):
+        """Test that the extreme that happens first goes first"""
+        values = np.array([[5.0], [1.0], [3.0], [0.0], [9.0], [4.0]])
+
+        positions, out = minmax_buckets(values, 4)
+
+        np.testing.assert_array_equal(positions, [0, 2, 3, 5])
+        np.testing.assert_array_equal(out[:, 0], [5.0, 1.0, 0.0, 9.0])
+
+    def test_all_nan_bucket(self):
+        values = np.arange(8, dtype=np.float64)[:, None]
+        values[:4] = np.nan
+
+        positions, out = minmax_buckets(values, 4)
+
+        self.assertTrue(np.isnan(out[:2]).all())
+        np.testing.assert_array_equal(out[2:, 0], [4.0, 7.0])
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run downsampling benchmarks")
+    def test_downsampling_time(self):
+        """Print the time to downsample 1-5 years of 18 hourly series to 1000 points"""
+        print(f"\n{'rows':<10}{'lttb ms':>10}{'minmax ms':>12}")
+        for years in (1, 5):
+            values = random_walks(years * 8760, 18)
+            start = time.perf_counter()
+            lttb_indices(values, 1000)
+            lttb_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            minmax_buckets(values, 1000)
+            minmax_ms = (time.perf_counter() - start) * 1000
+            print(f"{len(values):<10}{lttb_ms:>10.1f}{minmax_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,406 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from unittest.mock import patch
+
+import pandas as pd
+import requests
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from core.ingestion import EsiosFetcher
+from core.utils.esios import EsiosClient, TokenBucket, esios_headers, DATA_TO_DOWNLOAD
+from core.utils.esios_sync import EMPTY_MONTH, EsiosManifest, merge_months_into_yearly_file, month_fingerprint
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_esios_client.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+
+class StubEsiosHandler(BaseHTTPRequestHandler):
+    """Answers like the ESIOS indicators API, failures are queued per path"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes, don't let delayed ACKs stall keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.requests += 1
+            server.ports.add(self.client_address[1])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failures = server.failures.get(url.path)
+            failure = failures.pop(0) if failures else None
+
+        try:
+            time.sleep(server.latency)
+            if failure is not None:
+                self._send(failure, {'message': 'error'}, {'Retry-After': '0'} if failure == 429 else {})
+            elif url.path in server.empty_paths:
+                self._send(200, {'indicator': {'values': []}})
+            elif url.path == '/indicators':
+                self._send(200, {'indicators': [{'id': 600, 'name': 'Precio', 'description': '<p>Precio</p>'}]})
+            else:
+                start_date = parse_qs(url.query)['start_date'][0]
+                self._send(200, {'indicator': {'values': [
+                    {'value': server.value, 'datetime': f'{start_date}:00.000+01:00',
+                     'datetime_utc': f'{start_date}:00Z', 'geo_name': 'España'},
+                ]}})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status_code, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubEsiosServerMixin:
+    """Starts a local stub ESIOS server per test"""
+
+    def start_stub_server(self, latency=0.0):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubEsiosHandler)
+        server.daemon_threads = True
+        server.lock = threading.Lock()
+        server.requests = 0
+        server.ports = set()
+        server.in_flight = 0
+        server.max_in_flight = 0
+        server.failures = {}
+        # Indicators answered without values
+        server.empty_paths = set()
+        server.latency = latency
+        server.value = 1.0
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        self.base_endpoint = f'http://127.0.0.1:{server.server_address[1]}/indicators'
+        return server
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for the request rate limiter"""
+
+    def test_rate_enforced(self):
+        """Test that acquires past the burst wait for new tokens"""
+        bucket = TokenBucket(rate=20, capacity=1)
+
+        start = time.perf_counter()
+        for _ in range(11):
+            bucket.acquire()
+
+        self.assertGreaterEqual(time.perf_counter() - start, 0.45)
+
+
+class TestEsiosClient(StubEsiosServerMixin, unittest.TestCase):
+    """Test cases for EsiosClient against a local stub server"""
+
+    def setUp(self):
+        self.start_stub_server()
+
+    def _client(self, **kwargs):
+        client = EsiosClient(esios_headers('test-token'), backoff=0, requests_per_second=None, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_retries_rate_limit_and_server_errors(self):
+        """Test that 429 and 5xx answers are retried until the request succeeds"""
+        self.server.failures['/indicators'] = [429, 503]
+
+        data = self._client().get_json(self.base_endpoint)
+
+        self.assertEqual(data['indicators'][0]['id'], 600)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_max_retries(self):
+        """Test that the last error is raised once the retries are spent"""
+        self.server.failures['/indicators'] = [503, 503, 503]
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self._client(max_retries=2).get_json(self.base_endpoint)
+
+        self.assertEqual(self.server.requests, 3)
+
+    def test_client_errors_not_retried(self):
+        """Test that a 4xx other than 429 fails straight away"""
+        self.server.failures['/indicators'] = [401]
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self._client().get_json(self.base_endpoint)
+
+        self.assertEqual(self.server.requests, 1)
+
+    def test_connection_reused(self):
+        """Test that requests of a thread share one keep-alive connection"""
+        client = self._client()
+
+        for _ in range(5):
+            client.get_json(self.base_endpoint)
+
+        self.assertEqual(len(self.server.ports), 1)
+
+
+@override_settings(ROOT_URLCONF='core.urls', ESIOS_REQUESTS_PER_SECOND=None, ESIOS_DOWNLOAD_WORKERS=4,
+                   DOWNLOAD_JOBS_EAGER=True)
+class TestConcurrentDownload(StubEsiosServerMixin, APITestCase):
+    """DownloadDataView against the stub server"""
+
+    def setUp(self):
+        self.start_stub_server(latency=0.02)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def test_download_bounded_parallelism(self):
+        """Test that every month is saved and at most ESIOS_DOWNLOAD_WORKERS requests run at once"""
+        with override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint):
+            response = APIClient().post('/data/download/', {
+                'esios_token': 'test-token', 'download_indicators': True, 'years_back': 1
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        self.assertIn('indicators.csv', response.data['downloaded_files'])
+        self.assertEqual(len(response.data['downloaded_files']), 1 + n_indicators * 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'data', 'price', 'daily_spot_market')))
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    def test_selected_indicators_only(self):
+        """Test that a fetcher given some indicators only plans those"""
+        fetcher = EsiosFetcher(os.path.join(self.tmp_dir, 'data'), indicators={'price/daily_spot_market': [600]})
+
+        plan = fetcher.plan_download(fetcher.data_dir, years_back=1)
+
+        self.assertEqual({(category, indicator_id) for category, indicator_id, *_ in plan},
+                         {('price/daily_spot_market', 600)})
+        self.assertEqual(EsiosFetcher().DATA_TO_DOWNLOAD, DATA_TO_DOWNLOAD)
+
+    def test_client_closed_when_download_fails(self):
+        """Test that the pooled sessions are closed when the download raises halfway"""
+        fetcher = EsiosFetcher(os.path.join(self.tmp_dir, 'data'), {'ESIOS_BASE_ENDPOINT': self.base_endpoint})
+
+        with patch.object(EsiosClient, 'close') as mock_close, \
+                patch.object(fetcher, 'plan_download', side_effect=RuntimeError("plan failed")):
+            with self.assertRaises(RuntimeError):
+                fetcher.run_download('test-token', download_indicators=True, years_back=1)
+
+        mock_close.assert_called_once_with()
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run download benchmarks")
+    def test_wall_clock_vs_serial(self):
+        """Print the time of a one year download with 50 ms per request, serial vs 6 workers"""
+        self.server.latency = 0.05
+        rows = []
+        for workers in (1, 6):
+            with override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint,
+                                   ESIOS_DOWNLOAD_WORKERS=workers):
+                start = time.perf_counter()
+                APIClient().post('/data/download/', {
+                    'esios_token': 'test-token', 'download_indicators': False, 'years_back': 1
+                }, format='json')
+                rows.append((workers, time.perf_counter() - start))
+
+        print(f"\n{'workers':<10}{'seconds':>10}")
+        for workers, seconds in rows:
+            print(f"{workers:<10}{seconds:>10.2f}")
+
+
+class TestEsiosManifest(unittest.TestCase):
+    """Test cases for the manifest of downloaded months"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.file_path = os.path.join(self.tmp_dir, 'price', '600_2024.csv')
+
+    def _month(self, month, value):
+        return pd.DataFrame({
+            'datetime': [f'2024-{month:02d}-01T00:00:00.000+01:00', f'2024-{month:02d}-02T00:00:00.000+01:00'],
+            'value': [value, value],
+        })
+
+    def test_open_and_closed_months(self):
+        """Test that only months fetched settle_days after their end are skipped"""
+        manifest = EsiosManifest.load(self.tmp_dir)
+        merge_months_into_yearly_file(self.file_path, 2024, {1: self._month(1, 1.0), 2: self._month(2, 1.0)})
+        manifest.record(600, 2024, 1, month_fingerprint(self._month(1, 1.0)), datetime(2024, 2, 20))
+        manifest.record(600, 2024, 2, month_fingerprint(self._month(2, 1.0)), datetime(2024, 3, 2))
+        manifest.save()
+
+        manifest = EsiosManifest.load(self.tmp_dir)
+
+        self.assertEqual(manifest.months_to_fetch(600, 2024, [1, 2, 3], self.file_path, 7), [2, 3])
+        os.remove(self.file_path)
+        self.assertEqual(manifest.months_to_fetch(600, 2024, [1, 2, 3], self.file_path, 7), [1, 2, 3])
+
+    def test_closed_empty_months_skipped_without_file(self):
+        """Test that a closed month that came back empty isn't fetched again, though no file was written"""
+        manifest = EsiosManifest.load(self.tmp_dir)
+        manifest.record(600, 2024, 1, EMPTY_MONTH, datetime(2024, 2, 20))
+        manifest.record(600, 2024, 2, EMPTY_MONTH, datetime(2024, 3, 2))
+
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertEqual(manifest.months_to_fetch(600, 2024, [1, 2, 3], self.file_path, 7), [2, 3])
+
+    def test_merge_replaces_only_refreshed_months(self):
+        """Test that merging a month keeps the rows of the other months"""
+        merge_months_into_yearly_file(self.file_path, 2024, {1: self._month(1, 1.0), 2: self._month(2, 1.0)})
+
+        merge_months_into_yearly_file(self.file_path, 2024, {2: self._month(2, 5.0), 3: self._month(3, 5.0)})
+
+        merged = pd.read_csv(self.file_path)
+        self.assertEqual(merged['value'].tolist(), [1.0, 1.0, 5.0, 5.0, 5.0, 5.0])
+        self.assertEqual(merged['datetime'].str[:7].tolist(), ['2024-01'] * 2 + ['2024-02'] * 2 + ['2024-03'] * 2)
+
+    def test_merge_streams_one_month_at_a_time(self):
+        """Test that the file is rewritten in order while reading it a row at a time, loading each month when written"""
+        merge_months_into_yearly_file(self.file_path, 2024, {month: self._month(month, 1.0) for month in (2, 3, 5)})
+        loaded = []
+
+        def loader(month, value):
+            def load():
+                loaded.append(month)
+                return self._month(month, value)
+            return load
+
+        merge_months_into_yearly_file(self.file_path, 2024, {
+            month: loader(month, 5.0) for month in (1, 3, 4, 6)
+        }, chunksize=1)
+
+        merged = pd.read_csv(self.file_path)
+        self.assertEqual(loaded, [1, 3, 4, 6])
+        self.assertEqual(merged['datetime'].str[5:7].tolist(), [f'{m:02d}' for m in (1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6)])
+        self.assertEqual(merged['value'].tolist(), [5.0, 5.0, 1.0, 1.0, 5.0, 5.0, 5.0, 5.0, 1.0, 1.0, 5.0, 5.0])
+        self.assertEqual(list(merged.columns), ['datetime', 'value'])
+
+    def test_changed_by_content_hash(self):
+        """Test that a month downloaded again with the same rows isn't a change"""
+        manifest = EsiosManifest.load(self.tmp_dir)
+        manifest.record(600, 2024, 1, month_fingerprint(self._month(1, 1.0)), datetime(2024, 2, 20))
+
+        self.assertFalse(manifest.changed(600, 2024, 1, month_fingerprint(self._month(1, 1.0))))
+        self.assertTrue(manifest.changed(600, 2024, 1, month_fingerprint(self._month(1, 2.0))))
+        self.assertTrue(manifest.changed(600, 2024, 2, month_fingerprint(self._month(2, 1.0))))
+
+
+@override_settings(ROOT_URLCONF='core.urls', ESIOS_REQUESTS_PER_SECOND=None, ESIOS_DOWNLOAD_WORKERS=4,
+                   DOWNLOAD_JOBS_EAGER=True)
+class TestIncrementalSync(StubEsiosServerMixin, APITestCase):
+    """DownloadDataView in sync mode against the stub server"""
+
+    def setUp(self):
+        self.start_stub_server()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def _sync(self):
+        with override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint):
+            response = APIClient().post('/data/download/', {
+                'esios_token': 'test-token', 'download_indicators': False, 'years_back': 1, 'sync': True
+            }, format='json')
+        self.assertIn(response.status_code, (200, 207), response.data)
+        return response.data
+
+    def test_second_sync_only_fetches_open_months(self):
+        """Test that a sync right after another only asks for the months that are still open"""
+        first = self._sync()
+        first_requests = self.server.requests
+
+        second = self._sync()
+        second_requests = self.server.requests - first_requests
+
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        self.assertEqual(first['skipped_months'], 0)
+        self.assertEqual(first['fetched_months'], first_requests)
+        self.assertGreater(second['skipped_months'], 0)
+        self.assertEqual(second['fetched_months'], second_requests)
+        # Only the current month and, during the settle days, the previous one
+        self.assertLessEqual(second_requests, n_indicators * 2)
+        # Nothing changed upstream, no file is rewritten
+        self.assertEqual(second['downloaded_files'], [])
+
+    def test_empty_indicator_not_refetched(self):
+        """Test that the closed months of an indicator without values aren't asked for again"""
+        self.server.empty_paths.add('/indicators/600')
+        first = self._sync()
+        first_requests = self.server.requests
+
+        second = self._sync()
+        second_requests = self.server.requests - first_requests
+
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        self.assertEqual(first['fetched_months'], first_requests)
+        self.assertEqual(second['fetched_months'], second_requests)
+        self.assertLessEqual(second_requests, n_indicators * 2)
+        self.assertFalse(os.path.exists(os.path.join(
+            self.tmp_dir, 'data', 'price', 'daily_spot_market', f'600_{datetime.today().year}.csv')))
+        manifest = EsiosManifest.load(os.path.join(self.tmp_dir, 'data'))
+        self.assertTrue(manifest.is_empty(600, datetime.today().year, 1))
+
+    def test_sync_merges_changed_open_month(self):
+        """Test that new values of an open month land in the yearly file, older months stay"""
+        self._sync()
+        self.server.value = 2.0
+
+        data = self._sync()
+
+        today = datetime.today()
+        file_path = os.path.join(self.tmp_dir, 'data', 'price', 'daily_spot_market', f'600_{today.year}.csv')
+        self.assertIn(f'price/daily_spot_market/600_{today.year}.csv', data['downloaded_files'])
+        yearly = pd.read_csv(file_path)
+        current = yearly['datetime'].str[:7] == f'{today.year}-{today.month:02d}'
+        self.assertEqual(yearly.loc[current, 'value'].tolist(), [2.0])
+        if today.month > 2:
+            self.assertIn(1.0, yearly.loc[~current, 'value'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from core.utils.esios_stream import (
+    iter_json_array, compact_values, expand_values, write_chunk, read_chunk, read_expanded_chunk, write_yearly_file
+)
+from core.utils.esios_sync import merge_months_into_yearly_file
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_esios_stream.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+GEOS = [(8741, 'Península'), (3, 'España'), (1, 'Portugal'), (8742, 'Canarias'),
+        (8743, 'Baleares'), (8744, 'Ceuta'), (8745, 'Melilla')]
+
+
+def month_response(year, month, geos=GEOS, step_minutes=5):
+    """ESIOS-like body of a month of five minute values for every geo"""
+    start = pd.Timestamp(year=year, month=month, day=1, tz='Europe/Madrid')
+    end = start + pd.offsets.MonthBegin(1)
+    local = pd.date_range(start, end, freq=f'{step_minutes}min', inclusive='left')
+    values = [
+        {'value': float(i % 1000) + 0.25, 'datetime': ts.isoformat(timespec='milliseconds'),
+         'datetime_utc': ts.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ'),
+         'tz_time': ts.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+         'geo_id': geo_id, 'geo_name': geo_name}
+        for i, ts in enumerate(local) for geo_id, geo_name in geos
+    ]
+    return {'indicator': {'name': 'Precio "values" mercado', 'id': 600, 'values_updated_at': None,
+                          'values': values, 'geos': [{'geo_id': g, 'geo_name': n} for g, n in geos]}}
+
+
+def split(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestJsonArrayStream(unittest.TestCase):
+    """Test cases for the incremental parser of the values array"""
+
+    def test_items_at_any_chunk_boundary(self):
+        """Test that the same items come out however the body is cut"""
+        body = json.dumps(month_response(2024, 2, geos=GEOS[:2], step_minutes=360)).encode()
+        expected = month_response(2024, 2, geos=GEOS[:2], step_minutes=360)['indicator']['values']
+
+        for size in (1, 2, 7, 64, len(body)):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_array(split(body, size), 'values')), expected)
+
+    def test_multibyte_characters_split(self):
+        """Test that UTF-8 characters cut between chunks are decoded"""
+        body = json.dumps({'values': [{'geo_name': 'Península'}]}, ensure_ascii=False).encode()
+
+        self.assertEqual(list(iter_json_array(split(body, 1), 'values')), [{'geo_name': 'Península'}])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b'{"indicator": {"values": []}}'], 'values')), [])
+
+    def test_missing_key_raises(self):
+        """Test that an answer without values is an error, not an empty month"""
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"message": "Unauthorized"}'], 'values'))
+
+    def test_truncated_body_raises(self):
+        body = json.dumps({'values': [{'value': 1}, {'value': 2}]}).encode()
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(split(body[:-8], 4), 'values'))
+
+
+class TestCompactValues(unittest.TestCase):
+    """Test cases for the compact month frames and their chunk files"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_compact_dtypes(self):
+        """Test that the month is kept with compact dtypes, across record batches"""
+        records = month_response(2024, 3, step_minutes=60)['indicator']['values']
+        df = compact_values(iter(records), batch_size=100)
+
+        self.assertEqual(len(df), len(records))
+        self.assertEqual(df['value'].dtype, np.float32)
+        self.assertEqual(df['datetime_utc'].dtype, np.int64)
+        self.assertEqual(df['geo_id'].dtype, np.int32)
+        self.assertIsInstance(df['geo_name'].dtype, pd.CategoricalDtype)
+        # The clocks change on the last Sunday of March
+        self.assertEqual(set(df['utc_offset']), {60, 120})
+
+    def test_expand_matches_json_layout(self):
+        """Test that an expanded month has the timestamps of the original records"""
+        records = month_response(2024, 10, geos=GEOS[:1], step_minutes=60)['indicator']['values']
+        expected = pd.json_normalize(records)
+
+        df = expand_values(compact_values(records))
+
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertEqual(df['datetime'].tolist(), expected['datetime'].tolist())
+        self.assertEqual(df['datetime_utc'].tolist(), expected['datetime_utc'].tolist())
+        self.assertEqual(df['tz_time'].tolist(), expected['tz_time'].tolist())
+        self.assertEqual(df['geo_name'].astype(str).tolist(), expected['geo_name'].tolist())
+
+    def test_chunk_round_trip(self):
+        df = compact_values(month_response(2024, 1, step_minutes=120)['indicator']['values'])
+        path = write_chunk(df, os.path.join(self.tmp_dir, '600_2024_01.npz'))
+
+        pd.testing.assert_frame_equal(read_chunk(path), df)
+
+    def test_yearly_file_from_chunks(self):
+        """Test that the yearly CSV holds the months in order and parses like the merge reads it"""
+        paths = [
+            write_chunk(compact_values(month_response(2024, month, step_minutes=180)['indicator']['values']),
+                        os.path.join(self.tmp_dir, f'600_2024_{month:02d}.npz'))
+            for month in (1, 2)
+        ]
+        file_path = os.path.join(self.tmp_dir, 'price', '600_2024.csv')
+
+        write_yearly_file(file_path, paths)
+
+        df = pd.read_csv(file_path)
+        self.assertEqual(len(df), sum(len(read_chunk(path)) for path in paths))
+        self.assertEqual(df['datetime'].str[:7].unique().tolist(), ['2024-01', '2024-02'])
+        self.assertTrue(pd.to_datetime(df['datetime_utc'], utc=True).is_monotonic_increasing)
+        self.assertEqual(df.loc[0, 'value'], 0.25)
+
+    def test_sync_into_legacy_yearly_file(self):
+        """Test that a month synced into a yearly CSV written from json_normalize keeps its columns filled"""
+        file_path = os.path.join(self.tmp_dir, 'price', '600_2024.csv')
+        os.makedirs(os.path.dirname(file_path))
+        legacy = pd.concat([pd.json_normalize(month_response(2024, month, step_minutes=360)['indicator']['values'])
+                            for month in (1, 2)], ignore_index=True)
+        legacy.to_csv(file_path, index=False)
+        refreshed = month_response(2024, 2, step_minutes=360)['indicator']['values']
+        path = write_chunk(compact_values(refreshed), os.path.join(self.tmp_dir, '600_2024_02.npz'))
+
+        merge_months_into_yearly_file(file_path, 2024, {2: lambda: read_expanded_chunk(path)})
+
+        df = pd.read_csv(file_path)
+        expected = pd.read_csv(StringIO(legacy.to_csv(index=False)))
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertFalse(df.isna().any().any())
+        pd.testing.assert_frame_equal(df, expected)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run download memory benchmarks")
+    def test_peak_memory(self):
+        """Print peak memory and time of 1 and 6 months, json_normalize + concat vs streamed chunks"""
+        chunks = split(json.dumps(month_response(2024, 1)).encode(), 64 * 1024)
+
+        def json_path(months):
+            frames = [pd.json_normalize(json.loads(b''.join(chunks))['indicator'], record_path='values')
+                      for _ in range(months)]
+            pd.concat(frames, ignore_index=True).to_csv(os.path.join(self.tmp_dir, 'json.csv'), index=False)
+
+        def stream_path(months):
+            paths = [write_chunk(compact_values(iter_json_array(chunks, 'values')),
+                                 os.path.join(self.tmp_dir, f'{month}.npz'))
+                     for month in range(months)]
+            write_yearly_file(os.path.join(self.tmp_dir, 'stream.csv'), paths)
+
+        print(f"\n{'path':<8}{'months':>8}{'peak MB':>10}{'seconds':>10}")
+        for months in (1, 6):
+            for name, run in (('json', json_path), ('stream', stream_path)):
+                start = time.perf_counter()
+                run(months)
+                seconds = time.perf_counter() - start
+
+                tracemalloc.start()
+                run(months)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{name:<8}{months:>8}{peak / 2 ** 20:>10.1f}{seconds:>10.2f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
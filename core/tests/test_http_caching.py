@@ -0,0 +1,183 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.utils.data_generation import get_data_generation
+from core.utils.timeseries_store import timeseries_store
+from core.utils.training import populate_database_from_csv
+from core.views import PredictView
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+PredictionHistory = apps.get_model('core', 'PredictionHistory')
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@override_settings(ROOT_URLCONF='core.urls', TIME_SERIES_CACHE=True, TIME_SERIES_CACHE_CHECK_SECONDS=3600)
+class TestTimeSeriesConditionalGet(TestCase):
+    """Test cases for the ETag/Last-Modified of /historical/ and /data/latest-date/"""
+
+    def setUp(self):
+        timeseries_store.reset()
+        self.addCleanup(timeseries_store.reset)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.client = APIClient()
+        self.params = {'days': 3, 'end_date': '2024-01-02', 'columns': 'scheduled_demand_372'}
+        self.load(48)
+
+    def load(self, n_hours, offset=0.0):
+        csv_path = os.path.join(self.tmp_dir, 'merged_dataset.csv')
+        pd.DataFrame({
+            'datetime_utc': pd.date_range(START, periods=n_hours, freq='h'),
+            'scheduled_demand_372': [float(n) + offset for n in range(n_hours)],
+        }).to_csv(csv_path, index=False)
+        with redirect_stdout(StringIO()):
+            populate_database_from_csv(csv_path)
+
+    def test_not_modified(self):
+        """Test that a request with the ETag or the Last-Modified of the answer gets a 304"""
+        for url, params in (('/historical/', self.params), ('/data/latest-date/', {})):
+            with self.subTest(url=url):
+                response = self.client.get(url, params)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                etag, last_modified = response['ETag'], response['Last-Modified']
+                self.assertTrue(etag.startswith('"'))
+
+                not_modified = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+                self.assertEqual(not_modified['ETag'], etag)
+
+                since = self.client.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(since.status_code, 304)
+
+    def test_load_changes_etag(self):
+        """Test that a load invalidates the ETag, and the answer is not the cached window of before"""
+        first = self.client.get('/historical/', self.params)
+
+        self.load(48, offset=1000.0)
+        response = self.client.get('/historical/', self.params, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['data'][0]['scheduled_demand_372'], 1000.0)
+
+    def test_error_has_no_validators(self):
+        """Test that an error answer carries no ETag or Last-Modified to revalidate"""
+        response = self.client.get('/historical/', {'days': -1})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_etag_per_representation(self):
+        """Test that the ETag depends on the query string"""
+        rows = self.client.get('/historical/', self.params)
+        columnar = self.client.get('/historical/', {**self.params, 'format': 'columnar'})
+
+        self.assertNotEqual(rows['ETag'], columnar['ETag'])
+        self.assertEqual(
+            self.client.get('/historical/', {**self.params, 'format': 'columnar'}, HTTP_IF_NONE_MATCH=rows['ETag']).status_code,
+            200
+        )
+
+
+@override_settings(ROOT_URLCONF='core.urls')
+class TestPredictionStatsConditionalGet(TestCase):
+    """Test cases for the ETag of /predictions/history/stats/"""
+
+    url = '/predictions/history/stats/'
+
+    def save_prediction(self):
+        # Only the history write, without loading the models
+        view = PredictView.__new__(PredictView)
+        return view._save_prediction_to_history(
+            'linear', 3, 24, START.date(), START, START + timedelta(hours=3),
+            {'scheduled_demand_372': [1.0, 2.0, 3.0]}, [START + timedelta(hours=h) for h in range(1, 4)]
+        )
+
+    def test_prediction_changes_etag(self):
+        """Test that saving a prediction invalidates the ETag, without touching the data generation"""
+        self.save_prediction()
+        first = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        # Deleting rows moves no timestamp, the ETag is the only validator
+        self.assertNotIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            self.save_prediction()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_predictions'], 2)
+        self.assertIsNone(get_data_generation())
+
+    def test_week_window_changes_etag(self):
+        """Test that the ETag moves when a prediction leaves the 7 day count, without writes"""
+        pk = self.save_prediction()
+        PredictionHistory.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(days=6))
+        first = self.client.get(self.url)
+        self.assertEqual(first.json()['recent_predictions_7_days'], 1)
+
+        PredictionHistory.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(days=8))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['recent_predictions_7_days'], 0)
+
+    def test_deleted_prediction_changes_etag(self):
+        """Test that deleting a prediction invalidates the ETag"""
+        self.save_prediction()
+        pk = self.save_prediction()
+        first = self.client.get(self.url)
+
+        PredictionHistory.objects.filter(pk=pk).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_predictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import threading
+import numpy as np
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from core.utils.inference_batching import MicroBatcher, get_inference_batcher
+
+
+class FakeModel:
+    """Model whose output row i is the sum over time of input row i"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs):
+        with self._lock:
+            self.calls.append(inputs.shape[0])
+        if self.fail:
+            raise RuntimeError("forward failed")
+        return inputs.sum(axis=1, keepdims=True)
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Test cases for MicroBatcher"""
+
+    def _predict_concurrently(self, batcher, model, inputs):
+        results = [None] * len(inputs)
+        errors = [None] * len(inputs)
+
+        def call(i):
+            try:
+                results[i] = batcher.predict('dense', model, inputs[i])
+            except Exception as e:
+                errors[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        """Test that requests arriving in the same window are batched and scattered back"""
+        batcher = MicroBatcher(window_ms=2000, max_batch_size=4)
+        model = FakeModel()
+        inputs = [np.full((1, 24, 3), i, dtype=np.float32) for i in range(4)]
+
+        results, errors = self._predict_concurrently(batcher, model, inputs)
+
+        self.assertEqual(model.calls, [4])
+        self.assertEqual(errors, [None] * 4)
+        for i, result in enumerate(results):
+            self.assertEqual(result.shape, (1, 1, 3))
+            np.testing.assert_allclose(result, np.full((1, 1, 3), 24 * i))
+
+    def test_max_batch_size_splits_batches(self):
+        """Test that a full batch is closed and later requests open a new one"""
+        batcher = MicroBatcher(window_ms=50, max_batch_size=2)
+        model = FakeModel()
+        inputs = [np.ones((1, 24, 3), dtype=np.float32) for _ in range(5)]
+
+        results, errors = self._predict_concurrently(batcher, model, inputs)
+
+        self.assertEqual(sum(model.calls), 5)
+        self.assertTrue(all(size <= 2 for size in model.calls))
+        self.assertTrue(all(result is not None for result in results))
+
+    def test_different_input_widths_are_not_mixed(self):
+        """Test that only requests with the same input width are stacked"""
+        batcher = MicroBatcher(window_ms=50, max_batch_size=8)
+        model = FakeModel()
+        inputs = [np.ones((1, 24, 3), dtype=np.float32), np.ones((1, 48, 3), dtype=np.float32)]
+
+        results, errors = self._predict_concurrently(batcher, model, inputs)
+
+        self.assertEqual(sorted(model.calls), [1, 1])
+        np.testing.assert_allclose(results[0], np.full((1, 1, 3), 24))
+        np.testing.assert_allclose(results[1], np.full((1, 1, 3), 48))
+
+    def test_forward_error_reaches_every_caller(self):
+        """Test that a failing batch raises in each waiting request"""
+        batcher = MicroBatcher(window_ms=2000, max_batch_size=3)
+        model = FakeModel(fail=True)
+        inputs = [np.ones((1, 24, 3), dtype=np.float32) for _ in range(3)]
+
+        results, errors = self._predict_concurrently(batcher, model, inputs)
+
+        self.assertTrue(all(isinstance(error, RuntimeError) for error in errors))
+
+    def test_disabled_batcher_calls_model_directly(self):
+        """Test that a zero window bypasses batching"""
+        batcher = MicroBatcher(window_ms=0, max_batch_size=32)
+        model = FakeModel()
+
+        result = batcher.predict('dense', model, np.ones((1, 24, 3), dtype=np.float32))
+
+        self.assertFalse(batcher.enabled)
+        self.assertEqual(model.calls, [1])
+        self.assertEqual(batcher.metrics.as_dict()['batches'], 0)
+        self.assertEqual(result.shape, (1, 1, 3))
+
+    def test_metrics(self):
+        """Test batch-size and queue-wait metrics"""
+        batcher = MicroBatcher(window_ms=2000, max_batch_size=2)
+        model = FakeModel()
+        inputs = [np.ones((1, 24, 3), dtype=np.float32) for _ in range(2)]
+
+        self._predict_concurrently(batcher, model, inputs)
+        metrics = batcher.metrics.as_dict()
+
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['batches'], 1)
+        self.assertEqual(metrics['avg_batch_size'], 2)
+        self.assertEqual(metrics['batch_size_histogram'], {2: 1})
+        self.assertGreaterEqual(metrics['max_queue_wait_ms'], 0)
+        self.assertEqual(metrics['per_model']['dense'], {'requests': 2, 'batches': 1})
+
+
+class TestInferenceMetricsView(APITestCase):
+    """Test cases for InferenceMetricsView"""
+
+    def test_get_metrics(self):
+        """Test that the batcher config and metrics are exposed"""
+        response = APIClient().get('/health/inference/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['config'], get_inference_batcher().config())
+        self.assertIn('avg_queue_wait_ms', response.data['metrics'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import time
+import numpy as np
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+    )
+    django.setup()
+
+# Benchmarks load the real models, so they're opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_inference_benchmark.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+# Other test modules replace tensorflow with a mock, timings would be meaningless then
+TENSORFLOW_MOCKED = isinstance(sys.modules.get('tensorflow'), MagicMock)
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'media', 'models')
+INPUT_HOURS = 24
+ITERATIONS = 50
+
+
+def _median_latency_ms(fn, iterations=ITERATIONS):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run inference benchmarks")
+@unittest.skipIf(TENSORFLOW_MOCKED, "TensorFlow is mocked by another test module, run this file on its own")
+class TestInferenceBenchmark(unittest.TestCase):
+    """Latency of model.predict vs the traced tf.function fast path, per model type"""
+
+    @classmethod
+    def setUpClass(cls):
+        from core.utils.model_registry import load_predictor
+
+        cls.predictor = load_predictor(MODELS_DIR)
+        if cls.predictor is None or not cls.predictor.models:
+            raise unittest.SkipTest(f"No trained models found in {MODELS_DIR}")
+
+        n_features = len(cls.predictor.column_indices)
+        cls.input_data = np.random.default_rng(0).normal(
+            size=(1, INPUT_HOURS, n_features)).astype(np.float32)
+
+    def test_fast_path_vs_model_predict(self):
+        """Print per-model latencies and check both paths agree"""
+        rows = []
+
+        for model_name, model in self.predictor.models.items():
+            self.predictor.fast_inference = True
+            fast = self.predictor.get_forward_fn(model_name, INPUT_HOURS, self.input_data.shape[2])
+            # First call traces the function, keep it out of the timings
+            fast_output = fast(self.input_data)
+
+            keras_output = model.predict(self.input_data, verbose=0)
+            np.testing.assert_allclose(fast_output, keras_output, rtol=1e-4, atol=1e-4)
+
+            keras_ms = _median_latency_ms(lambda: model.predict(self.input_data, verbose=0))
+            fast_ms = _median_latency_ms(lambda: fast(self.input_data))
+            rows.append((model_name, keras_ms, fast_ms))
+
+            self.assertLess(fast_ms, keras_ms)
+
+        print(f"\n{'model':<8}{'predict() ms':>14}{'fast path ms':>14}{'speedup':>10}")
+        for model_name, keras_ms, fast_ms in rows:
+            print(f"{model_name:<8}{keras_ms:>14.3f}{fast_ms:>14.3f}{keras_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    unittest.main()
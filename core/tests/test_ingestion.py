@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from core.ingestion import STAGES, EsiosFetcher, IngestionPipeline, StageTimings
+from test_esios_client import StubEsiosServerMixin
+
+
+class TestStageTimings(unittest.TestCase):
+    """Test cases for the per-stage timings of an ingestion run"""
+
+    def test_hooks_see_every_measurement(self):
+        seen = []
+        timings = StageTimings([lambda stage, seconds: seen.append(stage)])
+
+        timings.add('merge', 1.0)
+        timings.add('fetch', 0.5)
+        with timings.measure('fetch'):
+            pass
+
+        self.assertEqual(seen, ['merge', 'fetch', 'fetch'])
+        self.assertEqual(list(timings.as_dict()), ['fetch', 'merge'])
+        self.assertGreaterEqual(timings.get('fetch'), 0.5)
+
+
+class TestIngestionPipeline(StubEsiosServerMixin, unittest.TestCase):
+    """Test cases for the fetch -> merge pipeline against the stub ESIOS server"""
+
+    def setUp(self):
+        self.start_stub_server()
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+
+    def _fetcher(self):
+        fetcher = EsiosFetcher(self.data_dir, {'ESIOS_BASE_ENDPOINT': self.base_endpoint,
+                                               'ESIOS_REQUESTS_PER_SECOND': None, 'ESIOS_DOWNLOAD_WORKERS': 2})
+        fetcher.DATA_TO_DOWNLOAD = {'price/daily_spot_market': [600], 'energy_generation/solar': [14]}
+        return fetcher
+
+    def test_fetch_and_merge(self):
+        """Test that a run downloads and merges the files and reports every stage to the hooks"""
+        stages = set()
+        pipeline = IngestionPipeline(self.data_dir, self._fetcher(),
+                                     timing_hooks=[lambda stage, seconds: stages.add(stage)])
+
+        results = pipeline.run(['fetch', 'merge'], token='test-token', download_indicators=True, years_back=1)
+
+        self.assertEqual(results['fetch']['errors'], [])
+        self.assertIn('indicators.csv', results['fetch']['downloaded_files'])
+        self.assertEqual(results['merge']['mode'], 'full')
+        merged = pd.read_csv(pipeline.merged_file)
+        self.assertEqual(set(merged.columns), {'datetime_utc', 'daily_spot_market_600', 'solar_14'})
+        self.assertEqual(stages, set(STAGES) - {'load'})
+        self.assertEqual(list(results['timings']), ['fetch', 'normalize', 'resample', 'merge'])
+
+    def test_replaced_step(self):
+        """Test that a step can be swapped and steps run in the order given"""
+        calls = []
+        pipeline = IngestionPipeline(self.data_dir, steps={
+            'merge': lambda pipeline, **options: calls.append(('merge', options)) or 'merged',
+            'load': lambda pipeline, **options: calls.append(('load', options)) or 'loaded',
+        })
+
+        results = pipeline.run(['merge', 'load'], workers=3)
+
+        self.assertEqual(calls, [('merge', {'workers': 3}), ('load', {'workers': 3})])
+        self.assertEqual(results['load'], 'loaded')
+
+    def test_fetch_needs_token(self):
+        with self.assertRaises(ValueError):
+            IngestionPipeline(self.data_dir, self._fetcher()).run(['fetch'])
+
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'indicators.csv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
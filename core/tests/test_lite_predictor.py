@@ -0,0 +1,222 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+        MEDIA_ROOT='/tmp/test_media',
+    )
+    django.setup()
+
+from django.test import override_settings
+from core.utils import lite_predictor
+from core.utils.lite_predictor import LitePredictor
+from core.utils.model_registry import load_predictor, MODEL_NAMES
+
+# Other test modules replace tensorflow with a mock, the parity test needs the real one
+TENSORFLOW_MOCKED = isinstance(sys.modules.get('tensorflow'), MagicMock)
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'media', 'models')
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+
+class FakeInterpreter:
+    """Interpreter whose output is the input summed over features, repeated for 3 labels"""
+
+    instances = 0
+
+    def __init__(self, model_content):
+        FakeInterpreter.instances += 1
+        self.model_content = model_content
+        self.input_shape = None
+        self.invocations = 0
+
+    def get_input_details(self):
+        return [{'index': 0}]
+
+    def get_output_details(self):
+        return [{'index': 1}]
+
+    def resize_tensor_input(self, index, shape):
+        self.input_shape = shape
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        assert list(value.shape) == self.input_shape
+        self.value = value
+
+    def invoke(self):
+        self.invocations += 1
+
+    def get_tensor(self, index):
+        return np.repeat(self.value.sum(axis=2, keepdims=True), 3, axis=2)
+
+
+class TestLitePredictor(unittest.TestCase):
+    """Test cases for the TensorFlow-free LitePredictor"""
+
+    def setUp(self):
+        """Create a predictor with one fake flatbuffer"""
+        FakeInterpreter.instances = 0
+        self.predictor = LitePredictor()
+        self.predictor.models = {'dense': b'flatbuffer'}
+        self.predictor.train_mean = pd.Series([0.0, 0.0, 0.0])
+        self.predictor.train_std = pd.Series([1.0, 1.0, 1.0])
+        self.predictor.column_indices = {
+            'scheduled_demand_372': 0,
+            'daily_spot_market_600_España': 1,
+            'daily_spot_market_600_Portugal': 2
+        }
+
+    @patch.object(lite_predictor, 'Interpreter', FakeInterpreter)
+    def test_predict(self):
+        """Test a prediction through the interpreter"""
+        recent_data = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+
+        result = self.predictor.predict('dense', recent_data, 2)
+
+        self.assertEqual(result['model_used'], 'dense')
+        self.assertEqual(result['predictions']['scheduled_demand_372'], [6.0, 15.0])
+
+    @patch.object(lite_predictor, 'Interpreter', FakeInterpreter)
+    def test_predict_skips_batcher(self):
+        """Test that LiteRT calls run inline, without waiting for a batch window"""
+        self.predictor.batcher = MagicMock()
+
+        result = self.predictor.predict('dense', np.ones((2, 3)), 2)
+
+        self.predictor.batcher.predict.assert_not_called()
+        self.assertEqual(result['predictions']['scheduled_demand_372'], [3.0, 3.0])
+        self.assertFalse(self.predictor.is_batchable('dense'))
+
+    @patch.object(lite_predictor, 'Interpreter', FakeInterpreter)
+    def test_interpreter_cached_per_input_width(self):
+        """Test that an interpreter is allocated once per input width"""
+        self.predictor.predict('dense', np.ones((2, 3)), 1)
+        self.predictor.predict('dense', np.ones((2, 3)), 1)
+        self.predictor.predict('dense', np.ones((4, 3)), 1)
+
+        self.assertEqual(FakeInterpreter.instances, 2)
+
+    @patch.object(lite_predictor, 'Interpreter', FakeInterpreter)
+    def test_forward_runs_batches_row_by_row(self):
+        """Test that micro-batches work with flatbuffers exported for batch 1"""
+        forward = self.predictor.get_forward_fn('dense', 2, 3)
+
+        outputs = forward(np.stack([np.ones((2, 3)), 2 * np.ones((2, 3))]).astype(np.float32))
+
+        self.assertEqual(outputs.shape, (2, 2, 3))
+        np.testing.assert_allclose(outputs[1], np.full((2, 3), 6.0))
+
+    @patch.object(lite_predictor, 'Interpreter', None)
+    def test_load_without_runtime(self):
+        """Test the error when no LiteRT runtime is installed"""
+        with self.assertRaises(ImportError):
+            LitePredictor.load('/tmp/models', MODEL_NAMES)
+
+    @patch.object(lite_predictor, 'Interpreter', FakeInterpreter)
+    def test_registry_selects_tflite_backend(self):
+        """Test that PREDICTION_BACKEND='tflite' loads the flatbuffers"""
+        models_dir = tempfile.mkdtemp()
+        try:
+            pd.to_pickle({
+                'train_mean': self.predictor.train_mean,
+                'train_std': self.predictor.train_std,
+                'column_indices': self.predictor.column_indices,
+            }, os.path.join(models_dir, 'normalization_params.pkl'))
+            with open(os.path.join(models_dir, 'lstm_model.tflite'), 'wb') as f:
+                f.write(b'lstm flatbuffer')
+
+            with override_settings(PREDICTION_BACKEND='tflite'):
+                predictor = load_predictor(models_dir)
+        finally:
+            shutil.rmtree(models_dir)
+
+        self.assertIsInstance(predictor, LitePredictor)
+        self.assertEqual(predictor.models, {'lstm': b'lstm flatbuffer'})
+        self.assertIsNotNone(predictor.batcher)
+
+
+@unittest.skipIf(TENSORFLOW_MOCKED, "TensorFlow is mocked by another test module, run this file on its own")
+@unittest.skipIf(lite_predictor.Interpreter is None, "No LiteRT runtime installed")
+class TestLitePredictorParity(unittest.TestCase):
+    """The TFLite exports must predict what the Keras models predict"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.keras_predictor = load_predictor(MODELS_DIR)
+        if cls.keras_predictor is None or not cls.keras_predictor.models:
+            raise unittest.SkipTest(f"No trained models found in {MODELS_DIR}")
+
+        cls.export_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(MODELS_DIR, 'normalization_params.pkl'), cls.export_dir)
+        cls.exported = cls.keras_predictor.export_tflite(cls.export_dir)
+        cls.lite_predictor = LitePredictor.load(cls.export_dir, MODEL_NAMES)
+
+        sample_data = pd.read_csv(SAMPLE_DATA)
+        cls.recent_data = sample_data.drop(columns=['datetime_utc']).values
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.export_dir, ignore_errors=True)
+
+    def test_every_model_exported(self):
+        """Test that all four model families convert"""
+        self.assertEqual(sorted(self.exported), sorted(self.keras_predictor.models.keys()))
+
+    def test_predictions_match_keras(self):
+        """Test predictions of both backends within tolerance at several input widths"""
+        for model_name in self.exported:
+            for input_hours in (3, 24, 168):
+                with self.subTest(model=model_name, input_hours=input_hours):
+                    recent_data = self.recent_data[-input_hours:]
+                    keras_result = self.keras_predictor.predict(model_name, recent_data, 24)
+                    lite_result = self.lite_predictor.predict(model_name, recent_data, 24)
+
+                    for label, values in keras_result['predictions'].items():
+                        np.testing.assert_allclose(
+                            lite_result['predictions'][label], values, rtol=1e-3, atol=1e-2)
+
+    def test_lite_backend_does_not_import_tensorflow(self):
+        """Test in a fresh interpreter that serving from the exports never imports TensorFlow"""
+        code = (
+            "import sys, numpy as np\n"
+            "from core.utils.lite_predictor import LitePredictor\n"
+            f"predictor = LitePredictor.load({self.export_dir!r}, ['linear', 'dense', 'conv', 'lstm'])\n"
+            "predictor.predict('dense', np.ones((24, len(predictor.column_indices))), 1)\n"
+            "assert 'tensorflow' not in sys.modules\n"
+        )
+        project_root = os.path.join(os.path.dirname(__file__), '..', '..')
+
+        result = subprocess.run([sys.executable, '-c', code], cwd=project_root, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+import tempfile
+import shutil
+import threading
+import time
+import os
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+        MEDIA_ROOT='/tmp/test_media',
+        BASE_DIR='/tmp/test_base',
+    )
+    django.setup()
+
+from django.test import override_settings
+from core.utils.model_registry import (
+    ModelRegistry,
+    generation_dir,
+    write_generation_marker,
+    GENERATION_FILE,
+)
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Test cases for the process-wide ModelRegistry"""
+
+    def setUp(self):
+        """Create an empty media/models directory and a fresh registry"""
+        self.media_root = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.media_root, 'models')
+        os.makedirs(self.models_dir)
+        self.registry = ModelRegistry()
+
+    def tearDown(self):
+        """Clean up the temporary media directory"""
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_predictor_loaded_once_per_generation(self):
+        """Test that repeated accesses reuse the cached predictor"""
+        write_generation_marker(self.models_dir, 'gen-1')
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                mock_load.return_value = MagicMock()
+
+                first = self.registry.get_predictor()
+                second = self.registry.get_predictor()
+
+        self.assertIs(first, second)
+        mock_load.assert_called_once_with(self.models_dir)
+
+    def test_new_generation_swaps_predictor(self):
+        """Test that a new generation marker triggers a reload"""
+        write_generation_marker(self.models_dir, 'gen-1')
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                old_predictor, new_predictor = MagicMock(), MagicMock()
+                mock_load.side_effect = [old_predictor, new_predictor]
+
+                self.assertIs(self.registry.get_predictor(), old_predictor)
+
+                write_generation_marker(self.models_dir, 'gen-2')
+
+                self.assertIs(self.registry.get_predictor(), new_predictor)
+                self.assertEqual(self.registry.generation, (self.models_dir, 'gen-2'))
+
+        self.assertEqual(mock_load.call_count, 2)
+
+    def test_generation_without_marker_uses_file_stats(self):
+        """Test the fallback fingerprint for models trained before the marker existed"""
+        model_path = os.path.join(self.models_dir, 'linear_model.h5')
+        with open(model_path, 'wb') as f:
+            f.write(b'v1')
+
+        first = self.registry.current_generation(self.models_dir)
+
+        with open(model_path, 'wb') as f:
+            f.write(b'version 2')
+
+        second = self.registry.current_generation(self.models_dir)
+
+        self.assertFalse(os.path.exists(os.path.join(self.models_dir, GENERATION_FILE)))
+        self.assertNotEqual(first, second)
+
+    def test_failed_load_retried_after_backoff(self):
+        """Test that a broken generation is not reloaded on every request, but is retried later"""
+        with override_settings(MEDIA_ROOT=self.media_root, MODEL_LOAD_RETRY_SECONDS=30):
+            with patch('builtins.print'):
+                self.assertIsNone(self.registry.get_predictor())
+
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                mock_load.return_value = MagicMock()
+                self.assertIsNone(self.registry.get_predictor())
+                mock_load.assert_not_called()
+
+                with patch('core.utils.model_registry.time.monotonic', return_value=time.monotonic() + 31):
+                    self.assertIs(self.registry.get_predictor(), mock_load.return_value)
+                mock_load.assert_called_once_with(self.models_dir)
+
+    def test_generation_loaded_from_its_directory(self):
+        """Test that a published generation is loaded from its own directory, and old ones are pruned"""
+        for generation in ('20260101T000000000000', '20260102T000000000000', '20260103T000000000000'):
+            os.makedirs(generation_dir(self.models_dir, generation))
+            write_generation_marker(self.models_dir, generation)
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                self.registry.get_predictor()
+
+        mock_load.assert_called_once_with(generation_dir(self.models_dir, '20260103T000000000000'))
+        self.assertEqual(sorted(name for name in os.listdir(self.models_dir) if name.startswith('generation-')),
+                         ['generation-20260102T000000000000', 'generation-20260103T000000000000'])
+
+    def test_concurrent_first_access_loads_once(self):
+        """Test that concurrent requests on a cold registry share a single load"""
+        write_generation_marker(self.models_dir, 'gen-1')
+        results = []
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                mock_load.return_value = MagicMock()
+
+                threads = [
+                    threading.Thread(target=lambda: results.append(self.registry.get_predictor()))
+                    for _ in range(8)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        mock_load.assert_called_once()
+
+    def test_sample_data_parsed_once(self):
+        """Test that the sample CSV is only read the first time"""
+        sample_df = pd.DataFrame({
+            'datetime_utc': ['2025-03-25 10:00:00'],
+            'scheduled_demand_372': [1000],
+        })
+
+        with patch('os.path.exists', return_value=True):
+            with patch('pandas.read_csv', return_value=sample_df) as mock_read_csv:
+                with patch('builtins.print'):
+                    self.registry.get_sample_data()
+                    self.registry.get_sample_data()
+
+        mock_read_csv.assert_called_once()
+
+    def test_reset_drops_cache(self):
+        """Test that reset forces a reload on next access"""
+        write_generation_marker(self.models_dir, 'gen-1')
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with patch('core.utils.model_registry.load_predictor') as mock_load:
+                mock_load.return_value = MagicMock()
+
+                self.registry.get_predictor()
+                self.registry.reset()
+                self.registry.get_predictor()
+
+        self.assertEqual(mock_load.call_count, 2)
+        self.assertIsNotNone(self.registry.generation)
+
+
+if __name__ == '__main__':
+    unittest.main()
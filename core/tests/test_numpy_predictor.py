@@ -0,0 +1,205 @@
+import unittest
+from unittest.mock import MagicMock
+import json
+import os
+import sys
+import shutil
+import tempfile
+import time
+import h5py
+import numpy as np
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.test import override_settings
+from core.utils.numpy_predictor import DenseStack, NumpyPredictor
+from core.utils.predictor_base import BasePredictor
+from core.utils.model_registry import load_predictor, load_keras_predictor, MODEL_NAMES
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_numpy_predictor.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+# Other test modules replace tensorflow with a mock, the Keras comparisons need the real one
+TENSORFLOW_MOCKED = isinstance(sys.modules.get('tensorflow'), MagicMock)
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'media', 'models')
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+
+def write_sequential_h5(path, layers):
+    """Write a minimal Keras-style .h5 with the given [(class_name, activation, kernel, bias)] layers"""
+    config_layers = [{'class_name': 'InputLayer', 'config': {'name': 'input_layer'}}]
+    with h5py.File(path, 'w') as f:
+        weights_group = f.create_group('model_weights')
+        for i, (class_name, activation, kernel, bias) in enumerate(layers):
+            name = f'layer_{i}'
+            config_layers.append({'class_name': class_name, 'config': {'name': name, 'activation': activation}})
+            layer_group = weights_group.create_group(name)
+            layer_group.attrs['weight_names'] = [f'sequential/{name}/kernel', f'sequential/{name}/bias']
+            layer_group[f'sequential/{name}/kernel'] = kernel
+            layer_group[f'sequential/{name}/bias'] = bias
+        f.attrs['model_config'] = json.dumps({'class_name': 'Sequential', 'config': {'layers': config_layers}})
+
+
+class TestDenseStack(unittest.TestCase):
+    """Test cases for reading and evaluating Dense-only models"""
+
+    def setUp(self):
+        """Create a temporary directory for .h5 files"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_from_h5_matches_manual_forward(self):
+        """Test that weights are read in order and evaluated as matmul + relu"""
+        w1, b1 = self.rng.normal(size=(4, 8)).astype(np.float32), self.rng.normal(size=8).astype(np.float32)
+        w2, b2 = self.rng.normal(size=(8, 3)).astype(np.float32), self.rng.normal(size=3).astype(np.float32)
+        path = os.path.join(self.tmp_dir, 'dense_model.h5')
+        write_sequential_h5(path, [('Dense', 'relu', w1, b1), ('Dense', 'linear', w2, b2)])
+
+        stack = DenseStack.from_h5(path)
+        inputs = self.rng.normal(size=(2, 5, 4)).astype(np.float32)
+
+        expected = np.maximum(inputs @ w1 + b1, 0) @ w2 + b2
+        np.testing.assert_allclose(stack(inputs), expected, rtol=1e-5)
+
+    def test_from_h5_rejects_other_layers(self):
+        """Test that models with non-Dense layers are left to TensorFlow"""
+        kernel = np.ones((3, 4, 2), dtype=np.float32)
+        path = os.path.join(self.tmp_dir, 'conv_model.h5')
+        write_sequential_h5(path, [('Conv1D', 'relu', kernel, np.zeros(2, dtype=np.float32))])
+
+        self.assertIsNone(DenseStack.from_h5(path))
+
+    def test_saved_models(self):
+        """Test that linear and dense load from the shipped models and conv/lstm don't"""
+        for model_name in MODEL_NAMES:
+            with self.subTest(model=model_name):
+                stack = DenseStack.from_h5(os.path.join(MODELS_DIR, f'{model_name}_model.h5'))
+                if model_name in ('linear', 'dense'):
+                    self.assertIsInstance(stack, DenseStack)
+                    self.assertEqual(stack(np.zeros((1, 24, 18), dtype=np.float32)).shape, (1, 24, 3))
+                else:
+                    self.assertIsNone(stack)
+
+
+class TestNumpyPredictor(unittest.TestCase):
+    """Test cases for NumpyPredictor"""
+
+    def test_load_from_saved_models(self):
+        """Test that fallback models are kept as paths until first use"""
+        predictor = NumpyPredictor.load(MODELS_DIR, MODEL_NAMES)
+
+        self.assertIsInstance(predictor.models['linear'], DenseStack)
+        self.assertIsInstance(predictor.models['dense'], DenseStack)
+        self.assertTrue(predictor.models['lstm'].endswith('lstm_model.h5'))
+        self.assertIsNone(predictor._fallback)
+
+    def test_predict_dense_skips_batcher(self):
+        """Test that NumPy models run inline, without waiting for a batch window"""
+        predictor = NumpyPredictor.load(MODELS_DIR, MODEL_NAMES)
+        predictor.batcher = MagicMock()
+        recent_data = pd.read_csv(SAMPLE_DATA).drop(columns=['datetime_utc']).values[-24:]
+
+        result = predictor.predict('dense', recent_data, 6)
+
+        predictor.batcher.predict.assert_not_called()
+        self.assertEqual(len(result['predictions']['scheduled_demand_372']), 6)
+        self.assertFalse(predictor.is_batchable('dense'))
+        self.assertTrue(predictor.is_batchable('lstm'))
+
+    def test_backend_must_provide_forward_fn(self):
+        """Test that a backend without get_forward_fn can't be built"""
+        class IncompletePredictor(BasePredictor):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompletePredictor()
+        with self.assertRaises(TypeError):
+            BasePredictor()
+
+    def test_registry_selects_numpy_backend(self):
+        """Test that PREDICTION_BACKEND='numpy' builds a NumpyPredictor"""
+        with override_settings(PREDICTION_BACKEND='numpy'):
+            predictor = load_predictor(MODELS_DIR)
+
+        self.assertIsInstance(predictor, NumpyPredictor)
+        self.assertEqual(sorted(predictor.models.keys()), sorted(MODEL_NAMES))
+
+
+@unittest.skipIf(TENSORFLOW_MOCKED, "TensorFlow is mocked by another test module, run this file on its own")
+class TestNumpyPredictorParity(unittest.TestCase):
+    """NumPy predictions must match Keras, and conv/lstm must go through the TensorFlow fallback"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.keras_predictor = load_keras_predictor(MODELS_DIR)
+        cls.numpy_predictor = NumpyPredictor.load(MODELS_DIR, MODEL_NAMES)
+        cls.recent_data = pd.read_csv(SAMPLE_DATA).drop(columns=['datetime_utc']).values
+
+    def test_predictions_match_keras(self):
+        """Test every model at several input widths"""
+        for model_name in MODEL_NAMES:
+            for input_hours in (3, 24, 168):
+                with self.subTest(model=model_name, input_hours=input_hours):
+                    recent_data = self.recent_data[-input_hours:]
+                    keras_result = self.keras_predictor.predict(model_name, recent_data, 24)
+                    numpy_result = self.numpy_predictor.predict(model_name, recent_data, 24)
+
+                    for label, values in keras_result['predictions'].items():
+                        np.testing.assert_allclose(
+                            numpy_result['predictions'][label], values, rtol=1e-4, atol=1e-3)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run inference benchmarks")
+    def test_latency_vs_tensorflow(self):
+        """Print the latency of a single prediction with NumPy vs the traced TensorFlow path"""
+        recent_data = self.recent_data[-24:]
+        rows = []
+
+        for model_name in ('linear', 'dense'):
+            # First calls trace the tf.function, keep them out of the timings
+            self.keras_predictor.predict(model_name, recent_data, 24)
+            self.numpy_predictor.predict(model_name, recent_data, 24)
+
+            timings = {}
+            for backend, predictor in (('tensorflow', self.keras_predictor), ('numpy', self.numpy_predictor)):
+                samples = []
+                for _ in range(200):
+                    start = time.perf_counter()
+                    predictor.predict(model_name, recent_data, 24)
+                    samples.append(time.perf_counter() - start)
+                timings[backend] = float(np.median(samples)) * 1000
+            rows.append((model_name, timings['tensorflow'], timings['numpy']))
+
+            self.assertLess(timings['numpy'], timings['tensorflow'])
+
+        print(f"\n{'model':<8}{'tf.function ms':>16}{'numpy ms':>12}{'speedup':>10}")
+        for model_name, tf_ms, numpy_ms in rows:
+            print(f"{model_name:<8}{tf_ms:>16.3f}{numpy_ms:>12.3f}{tf_ms / numpy_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import time
+import queue
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+    )
+    django.setup()
+
+from core.utils.time_series_utils import TimeSeriesPredictor, _drain_events
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_parallel_training.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+# Other test modules replace tensorflow with a mock, training in subprocesses needs the real one
+TENSORFLOW_MOCKED = isinstance(sys.modules.get('tensorflow'), MagicMock)
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+
+class TestDrainEvents(unittest.TestCase):
+    """Test cases for relaying worker progress events"""
+
+    def test_events_forwarded_in_order(self):
+        """Test that queued events reach the callback in order"""
+        events = queue.Queue()
+        events.put(('linear', 'started', {'max_epochs': 20}))
+        events.put(('linear', 'epoch', {'epoch': 1, 'logs': {'loss': 0.5}}))
+        received = []
+
+        _drain_events(events, lambda name, event, **info: received.append((name, event, info)))
+
+        self.assertEqual([event for _, event, _ in received], ['started', 'epoch'])
+        self.assertEqual(received[1][2]['epoch'], 1)
+        self.assertTrue(events.empty())
+
+    def test_no_queue(self):
+        """Test that nothing happens without a progress callback"""
+        _drain_events(None, None)
+
+
+@unittest.skipIf(TENSORFLOW_MOCKED, "TensorFlow is mocked by another test module, run this file on its own")
+class TestParallelTraining(unittest.TestCase):
+    """Training in a process pool must produce the same set of models as the serial loop"""
+
+    def test_train_models_in_workers(self):
+        """Test models, performance and relayed progress of a 2-worker run"""
+        predictor = TimeSeriesPredictor()
+        train_df, val_df, test_df, _ = predictor.load_data_from_csv(SAMPLE_DATA)
+        events = []
+
+        performance = predictor.train_models(
+            train_df, val_df, test_df,
+            progress_callback=lambda name, event, **info: events.append((name, event)),
+            workers=2, threads_per_worker=1
+        )
+
+        self.assertEqual(list(performance.keys()), ['linear', 'dense', 'conv', 'lstm'])
+        self.assertEqual(list(predictor.models.keys()), ['linear', 'dense', 'conv', 'lstm'])
+        for name, perf in performance.items():
+            self.assertIn('mean_absolute_error', perf)
+            self.assertIn((name, 'started'), events)
+            self.assertIn((name, 'epoch'), events)
+            self.assertIn((name, 'finished'), events)
+
+        result = predictor.predict('lstm', test_df.values[-24:] * predictor.train_std.values + predictor.train_mean.values, 3)
+        self.assertEqual(len(result['predictions']['scheduled_demand_372']), 3)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run training benchmarks")
+    def test_wall_clock_vs_serial(self):
+        """Print the wall-clock training time of the serial loop vs the process pool"""
+        rows = []
+        for workers in (1, 4):
+            predictor = TimeSeriesPredictor()
+            train_df, val_df, test_df, _ = predictor.load_data_from_csv(SAMPLE_DATA)
+            start = time.perf_counter()
+            predictor.train_models(train_df, val_df, test_df, workers=workers)
+            rows.append((workers, time.perf_counter() - start))
+
+        print(f"\n{'workers':<10}{'seconds':>10}")
+        for workers, seconds in rows:
+            print(f"{workers:<10}{seconds:>10.2f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from core.utils.esios import DATA_TO_DOWNLOAD
+from test_dataset_merge import write_source
+from test_esios_client import StubEsiosServerMixin
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+
+def run(*args):
+    """call_command with its output, and whatever the stages print, as a string"""
+    out = StringIO()
+    with redirect_stdout(StringIO()):
+        call_command(*args, stdout=out, stderr=StringIO())
+    return out.getvalue()
+
+
+@override_settings(ESIOS_REQUESTS_PER_SECOND=None, ESIOS_DOWNLOAD_WORKERS=4)
+class TestEsiosSyncCommand(StubEsiosServerMixin, TestCase):
+    """manage.py esios_sync against the stub server"""
+
+    def setUp(self):
+        self.start_stub_server()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.settings_override = override_settings(BASE_DIR=self.tmp_dir, ESIOS_BASE_ENDPOINT=self.base_endpoint)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.since = datetime.today().strftime('%Y-%m-01')
+
+    def test_dry_run_requests_nothing(self):
+        output = run('esios_sync', '--dry-run', '--since', self.since)
+
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        self.assertIn(f'{n_indicators} mes(es) por descargar', output)
+        self.assertEqual(self.server.requests, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'data')))
+
+    def test_since_limits_months(self):
+        """Test that only the months from --since are downloaded and the throughput is printed"""
+        output = run('esios_sync', '--token', 'test-token', '--no-indicators', '--workers', '2',
+                     '--since', self.since)
+
+        n_indicators = sum(len(ids) for ids in DATA_TO_DOWNLOAD.values())
+        self.assertEqual(self.server.requests, n_indicators)
+        self.assertIn(f'✓ {n_indicators} meses en', output)
+        self.assertIn('MB/s', output)
+        self.assertIn('fetch', output)
+
+    def test_token_required(self):
+        with self.assertRaises(CommandError):
+            run('esios_sync', '--token', '')
+
+
+class TestMergeDatasetCommand(SimpleTestCase):
+    """manage.py merge_dataset over a data directory of yearly CSVs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.data_dir = os.path.join(self.tmp_dir, 'data')
+        write_source(os.path.join(self.data_dir, 'price', '600_2024.csv'), '2024-01-01', 600,
+                     geos=['España', 'Portugal'])
+        write_source(os.path.join(self.data_dir, 'solar', '14_2024.csv'), '2024-01-01', 36, freq='h')
+        self.settings_override = override_settings(BASE_DIR=self.tmp_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_merge_then_dry_run(self):
+        """Test that a dry run after a change lists the file to read and writes nothing"""
+        output = run('merge_dataset', '--workers', '1')
+        self.assertIn('✓ 2 archivos en', output)
+        self.assertIn('unión full', output)
+
+        merged_file = os.path.join(self.data_dir, 'merged_dataset.csv')
+        mtime = os.stat(merged_file).st_mtime_ns
+        write_source(os.path.join(self.data_dir, 'solar', '14_2024.csv'), '2024-01-01', 48, freq='h')
+
+        output = run('merge_dataset', '--dry-run')
+
+        self.assertIn(os.path.join('solar', '14_2024.csv'), output)
+        self.assertIn('Unión incremental: 1 archivo(s) por leer', output)
+        self.assertEqual(os.stat(merged_file).st_mtime_ns, mtime)
+
+    def test_since_rereads_recent_files(self):
+        run('merge_dataset')
+
+        output = run('merge_dataset', '--since', '2024-01-03')
+
+        # Only the price file has hours on the 3rd
+        self.assertIn('✓ 1 archivos en', output)
+        self.assertIn('unión incremental', output)
+
+    def test_missing_data_dir(self):
+        shutil.rmtree(self.data_dir)
+
+        with self.assertRaises(CommandError):
+            run('merge_dataset')
+
+
+class TestLoadTimeseriesCommand(TestCase):
+    """manage.py load_timeseries against the test database"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.csv_path = os.path.join(self.tmp_dir, 'merged_dataset.csv')
+        pd.DataFrame({
+            'datetime_utc': ['2022-12-31 23:00:00+00:00', '2023-01-01 00:00:00+00:00', '2023-01-01 01:00:00+00:00'],
+            'scheduled_demand_372': [1000.0, None, 1200.0],
+        }).to_csv(self.csv_path, index=False)
+
+    def test_since_loads_recent_hours(self):
+        """Test that --since skips the older hours, which still forward fill the new ones"""
+        output = run('load_timeseries', '--csv', self.csv_path, '--since', '2023-01-01')
+
+        self.assertIn('2 filas en la tabla (2 nuevas)', output)
+        values = list(TimeSeriesData.objects.order_by('datetime_utc').values_list('scheduled_demand_372', flat=True))
+        self.assertEqual(values, [1000.0, 1200.0])
+
+    def test_default_csv_path(self):
+        with override_settings(TIME_SERIES_CSV_PATH=self.csv_path):
+            run('load_timeseries')
+
+        self.assertEqual(TimeSeriesData.objects.count(), 3)
+
+    def test_dry_run_writes_nothing(self):
+        output = run('load_timeseries', '--csv', self.csv_path, '--dry-run')
+
+        self.assertIn('3 fila(s) por cargar, 0 ya en la tabla', output)
+        self.assertEqual(TimeSeriesData.objects.count(), 0)
+
+    def test_missing_csv(self):
+        with self.assertRaises(CommandError):
+            run('load_timeseries', '--csv', os.path.join(self.tmp_dir, 'missing.csv'))
+
+
+class TestTrainModelsCommand(SimpleTestCase):
+    """manage.py train_models, without training"""
+
+    @override_settings(TIME_SERIES_CSV_PATH=SAMPLE_DATA)
+    def test_dry_run_reports_split(self):
+        sample = pd.read_csv(SAMPLE_DATA)
+        n = len(sample)
+
+        output = run('train_models', '--dry-run', '--workers', '2')
+
+        self.assertIn(f'{n:,} filas x {len(sample.columns) - 1} columnas: {int(n * 0.6):,} entrenamiento', output)
+
+    @override_settings(TIME_SERIES_CSV_PATH=SAMPLE_DATA)
+    def test_dry_run_since(self):
+        output = run('train_models', '--dry-run', '--since', '2100-01-01')
+
+        self.assertIn('0 filas', output)
@@ -0,0 +1,228 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from core.utils.rollups import rebuild_rollups, update_rollups
+from core.utils.training import populate_database_from_csv
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_rollups.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+TimeSeriesAggregate = apps.get_model('core', 'TimeSeriesAggregate')
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def aggregates(resolution, *fields):
+    return list(TimeSeriesAggregate.objects.filter(resolution=resolution)
+                .order_by('period_start').values_list('period_start', *fields))
+
+
+class TestRollups(TestCase):
+    """Test cases for the daily, weekly and monthly TimeSeriesAggregate rows"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.csv_path = os.path.join(self.tmp_dir, 'merged_dataset.csv')
+
+    def load(self, n_hours, start=START, since=None, offset=0.0):
+        datetimes = pd.date_range(start, periods=n_hours, freq='h')
+        frame = pd.DataFrame({
+            'datetime_utc': datetimes,
+            'scheduled_demand_372': np.arange(n_hours, dtype=np.float64) + offset,
+            'solar_14': np.where(datetimes.hour < 12, 1.0, 3.0),
+        })
+        frame.to_csv(self.csv_path, index=False)
+        with redirect_stdout(StringIO()):
+            populate_database_from_csv(self.csv_path, since=since)
+        return frame
+
+    def test_load_builds_rollups(self):
+        """Test that a load writes the day, ISO week and month aggregates of its hours"""
+        frame = self.load(24 * 40)
+        expected = frame.set_index('datetime_utc')['scheduled_demand_372']
+
+        days = aggregates('day', 'hours', 'scheduled_demand_372_mean', 'solar_14_min', 'solar_14_max', 'solar_14_sum')
+        self.assertEqual(len(days), 40)
+        self.assertEqual(days[1], (START + timedelta(days=1), 24, expected.iloc[24:48].mean(), 1.0, 3.0, 48.0))
+
+        # 2024-01-01 was a Monday, weeks start on Mondays
+        weeks = aggregates('week', 'period_start', 'hours')
+        self.assertEqual([start for start, *_ in weeks][:2], [START, START + timedelta(days=7)])
+        self.assertEqual(weeks[-1][2], 24 * (40 % 7))
+
+        months = aggregates('month', 'hours', 'scheduled_demand_372_sum', 'scheduled_demand_372_max')
+        self.assertEqual(months, [
+            (START, 31 * 24, expected.iloc[:31 * 24].sum(), expected.iloc[31 * 24 - 1]),
+            (datetime(2024, 2, 1, tzinfo=dt_timezone.utc), 9 * 24, expected.iloc[31 * 24:].sum(), expected.iloc[-1]),
+        ])
+
+    def test_incremental_load(self):
+        """Test that a load with since only rewrites the periods it touched, as a rebuild would"""
+        self.load(24 * 40)
+        first_day = TimeSeriesAggregate.objects.get(resolution='day', period_start=START)
+
+        self.load(24 * 45, since='2024-02-05', offset=1000.0)
+
+        # Untouched periods keep their rows, touched ones got the new values
+        self.assertEqual(TimeSeriesAggregate.objects.get(resolution='day', period_start=START).pk, first_day.pk)
+        february = TimeSeriesAggregate.objects.get(resolution='month', period_start=datetime(2024, 2, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(february.hours, 14 * 24)
+        fields = [field.name for field in TimeSeriesAggregate._meta.concrete_fields
+                  if field.name not in ('id', 'resolution', 'period_start')]
+        incremental = {resolution: aggregates(resolution, *fields) for resolution in ('day', 'week', 'month')}
+
+        rebuild_rollups()
+
+        for resolution, rows in incremental.items():
+            self.assertEqual(aggregates(resolution, *fields), rows)
+
+    def test_deleted_hours(self):
+        """Test that a period whose hours are gone loses its aggregates"""
+        self.load(48)
+        TimeSeriesData.objects.filter(datetime_utc__gte=START + timedelta(days=1)).delete()
+
+        update_rollups(START + timedelta(days=1), START + timedelta(days=1, hours=23))
+
+        self.assertEqual([start for start, in aggregates('day')], [START])
+
+    def test_empty_feature(self):
+        """Test that a feature without values has no sum, rather than 0"""
+        self.load(24)
+
+        day = TimeSeriesAggregate.objects.get(resolution='day')
+        self.assertIsNone(day.wind_12_sum)
+        self.assertIsNone(day.wind_12_mean)
+
+    @override_settings(TIME_SERIES_CACHE=False)
+    def test_historical_resolution(self):
+        """Test that /historical/ serves resolution=day|week|month from the rollups in every format"""
+        self.load(24 * 40)
+        client = APIClient()
+        params = {'days': 60, 'end_date': '2024-02-09', 'columns': 'scheduled_demand_372,solar_14'}
+
+        days = client.get('/historical/', {**params, 'resolution': 'day'}).json()
+        self.assertEqual(days['count'], 40)
+        self.assertEqual(days['parameters']['resolution'], 'day')
+        self.assertEqual(days['data'][0], {'datetime': '2024-01-01T00:00:00Z', 'scheduled_demand_372': 11.5, 'solar_14': 2.0})
+
+        columnar = client.get('/historical/', {**params, 'resolution': 'week', 'format': 'columnar', 'stat': 'max'}).json()
+        self.assertEqual(columnar['step'], 7 * 24 * 3600)
+        self.assertEqual(columnar['data']['scheduled_demand_372'][0], 7 * 24 - 1)
+
+        months = client.get('/historical/', {**params, 'resolution': 'month', 'format': 'columnar', 'stat': 'sum'}).json()
+        self.assertIsNone(months['step'])
+        self.assertEqual(months['timestamps'], ['2024-01-01T00:00:00Z', '2024-02-01T00:00:00Z'])
+        self.assertEqual(months['data']['solar_14'], [31 * 48.0, 9 * 48.0])
+
+    @override_settings(TIME_SERIES_CACHE=False)
+    def test_historical_resolution_empty_range(self):
+        response = APIClient().get('/historical/', {'days': 7, 'end_date': '2023-06-01', 'resolution': 'day'})
+
+        self.assertEqual(response.status_code, 404)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run rollup benchmarks")
+    @override_settings(TIME_SERIES_CACHE=False)
+    def test_long_range_latency(self):
+        """Print the time of a 5 year /historical/ read at each resolution, and of the incremental update"""
+        self.load(5 * 365 * 24, start=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        client = APIClient()
+        params = {'days': 5 * 365, 'end_date': '2024-12-29', 'columns': '', 'format': 'columnar'}
+        repeats = 5
+
+        print(f"\n{'resolution':<12}{'rows':>8}{'ms':>10}")
+        for resolution in ('hour', 'day', 'week', 'month'):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                response = client.get('/historical/', {**params, 'resolution': resolution})
+            ms = (time.perf_counter() - start) / repeats * 1000
+            print(f"{resolution:<12}{response.json()['count']:>8}{ms:>10.1f}")
+
+        start = time.perf_counter()
+        update_rollups(datetime(2024, 12, 28, tzinfo=dt_timezone.utc), datetime(2024, 12, 28, 23, tzinfo=dt_timezone.utc))
+        print(f"update of one day: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+class TestRollupMigration(TransactionTestCase):
+    """Migration 0007 must build the aggregates of the hours already loaded, as rebuild_rollups does"""
+
+    migrate_from = [('core', '0006_downloadjob')]
+    migrate_to = [('core', '0007_timeseriesaggregate')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        OldTimeSeriesData = executor.loader.project_state(self.migrate_from).apps.get_model('core', 'TimeSeriesData')
+        datetimes = pd.date_range(START, periods=24 * 40, freq='h')
+        OldTimeSeriesData.objects.bulk_create([
+            OldTimeSeriesData(datetime_utc=hour, scheduled_demand_372=float(n), solar_14=None if n % 5 else 2.0)
+            for n, hour in enumerate(datetimes)
+        ])
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_migration_matches_rebuild(self):
+        fields = [field.name for field in TimeSeriesAggregate._meta.concrete_fields
+                  if field.name not in ('id', 'resolution', 'period_start')]
+        migrated = {resolution: aggregates(resolution, *fields) for resolution in ('day', 'week', 'month')}
+        self.assertEqual(len(migrated['day']), 40)
+
+        rebuild_rollups()
+
+        for resolution, rows in migrated.items():
+            self.assertEqual(aggregates(resolution, *fields), rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
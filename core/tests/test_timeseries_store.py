@@ -0,0 +1,199 @@
+import unittest
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from core.utils.data_generation import bump_data_generation
+from core.utils.timeseries_store import TimeSeriesStore, FEATURE_COLUMNS
+from core.utils.training import populate_database_from_csv
+
+# Benchmarks are opt-in: RUN_BENCHMARKS=1 pytest -s core/tests/test_timeseries_store.py
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_data.csv')
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+TimeSeriesData = apps.get_model('core', 'TimeSeriesData')
+
+START = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def hour(n):
+    return START + timedelta(hours=n)
+
+
+@override_settings(TIME_SERIES_CACHE=True, TIME_SERIES_CACHE_CHECK_SECONDS=0)
+class TestTimeSeriesStore(TestCase):
+    """Test cases for the columnar TimeSeriesData cache"""
+
+    def setUp(self):
+        self.store = TimeSeriesStore()
+
+    def _create(self, hours, value=None):
+        TimeSeriesData.objects.bulk_create([
+            TimeSeriesData(datetime_utc=hour(n), scheduled_demand_372=float(n) if value is None else value)
+            for n in hours
+        ])
+
+    def test_range_matches_orm(self):
+        """Test that a range read returns the same hours and values as datetime_utc__range"""
+        self._create(range(48))
+
+        window = self.store.get_range(hour(10), hour(33))
+
+        self.assertEqual(len(window), 24)
+        self.assertEqual(window.timestamps[0], hour(10))
+        self.assertEqual(window.last_timestamp, hour(33))
+        self.assertEqual(window.values.shape, (24, len(FEATURE_COLUMNS)))
+        expected = pd.DataFrame.from_records(
+            TimeSeriesData.objects.filter(datetime_utc__range=[hour(10), hour(33)])
+            .order_by('datetime_utc').values()
+        ).drop(['id', 'datetime_utc'], axis=1).astype(float).values
+        np.testing.assert_array_equal(window.values, expected)
+
+    def test_selected_columns_and_null(self):
+        """Test that column selection keeps the requested order and NULL is NaN"""
+        self._create(range(3))
+
+        window = self.store.get_range(hour(0), hour(2), ['scheduled_demand_372', 'solar_14'])
+
+        self.assertEqual(window.columns, ['scheduled_demand_372', 'solar_14'])
+        np.testing.assert_array_equal(window.values[:, 0], [0.0, 1.0, 2.0])
+        self.assertTrue(np.isnan(window.values[:, 1]).all())
+
+    def test_missing_hours_skipped(self):
+        """Test that hours without a row are left out of the window"""
+        self._create([0, 1, 4, 5])
+
+        window = self.store.get_range(hour(0), hour(5))
+
+        self.assertEqual(window.timestamps, [hour(0), hour(1), hour(4), hour(5)])
+
+    def test_range_outside_data(self):
+        """Test that ranges before, after or between bounds give an empty window"""
+        self._create(range(5))
+
+        self.assertEqual(len(self.store.get_range(hour(-10), hour(-1))), 0)
+        self.assertEqual(len(self.store.get_range(hour(10), hour(20))), 0)
+        self.assertEqual(len(self.store.get_range(hour(1) + timedelta(minutes=10), hour(1) + timedelta(minutes=50))), 0)
+
+    def test_load_patches_touched_hours(self):
+        """Test that a loader bump re-reads the touched hours without a full reload"""
+        self._create(range(5))
+        bump_data_generation(range_start=hour(0), range_end=hour(4))
+        first = self.store.get_snapshot()
+
+        TimeSeriesData.objects.filter(datetime_utc=hour(2)).update(scheduled_demand_372=200.0)
+        TimeSeriesData.objects.filter(datetime_utc=hour(3)).delete()
+        self._create([5, 6], value=500.0)
+        bump_data_generation(range_start=hour(2), range_end=hour(6))
+
+        window = self.store.get_range(hour(0), hour(6), ['scheduled_demand_372'])
+
+        self.assertEqual(self.store.get_snapshot().epoch, first.epoch)
+        self.assertEqual(self.store.get_snapshot().generation, first.generation + 1)
+        self.assertEqual(window.timestamps, [hour(0), hour(1), hour(2), hour(4), hour(5), hour(6)])
+        np.testing.assert_array_equal(window.values[:, 0], [0.0, 1.0, 200.0, 4.0, 500.0, 500.0])
+        # The previous snapshot is never mutated
+        self.assertEqual(first.values[2, first.column_index['scheduled_demand_372']], 2.0)
+
+    def test_populate_bumps_generation(self):
+        """Test that loading the CSV is picked up by an already warm store"""
+        self.assertEqual(len(self.store.get_range(hour(0), hour(10))), 0)
+
+        with redirect_stdout(StringIO()):
+            count = populate_database_from_csv(SAMPLE_DATA)
+
+        snapshot = self.store.get_snapshot()
+        self.assertEqual(int(snapshot.present.sum()), count)
+
+    def test_not_hourly_falls_back(self):
+        """Test that rows off the hourly grid disable the cache instead of losing rows"""
+        TimeSeriesData.objects.create(datetime_utc=hour(0))
+        TimeSeriesData.objects.create(datetime_utc=hour(0) + timedelta(minutes=30))
+
+        self.assertIsNone(self.store.get_range(hour(0), hour(1)))
+
+    @override_settings(TIME_SERIES_CACHE=False)
+    def test_disabled(self):
+        """Test that the setting turns the cache off"""
+        self._create(range(5))
+
+        self.assertIsNone(self.store.get_range(hour(0), hour(4)))
+
+    @override_settings(ROOT_URLCONF='core.urls')
+    def test_historical_view_same_response(self):
+        """Test that /historical/ answers the same with and without the cache"""
+        with redirect_stdout(StringIO()):
+            populate_database_from_csv(SAMPLE_DATA)
+        last = TimeSeriesData.objects.order_by('-datetime_utc').first().datetime_utc
+        params = {'days': 3, 'end_date': last.date().isoformat()}
+        client = APIClient()
+
+        cached = client.get('/historical/', params)
+        with override_settings(TIME_SERIES_CACHE=False):
+            uncached = client.get('/historical/', params)
+
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.json(), uncached.json())
+
+    @unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run cache benchmarks")
+    @override_settings(TIME_SERIES_CACHE_CHECK_SECONDS=1.0)
+    def test_window_read_latency(self):
+        """Print the time of a 24/168 hour window read through the ORM vs the cache"""
+        n_hours = 5 * 365 * 24
+        rows = [TimeSeriesData(datetime_utc=hour(n), **{name: float(n) for name in FEATURE_COLUMNS}) for n in range(n_hours)]
+        TimeSeriesData.objects.bulk_create(rows, batch_size=1000)
+        self.store.get_snapshot()
+        repeats = 50
+
+        print(f"\n{'hours':<8}{'orm ms':>10}{'cache ms':>10}")
+        for hours in (24, 168):
+            start_time, end_time = hour(n_hours - hours), hour(n_hours - 1)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                queryset = TimeSeriesData.objects.filter(datetime_utc__range=[start_time, end_time]).order_by('datetime_utc')
+                pd.DataFrame.from_records(queryset.values()).drop(['id', 'datetime_utc'], axis=1).values
+            orm_ms = (time.perf_counter() - start) / repeats * 1000
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                self.store.get_range(start_time, end_time).values
+            cache_ms = (time.perf_counter() - start) / repeats * 1000
+
+            print(f"{hours:<8}{orm_ms:>10.2f}{cache_ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+import time
+from unittest.mock import MagicMock, patch
+from datetime import timedelta
+from io import StringIO
+
+import numpy as np
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='test-secret-key-for-testing-only',
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'core',
+        ],
+        REST_FRAMEWORK={
+            'DEFAULT_AUTHENTICATION_CLASSES': [],
+            'DEFAULT_PERMISSION_CLASSES': [],
+        },
+        ROOT_URLCONF='core.urls',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.utils.training_jobs import (
+    Heartbeat,
+    enqueue_training_job,
+    claim_next_job,
+    fail_stale_jobs,
+    run_job,
+    run_worker,
+)
+
+# test_LatestDataDateView replaces core.models in sys.modules, the app registry keeps the real model
+TrainingJob = apps.get_model('core', 'TrainingJob')
+
+
+def fake_training(populate_database=False, progress_callback=None, report_stage=None):
+    """Stand-in for run_training that reports a two-epoch run of one model"""
+    report_stage('training')
+    progress_callback('linear', 'started', max_epochs=20)
+    progress_callback('linear', 'epoch', epoch=1, logs={'loss': np.float32(0.5), 'val_loss': 0.6})
+    progress_callback('linear', 'epoch', epoch=2, logs={'loss': np.float32(0.25), 'val_loss': 0.3})
+    progress_callback('linear', 'finished', performance={'loss': np.float32(0.2), 'mean_absolute_error': 0.1})
+    return {'message': 'Modelos entrenados correctamente', 'performance': {'linear': {'loss': np.float32(0.2)}}}
+
+
+class TestTrainingJobs(TestCase):
+    """Test cases for the DB-backed training job queue, against a real test database"""
+
+    def test_claim_oldest_job_once(self):
+        """Test that jobs are claimed in order and never twice"""
+        first = enqueue_training_job()
+        second = enqueue_training_job(populate_database=True)
+
+        claimed = claim_next_job('worker-a')
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, TrainingJob.STATUS_RUNNING)
+        self.assertEqual(claimed.worker, 'worker-a')
+        self.assertIsNotNone(claimed.started_at)
+
+        self.assertEqual(claim_next_job('worker-b').id, second.id)
+        self.assertIsNone(claim_next_job('worker-c'))
+
+    @patch('core.utils.training_jobs.run_training', side_effect=fake_training)
+    def test_run_job_records_progress_and_result(self, mock_run_training):
+        """Test per-epoch progress and the final result of a successful job"""
+        enqueue_training_job(populate_database=True)
+        job = run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress['stage'], 'done')
+        linear = job.progress['models']['linear']
+        self.assertEqual(linear['status'], 'finished')
+        self.assertEqual(linear['epoch'], 2)
+        self.assertEqual(linear['max_epochs'], 20)
+        self.assertAlmostEqual(linear['loss'], 0.25)
+        self.assertAlmostEqual(job.result['performance']['linear']['loss'], 0.2)
+        self.assertIsNotNone(job.finished_at)
+        self.assertTrue(mock_run_training.call_args.kwargs['populate_database'])
+
+    @patch('core.utils.training_jobs.run_training', side_effect=Exception("CSV loading failed"))
+    def test_run_job_records_failure(self, mock_run_training):
+        """Test that an exception fails the job instead of killing the worker"""
+        enqueue_training_job()
+        job = run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_FAILED)
+        self.assertIn('CSV loading failed', job.error)
+
+    def test_fail_stale_jobs(self):
+        """Test that running jobs without recent heartbeats are failed"""
+        enqueue_training_job()
+        stale = claim_next_job()
+        TrainingJob.objects.filter(id=stale.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        enqueue_training_job()
+        alive = claim_next_job()
+
+        self.assertEqual(fail_stale_jobs(stale_after=600), 1)
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, TrainingJob.STATUS_FAILED)
+        self.assertEqual(alive.status, TrainingJob.STATUS_RUNNING)
+
+    def test_stale_failed_job_keeps_failure(self):
+        """Test that a job failed as stale while it ran isn't turned into a success at the end"""
+        def training_outlived_by_heartbeat(**kwargs):
+            TrainingJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            fail_stale_jobs(stale_after=600)
+            return {'performance': {}}
+
+        enqueue_training_job()
+        job = claim_next_job('worker-a')
+        with patch('core.utils.training_jobs.run_training', side_effect=training_outlived_by_heartbeat):
+            job = run_job(job)
+
+        self.assertEqual(job.status, TrainingJob.STATUS_FAILED)
+        self.assertIn('dejó de responder', job.error)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_FAILED)
+
+    def test_heartbeat_while_running(self):
+        """Test that the heartbeat thread writes heartbeat_at until the block ends"""
+        job_model = MagicMock()
+        job = MagicMock(id=7)
+
+        with Heartbeat(job, interval=0.01, job_model=job_model):
+            time.sleep(0.1)
+        beats = job_model.objects.filter.return_value.update.call_count
+        time.sleep(0.05)
+
+        self.assertGreater(beats, 1)
+        self.assertEqual(job_model.objects.filter.return_value.update.call_count, beats)
+        job_model.objects.filter.assert_called_with(id=7, status=job_model.STATUS_RUNNING)
+
+    @patch('core.utils.training_jobs.run_training', side_effect=fake_training)
+    def test_worker_once_drains_queue(self, mock_run_training):
+        """Test that the worker runs every queued job and returns with --once"""
+        enqueue_training_job()
+        enqueue_training_job()
+
+        self.assertEqual(run_worker(once=True), 2)
+        self.assertEqual(TrainingJob.objects.filter(status=TrainingJob.STATUS_SUCCEEDED).count(), 2)
+
+    @patch('core.utils.training_jobs.run_training', side_effect=fake_training)
+    def test_training_worker_command(self, mock_run_training):
+        """Test the management command"""
+        job = enqueue_training_job()
+        out = StringIO()
+
+        call_command('training_worker', '--once', stdout=out)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_SUCCEEDED)
+        self.assertIn('1 trabajo(s) ejecutado(s)', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -217,6 +217,7 @@ class TestTimeSeriesPredictor(unittest.TestCase):
         mock_model.predict.return_value = mock_prediction
         
         self.predictor.models = {'linear': mock_model}
+        self.predictor.fast_inference = False
         self.predictor.train_mean = pd.Series([100, 50, 45])
         self.predictor.train_std = pd.Series([10, 5, 5])
         self.predictor.column_indices = {
@@ -238,6 +239,36 @@ class TestTimeSeriesPredictor(unittest.TestCase):
         self.assertEqual(result['hours_ahead'], 2)
         self.assertEqual(result['max_available'], 24)
 
+    def test_predict_fast_path_traces_once_per_shape(self):
+        """Test that the tf.function fast path is traced once and reused"""
+        traced = MagicMock()
+        traced.return_value.numpy.return_value = np.array([[[10, 20, 30], [15, 25, 35]]])
+        
+        self.predictor.models = {'linear': MagicMock()}
+        self.predictor.train_mean = pd.Series([100, 50, 45])
+        self.predictor.train_std = pd.Series([10, 5, 5])
+        self.predictor.column_indices = {
+            'scheduled_demand_372': 0,
+            'daily_spot_market_600_España': 1,
+            'daily_spot_market_600_Portugal': 2
+        }
+        
+        recent_data = np.array([[1000, 50, 45], [1100, 55, 50]])
+        
+        with patch('core.utils.time_series_utils.tf') as mock_tf:
+            mock_tf.function.return_value = traced
+            
+            self.predictor.predict('linear', recent_data, 2)
+            result = self.predictor.predict('linear', recent_data, 2)
+            
+            # A different input width needs its own trace
+            self.predictor.predict('linear', np.vstack([recent_data, recent_data]), 2)
+        
+        self.assertEqual(mock_tf.function.call_count, 2)
+        self.assertEqual(traced.call_count, 3)
+        self.predictor.models['linear'].predict.assert_not_called()
+        self.assertEqual(result['predictions']['scheduled_demand_372'], [200.0, 250.0])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,22 +2,28 @@ from django.urls import path
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from .views import (
     TrainModelsView, 
+    TrainingJobDetailView,
     PredictView, 
     HistoricalDataView, 
     DownloadDataView,
+    DownloadJobDetailView,
     MergeDataView,
     LatestDataDateView,
     PredictionHistoryListView,
     PredictionHistoryDetailView,
     PredictionHistoryStatsView,
+    ReadinessView,
+    InferenceMetricsView,
 )
 
 urlpatterns = [
     path('train/', TrainModelsView.as_view(), name='train-models'),
+    path('train/<int:job_id>/', TrainingJobDetailView.as_view(), name='training-job-detail'),
     path('predict/', PredictView.as_view(), name='predict'),
     path('historical/', HistoricalDataView.as_view(), name='historical-data'),
 
     path('data/download/', DownloadDataView.as_view(), name='download-data'),
+    path('data/download/<int:job_id>/', DownloadJobDetailView.as_view(), name='download-job-detail'),
     path('data/merge/', MergeDataView.as_view(), name='merge-data'),
     path('data/latest-date/', LatestDataDateView.as_view(), name='latest-data'),
 
@@ -25,6 +31,9 @@ urlpatterns = [
     path('predictions/history/<int:pk>/', PredictionHistoryDetailView.as_view(), name='prediction-history-detail'),
     path('predictions/history/stats/', PredictionHistoryStatsView.as_view(), name='prediction-history-stats'),
 
+    path('health/ready/', ReadinessView.as_view(), name='health-ready'),
+    path('health/inference/', InferenceMetricsView.as_view(), name='health-inference'),
+
     path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
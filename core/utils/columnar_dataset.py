@@ -0,0 +1,107 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Bumped when the layout of the files changes, readers ignore other versions
+FORMAT_VERSION = 1
+
+
+def columnar_dataset_paths(csv_path):
+    """(values, index, metadata) files written next to a dataset CSV"""
+    stem = os.path.splitext(csv_path)[0]
+    return f'{stem}.values.npy', f'{stem}.index.npy', f'{stem}.meta.json'
+
+
+def _source_stat(csv_path):
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def write_columnar_dataset(df, csv_path):
+    """
+    Write df (datetime_utc plus float columns) as a binary copy of csv_path.
+
+    The values go to a float64 .npy matrix and datetime_utc to a datetime64 .npy,
+    so readers can memory-map both instead of parsing text. The JSON sidecar holds
+    the column names and the size/mtime of the CSV it was written with, it's
+    written last so a reader never picks up half an artifact.
+    Returns the path of the values file.
+    """
+    values_path, index_path, meta_path = columnar_dataset_paths(csv_path)
+
+    datetimes = pd.DatetimeIndex(df['datetime_utc'])
+    tz = str(datetimes.tz) if datetimes.tz is not None else None
+    if tz is not None:
+        datetimes = datetimes.tz_convert('UTC').tz_localize(None)
+    columns = [name for name in df.columns if name != 'datetime_utc']
+    values = np.ascontiguousarray(df[columns].to_numpy(dtype=np.float64))
+
+    metadata = {
+        'version': FORMAT_VERSION,
+        'columns': columns,
+        'rows': len(df),
+        'tz': tz,
+        'source': _source_stat(csv_path),
+    }
+
+    for path, array in ((values_path, values), (index_path, datetimes.to_numpy(dtype='datetime64[ns]'))):
+        with open(f'{path}.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(f'{path}.tmp', path)
+    with open(f'{meta_path}.tmp', 'w') as f:
+        json.dump(metadata, f)
+    os.replace(f'{meta_path}.tmp', meta_path)
+
+    return values_path
+
+
+def read_columnar_dataset(csv_path):
+    """
+    DataFrame backed by the memory-mapped binary copy of csv_path, None if there's
+    no copy or the CSV changed after it was written. Pages are copy-on-write, so
+    callers can modify the frame without touching the files.
+    """
+    values_path, index_path, meta_path = columnar_dataset_paths(csv_path)
+    try:
+        with open(meta_path) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    try:
+        if metadata.get('version') != FORMAT_VERSION:
+            return None
+        source = _source_stat(csv_path)
+        if source is not None and source != metadata['source']:
+            return None
+
+        values = np.load(values_path, mmap_mode='c')
+        index = np.load(index_path, mmap_mode='c')
+        if values.shape != (metadata['rows'], len(metadata['columns'])) or len(index) != metadata['rows']:
+            raise ValueError(f'shape {values.shape} does not match {meta_path}')
+
+        datetimes = pd.DatetimeIndex(index)
+        if metadata['tz'] is not None:
+            datetimes = datetimes.tz_localize('UTC').tz_convert(metadata['tz'])
+
+        df = pd.DataFrame(values, columns=metadata['columns'], copy=False)
+        df.insert(0, 'datetime_utc', datetimes)
+        return df
+
+    except Exception as e:
+        print(f"Warning: Could not load the binary dataset {values_path}: {e}")
+        return None
+
+
+def read_dataset(csv_path):
+    """Dataset CSV as a DataFrame with datetime_utc parsed, from its binary copy when it's up to date"""
+    df = read_columnar_dataset(csv_path)
+    if df is None:
+        df = pd.read_csv(csv_path)
+        df['datetime_utc'] = pd.to_datetime(df['datetime_utc'])
+    return df
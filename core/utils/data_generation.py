@@ -0,0 +1,88 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from ..models import DataGeneration
+
+TIMESERIES = 'timeseries'
+
+
+def bump_data_generation(name=TIMESERIES, range_start=None, range_end=None):
+    """
+    Advance the generation of a dataset, call it inside the transaction that writes
+    the data so readers never see the new generation before the rows.
+    Returns the new generation.
+    """
+    DataGeneration.objects.get_or_create(name=name)
+    DataGeneration.objects.filter(name=name).update(
+        generation=F('generation') + 1,
+        range_start=range_start,
+        range_end=range_end,
+        updated_at=timezone.now(),
+    )
+    return DataGeneration.objects.get(name=name).generation
+
+
+def get_data_generation(name=TIMESERIES):
+    """Current DataGeneration row of a dataset, None if it was never written"""
+    return DataGeneration.objects.filter(name=name).first()
+
+
+def conditional_get(etag_parts, last_modified=None):
+    """
+    Decorator for read-only views: a strong ETag hashed from etag_parts(request, ...),
+    a list of whatever the answer depends on, plus the request path and the negotiated
+    media type, and Last-Modified from last_modified(request, ...). Conditional requests
+    that still match get a 304 (django's condition).
+
+    Responses are marked no-cache so clients revalidate every time instead of
+    guessing a freshness from Last-Modified. Only successful answers keep the
+    validators, a client must never revalidate an error into a 304.
+    """
+    def etag(request, *args, **kwargs):
+        parts = [str(part) for part in etag_parts(request, *args, **kwargs)]
+        # One ETag per representation: the query string picks the payload, Accept the renderer
+        parts.append(request.get_full_path())
+        parts.append(getattr(request, 'accepted_media_type', None) or '')
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+    def decorator(view):
+        conditional = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            # condition adds them to any answer to a GET, errors included
+            if not (200 <= response.status_code < 300 or response.status_code == 304):
+                del response['ETag']
+                del response['Last-Modified']
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def generation_condition(*names):
+    """
+    conditional_get for views whose answer only changes with the generation of the
+    datasets `names`: the ETag and Last-Modified come from their DataGeneration rows.
+    """
+    def generations(request):
+        # condition calls both functions, read the rows once
+        if not hasattr(request, '_data_generations'):
+            rows = {row.name: row for row in DataGeneration.objects.filter(name__in=names)}
+            request._data_generations = [rows.get(name) for name in names]
+        return request._data_generations
+
+    def etag_parts(request, *args, **kwargs):
+        return [f'{name}:{row.generation if row else 0}' for name, row in zip(names, generations(request))]
+
+    def last_modified(request, *args, **kwargs):
+        times = [row.updated_at for row in generations(request) if row is not None]
+        return max(times) if times else None
+
+    return conditional_get(etag_parts, last_modified)
@@ -0,0 +1,494 @@
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .columnar_dataset import columnar_dataset_paths, read_dataset, write_columnar_dataset
+
+MERGED_DATASET_NAME = 'merged_dataset.csv'
+MERGE_MANIFEST_NAME = 'merge_manifest.json'
+
+# Bumped when what the manifest records changes, older manifests trigger a full merge
+MERGE_MANIFEST_VERSION = 1
+
+SELECTED_GEO = {"Península", "España", "Portugal", "Baleares", "Canarias", "Ceuta", "Melilla"}
+
+# Only these columns of the downloaded CSVs are used by the merge
+SOURCE_COLUMNS = {'datetime_utc', 'value', 'geo_name'}
+
+
+def source_data_id(path):
+    """{category}_{indicator_id} of a data/<category>/<indicator_id>_<year>.csv file"""
+    parts = path.replace("\\", "/").split("/")
+    if len(parts) < 2:
+        return None
+    category = parts[-2]
+    filename = os.path.splitext(parts[-1])[0]
+    sensor_id = filename.split("_")[0]
+    return f"{category}_{sensor_id}"
+
+
+def find_source_files(data_dir):
+    """(path, data_id) of every downloaded CSV, the files directly in data_dir aren't sources"""
+    sources = []
+    for root, _, files in os.walk(data_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            if not file.endswith(".csv") or os.path.dirname(path) == data_dir:
+                continue
+            data_id = source_data_id(path)
+            if data_id:
+                sources.append((path, data_id))
+    return sources
+
+
+def _parse_utc(column):
+    """UTC DatetimeIndex of a timestamp column, every distinct string is parsed once (geos repeat them)"""
+    codes, uniques = pd.factorize(column)
+    parsed = pd.to_datetime(uniques, utc=True, format='ISO8601')
+    return pd.DatetimeIndex(parsed[codes], name='datetime_utc')
+
+
+def hourly_source(path, data_id, selected_geo=SELECTED_GEO):
+    """
+    Hourly means of a source CSV on a UTC DatetimeIndex. A file with several of the
+    selected geos gives one {data_id}_{geo} column per geo, any other one a single
+    {data_id} column.
+    """
+    df = pd.read_csv(path, usecols=lambda column: column in SOURCE_COLUMNS, dtype={'geo_name': 'category'})
+    df.index = _parse_utc(df['datetime_utc'])
+
+    if 'geo_name' in df.columns:
+        df = df[df['geo_name'].isin(selected_geo)]
+        if df['geo_name'].nunique() > 1:
+            wide = df.groupby('geo_name', observed=True)['value'].resample('h').mean().unstack(0)
+            wide = wide.dropna(how='all')
+            wide.columns = [f"{data_id}_{geo}" for geo in wide.columns]
+            wide.columns.name = None
+            return wide
+
+    return df['value'].resample('h').mean().dropna().to_frame(data_id)
+
+
+def _read_source(path, data_id, selected_geo):
+    """Worker entry point, a file that can't be read comes back as an error message"""
+    try:
+        return hourly_source(path, data_id, selected_geo), None
+    except Exception as e:
+        return None, f"Error reading {path}: {str(e)}"
+
+
+def read_sources(sources, workers=1, selected_geo=SELECTED_GEO):
+    """
+    (frame, error) of every (path, data_id) source, parsed and resampled in a pool of
+    `workers` processes (in this one when it's 1)
+    """
+    if workers > 1 and len(sources) > 1:
+        # Pandas is all the workers need, they don't inherit the server's TensorFlow state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(sources)), mp_context=context) as pool:
+            return list(pool.map(_read_source, *zip(*sources), [selected_geo] * len(sources)))
+    return [_read_source(path, data_id, selected_geo) for path, data_id in sources]
+
+
+def _stack_years(parts):
+    """One hourly frame from the files of an indicator, the first file wins an hour two of them have"""
+    combined = pd.concat(parts).sort_index(kind='stable')
+    return combined[~combined.index.duplicated(keep='first')]
+
+
+def merge_sources(sources, workers=1, selected_geo=SELECTED_GEO):
+    """
+    Merge (path, data_id) sources into one wide hourly frame.
+
+    The years of an indicator are stacked and every indicator is joined in a single
+    concat on the hourly index. Returns a dict with the merged frame (None when
+    nothing could be read), the data ids, the processed files, the hourly frame of
+    every processed file, the errors and the seconds spent in each stage.
+    """
+    timings = {}
+    start = time.perf_counter()
+    results = read_sources(sources, workers, selected_geo)
+    timings['read_resample'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames, processed_files, errors = {}, [], []
+    for (path, data_id), (frame, error) in zip(sources, results):
+        if error is not None:
+            errors.append(error)
+            continue
+        frames.setdefault(data_id, []).append(frame)
+        processed_files.append(path)
+
+    columns = [_stack_years(parts) for parts in frames.values()]
+
+    merged = None
+    if columns:
+        merged = pd.concat(columns, axis=1).sort_index()
+        merged.index.name = 'datetime_utc'
+        merged = merged.reset_index()
+    timings['assemble'] = time.perf_counter() - start
+
+    return {
+        'merged': merged,
+        'data_ids': list(frames),
+        'processed_files': processed_files,
+        'source_frames': {path: frame for (path, _), (frame, _) in zip(sources, results) if frame is not None},
+        'errors': errors,
+        'timings': timings,
+    }
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MergeManifest:
+    """
+    Source files behind merged_dataset.csv, kept in data/merge_manifest.json.
+
+    Every source is recorded with its size, mtime and sha256, the data id and
+    columns it fed and the first and last hour it contributed. The size and mtime
+    of the merged CSV are kept too, a merged file changed by anything else can't
+    be patched.
+    """
+
+    def __init__(self, path, sources=None, output=None, selected_geo=None):
+        self.path = path
+        self.sources = sources or {}
+        self.output = output
+        self.selected_geo = selected_geo
+
+    @classmethod
+    def load(cls, data_dir):
+        path = os.path.join(data_dir, MERGE_MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MERGE_MANIFEST_VERSION:
+                return cls(path)
+            return cls(path, manifest.get('sources', {}), manifest.get('output'), manifest.get('selected_geo'))
+        except FileNotFoundError:
+            return cls(path)
+        except Exception as e:
+            print(f"Warning: Could not load the merge manifest, the dataset will be merged from scratch: {e}")
+            return cls(path)
+
+    def _key(self, path):
+        return os.path.relpath(path, os.path.dirname(self.path)).replace("\\", "/")
+
+    def matches(self, output_file, selected_geo):
+        """Whether output_file is still the dataset this manifest describes"""
+        return (self.output is not None and self.selected_geo == sorted(selected_geo)
+                and _file_stat(output_file) == self.output)
+
+    def changed_sources(self, sources):
+        """
+        (path, data_id) of the sources that are new or whose content changed, and
+        the recorded paths that are gone. A file that was only touched gets its new
+        mtime recorded and doesn't count as changed.
+        """
+        changed, seen = [], set()
+        for path, data_id in sources:
+            key = self._key(path)
+            seen.add(key)
+            entry = self.sources.get(key)
+            stat = _file_stat(path)
+            if entry is not None and entry['data_id'] == data_id and stat is not None:
+                if stat == {'size': entry['size'], 'mtime_ns': entry['mtime_ns']}:
+                    continue
+                if stat['size'] == entry['size'] and _file_sha256(path) == entry['sha256']:
+                    entry.update(stat)
+                    continue
+            changed.append((path, data_id))
+        removed = [key for key in self.sources if key not in seen]
+        return changed, removed
+
+    def sources_since(self, sources, since):
+        """(path, data_id) of the sources that contributed hours at or after since"""
+        since = pd.Timestamp(since)
+        since = since.tz_localize('UTC') if since.tzinfo is None else since.tz_convert('UTC')
+        touching = []
+        for path, data_id in sources:
+            entry = self.sources.get(self._key(path))
+            if entry and entry.get('hour_end') and pd.Timestamp(entry['hour_end']) >= since:
+                touching.append((path, data_id))
+        return touching
+
+    def entries(self, data_id):
+        """(path, entry) of the recorded sources of a data id"""
+        base_dir = os.path.dirname(self.path)
+        return [(os.path.join(base_dir, key), entry) for key, entry in self.sources.items()
+                if entry['data_id'] == data_id]
+
+    def record(self, path, data_id, frame):
+        """Store a source and the hours it contributed, call it once the merged file is written"""
+        stat = _file_stat(path)
+        if stat is None:
+            return
+        self.sources[self._key(path)] = {
+            **stat,
+            'sha256': _file_sha256(path),
+            'data_id': data_id,
+            'columns': list(frame.columns),
+            'hour_start': frame.index.min().isoformat() if len(frame) else None,
+            'hour_end': frame.index.max().isoformat() if len(frame) else None,
+        }
+
+    def forget(self, keys=None):
+        """Drop the given sources, every one when keys is None"""
+        for key in list(self.sources) if keys is None else keys:
+            self.sources.pop(key, None)
+
+    def save(self, output_file, selected_geo):
+        """Write the manifest atomically, a failed write only costs a full merge next time"""
+        self.output = _file_stat(output_file)
+        self.selected_geo = sorted(selected_geo)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f'{self.path}.tmp', 'w') as f:
+                json.dump({'version': MERGE_MANIFEST_VERSION, 'selected_geo': self.selected_geo,
+                           'output': self.output, 'sources': self.sources}, f, indent=2, sort_keys=True)
+            os.replace(f'{self.path}.tmp', self.path)
+        except Exception as e:
+            print(f"Warning: Could not save the merge manifest: {e}")
+
+
+def _hour_range(entries, frames):
+    """First and last hour of recorded entries and fresh frames, None when they have none"""
+    hours = [pd.Timestamp(entry[key]) for entry in entries for key in ('hour_start', 'hour_end')
+             if entry.get(key)]
+    hours += [hour for frame in frames if len(frame) for hour in (frame.index.min(), frame.index.max())]
+    return (min(hours), max(hours)) if hours else None
+
+
+def patch_sources(merged, sources, changed, manifest, workers=1, selected_geo=SELECTED_GEO):
+    """
+    Bring a merged frame up to date with the changed (path, data_id) sources.
+
+    Only the hours a changed file covers, before or after the change, are
+    recomputed: the changed files and the other files of their indicators that
+    overlap those hours are read again, the indicator's columns are cleared in
+    that range and filled with the new values. Indicators with a file that can't
+    be read keep their old values. Returns the same dict as merge_sources plus the
+    first recomputed hour.
+    """
+    timings = {}
+    start = time.perf_counter()
+    fresh = dict(zip(changed, read_sources(changed, workers, selected_geo)))
+
+    # Per indicator, the hours any of its changed files had or has now
+    ranges, skipped, errors = {}, set(), []
+    for (path, data_id), (frame, error) in fresh.items():
+        if error is not None:
+            errors.append(error)
+            skipped.add(data_id)
+            continue
+        old = manifest.sources.get(manifest._key(path))
+        hours = _hour_range([old] if old else [], [frame])
+        if hours is not None:
+            current = ranges.get(data_id, hours)
+            ranges[data_id] = (min(current[0], hours[0]), max(current[1], hours[1]))
+
+    # Unchanged files of those indicators that overlap the recomputed hours
+    overlapping = []
+    changed_paths = {path for path, _ in changed}
+    for path, data_id in sources:
+        if data_id not in ranges or data_id in skipped or path in changed_paths:
+            continue
+        entry = manifest.sources.get(manifest._key(path))
+        if entry and entry.get('hour_start') and (pd.Timestamp(entry['hour_start']) <= ranges[data_id][1]
+                                                   and pd.Timestamp(entry['hour_end']) >= ranges[data_id][0]):
+            overlapping.append((path, data_id))
+    for source, result in zip(overlapping, read_sources(overlapping, workers, selected_geo)):
+        fresh[source] = result
+        if result[1] is not None:
+            errors.append(result[1])
+            skipped.add(source[1])
+    ranges = {data_id: hours for data_id, hours in ranges.items() if data_id not in skipped}
+    timings['read_resample'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged = merged.set_index('datetime_utc')
+    merged.index = pd.DatetimeIndex(merged.index).tz_convert('UTC')
+    blocks, cleared = [], set()
+    for data_id, (first, last) in ranges.items():
+        # Source order decides which file wins a shared hour, as in a full merge
+        parts = [fresh[(path, source_id)][0] for path, source_id in sources
+                 if source_id == data_id and (path, source_id) in fresh]
+        block = _stack_years(parts) if parts else pd.DataFrame()
+        block = block[(block.index >= first) & (block.index <= last)] if len(block) else block
+
+        old_columns = {column for _, entry in manifest.entries(data_id) for column in entry['columns']}
+        stale = [column for column in merged.columns if column in old_columns or column in block.columns]
+        merged.loc[(merged.index >= first) & (merged.index <= last), stale] = np.nan
+        cleared.update(stale)
+        blocks.append(block)
+
+    for block in blocks:
+        if len(block.columns) == 0:
+            continue
+        new_columns = [column for column in block.columns if column not in merged.columns]
+        merged = merged.reindex(index=merged.index.union(block.index),
+                                columns=list(merged.columns) + new_columns)
+        merged.loc[block.index, block.columns] = block
+
+    # Hours left without any value are gone from the sources, a full merge wouldn't have them
+    merged = merged.dropna(how='all')
+    merged = merged.drop(columns=[column for column in cleared if merged[column].isna().all()])
+    merged.index.name = 'datetime_utc'
+    merged = merged.sort_index().reset_index()
+    timings['assemble'] = time.perf_counter() - start
+
+    patched = [source for source in fresh if source[1] not in skipped]
+    return {
+        'merged': merged,
+        'data_ids': list(dict.fromkeys(data_id for _, data_id in sources)),
+        'processed_files': [path for path, _ in patched],
+        'source_frames': {path: fresh[(path, data_id)][0] for path, data_id in patched},
+        'errors': errors,
+        'timings': timings,
+        'patch_start': min((first for first, _ in ranges.values()), default=None),
+    }
+
+
+def _csv_row_offset(csv_path, timestamp):
+    """Byte offset of the row of timestamp in a merged CSV, None if it isn't there"""
+    with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Recent hours are the ones that change, they're at the end of the file
+        offset = data.rfind(b'\n' + str(timestamp).encode() + b',')
+    return None if offset < 0 else offset + 1
+
+
+def write_merged_dataset(merged, output_file, previous_columns=None, patch_start=None):
+    """
+    Write the merged CSV and its binary copy. When the columns didn't change and
+    the rows before patch_start are the ones already in the file, the CSV is cut
+    at that hour and only the rest is appended. Returns the binary copy's path,
+    None if it couldn't be written, and whether the CSV was appended to.
+    """
+    appended = False
+    if (previous_columns is not None and patch_start is not None
+            and list(merged.columns) == list(previous_columns)):
+        tail = merged[merged['datetime_utc'] >= patch_start]
+        offset = _csv_row_offset(output_file, tail['datetime_utc'].iloc[0]) if len(tail) else None
+        if offset is not None:
+            os.truncate(output_file, offset)
+            with open(output_file, 'a', newline='') as f:
+                tail.to_csv(f, index=False, header=False)
+            appended = True
+    if not appended:
+        merged.to_csv(output_file, index=False)
+
+    # Binary copy for training and loading, the CSV stays the source of truth
+    try:
+        binary_file = write_columnar_dataset(merged, output_file)
+    except Exception as e:
+        print(f"Warning: Could not write the binary dataset: {e}")
+        binary_file = None
+    return binary_file, appended
+
+
+def _existing(path):
+    return path if os.path.exists(path) else None
+
+
+def build_merged_dataset(data_dir, workers=1, selected_geo=SELECTED_GEO, full=False, since=None, dry_run=False):
+    """
+    Merge the downloaded CSVs of data_dir into data_dir/merged_dataset.csv.
+
+    The merge manifest decides how: nothing is written when no source changed,
+    only the hours of the changed sources are recomputed and patched in when the
+    merged file is still the one the manifest describes, and everything is merged
+    again otherwise (or when full is set, or a source was deleted). since (a
+    datetime) also recomputes the sources with hours from then on, changed or not.
+    Returns the dict of merge_sources plus the mode ('unchanged', 'incremental' or
+    'full'), the output and binary file paths, and write timings. Nothing is
+    written when no source could be read, or on a dry run, which only returns the
+    mode and the files that would be read.
+    """
+    timings = {}
+    start = time.perf_counter()
+    sources = find_source_files(data_dir)
+    output_file = os.path.join(data_dir, MERGED_DATASET_NAME)
+    manifest = MergeManifest.load(data_dir)
+    timings['discover'] = time.perf_counter() - start
+    data_ids = list(dict.fromkeys(data_id for _, data_id in sources))
+
+    previous = None
+    incremental = False
+    changed, removed = list(sources), []
+    if not full and manifest.matches(output_file, selected_geo):
+        changed, removed = manifest.changed_sources(sources)
+        if since is not None:
+            changed += [source for source in manifest.sources_since(sources, since) if source not in changed]
+        incremental = not removed
+
+    if dry_run:
+        return {
+            'merged': None, 'mode': ('incremental' if changed else 'unchanged') if incremental else 'full',
+            'data_ids': data_ids, 'processed_files': [path for path, _ in changed], 'errors': [],
+            'timings': timings, 'output_file': output_file, 'binary_file': None, 'dry_run': True,
+        }
+
+    if incremental:
+        try:
+            previous = read_dataset(output_file)
+        except Exception as e:
+            print(f"Warning: Could not read {output_file}, the dataset will be merged from scratch: {e}")
+            changed = list(sources)
+
+    if previous is not None and not changed:
+        manifest.save(output_file, selected_geo)
+        return {
+            'merged': previous, 'mode': 'unchanged', 'data_ids': data_ids,
+            'processed_files': [], 'errors': [], 'timings': timings,
+            'output_file': output_file, 'binary_file': _existing(columnar_dataset_paths(output_file)[0]),
+        }
+
+    if previous is not None:
+        result = patch_sources(previous, sources, changed, manifest, workers, selected_geo)
+        result['mode'] = 'incremental'
+    else:
+        result = merge_sources(sources, workers, selected_geo)
+        result['mode'] = 'full'
+        manifest.forget()
+    timings.update(result.pop('timings'))
+    result['timings'] = timings
+    result['output_file'] = output_file
+    result['binary_file'] = None
+
+    merged = result['merged']
+    if not result['data_ids'] or merged is None or merged.empty:
+        return result
+
+    start = time.perf_counter()
+    result['binary_file'], result['appended'] = write_merged_dataset(
+        merged, output_file,
+        previous_columns=previous.columns if previous is not None else None,
+        patch_start=result.pop('patch_start', None))
+    timings['write'] = time.perf_counter() - start
+
+    for path, data_id in sources:
+        if path in result['source_frames']:
+            manifest.record(path, data_id, result['source_frames'][path])
+    manifest.save(output_file, selected_geo)
+    return result
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from concurrent.futures import wait
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..ingestion import EsiosFetcher, IngestionPipeline
+from ..models import DownloadJob
+from .esios_sync import month_key
+from .training_jobs import claim_next_job, fail_stale_jobs, get_worker_name
+
+
+def enqueue_download_job(esios_token, download_indicators=True, years_back=5, sync=False):
+    """Queue an ESIOS download for the worker, returns the DownloadJob"""
+    return DownloadJob.objects.create(
+        esios_token=esios_token,
+        download_indicators=download_indicators,
+        years_back=years_back,
+        sync=sync,
+    )
+
+
+def fail_stale_download_jobs(stale_after=None):
+    """Fail running downloads whose worker stopped sending heartbeats, dropping their token"""
+    if stale_after is None:
+        stale_after = getattr(settings, 'DOWNLOAD_JOB_STALE_SECONDS', 300)
+    return fail_stale_jobs(stale_after, job_model=DownloadJob,
+                           error='El worker dejó de responder durante la descarga',
+                           reset_fields={'esios_token': ''})
+
+
+class DownloadProgress:
+    """
+    Per-indicator and per-month progress of a download job, saved to the row.
+
+    Months finish on the download threads, which only update the dict under a lock.
+    The thread running the job writes it to the database while it waits for them,
+    at most once every flush_interval seconds.
+    """
+
+    def __init__(self, job, flush_interval=1.0):
+        self.job = job
+        self.flush_interval = flush_interval
+        # EsiosClient of the download, its byte counter is reported on every flush
+        self.client = None
+        self.progress = {
+            'stage': None,
+            'total_months': 0,
+            'done_months': 0,
+            'failed_months': 0,
+            'skipped_months': 0,
+            'bytes': 0,
+            'eta_seconds': None,
+            'indicators': {},
+            'errors': [],
+        }
+        self._lock = threading.Lock()
+        self._started = None
+        self._flushed_at = 0.0
+
+    def _indicator(self, indicator_id, category=None):
+        return self.progress['indicators'].setdefault(str(indicator_id), {
+            'category': category, 'total': 0, 'done': 0, 'failed': 0, 'skipped': 0, 'months': {}
+        })
+
+    def stage(self, name):
+        with self._lock:
+            self.progress['stage'] = name
+            if name == 'downloading':
+                self._started = time.monotonic()
+        self.flush(force=True)
+
+    def plan(self, category, indicator_id, year, months, skipped=0):
+        """Register the months of a year that are going to be downloaded"""
+        with self._lock:
+            indicator = self._indicator(indicator_id, category)
+            indicator['total'] += len(months)
+            indicator['skipped'] += skipped
+            for month in months:
+                indicator['months'][month_key(year, month)] = 'pending'
+            self.progress['total_months'] += len(months)
+            self.progress['skipped_months'] += skipped
+
+    def month_finished(self, indicator_id, year, month, error=None):
+        """Done callback of a month's future, runs on the download threads"""
+        with self._lock:
+            indicator = self._indicator(indicator_id)
+            if error is None:
+                indicator['done'] += 1
+                indicator['months'][month_key(year, month)] = 'done'
+                self.progress['done_months'] += 1
+            else:
+                indicator['failed'] += 1
+                indicator['months'][month_key(year, month)] = 'failed'
+                self.progress['failed_months'] += 1
+                self.progress['errors'].append(f'{indicator_id} {month_key(year, month)}: {error}')
+
+    def snapshot(self):
+        """JSON copy of the progress with the current byte count and ETA"""
+        with self._lock:
+            if self.client is not None:
+                self.progress['bytes'] = self.client.bytes_received
+
+            finished = self.progress['done_months'] + self.progress['failed_months']
+            if self._started is not None and finished:
+                remaining = self.progress['total_months'] - finished
+                self.progress['eta_seconds'] = round((time.monotonic() - self._started) / finished * remaining, 1)
+
+            return json.loads(json.dumps(self.progress))
+
+    def flush(self, force=False):
+        """Save the progress and the heartbeat, call it from the thread running the job"""
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+
+        self.job.progress = self.snapshot()
+        self.job.heartbeat_at = timezone.now()
+        DownloadJob.objects.filter(id=self.job.id).update(
+            progress=self.job.progress, heartbeat_at=self.job.heartbeat_at
+        )
+
+    def wait(self, future):
+        """Block until future is done, saving the progress in the meantime"""
+        while not wait([future], timeout=self.flush_interval).done:
+            self.flush()
+        self.flush()
+
+
+def run_job(job):
+    """
+    Run a claimed job to completion, recording the result or the error. A job another
+    worker failed as stale in the meantime keeps that status.
+    """
+    progress = DownloadProgress(job)
+
+    try:
+        fetcher = EsiosFetcher.from_settings()
+        results = IngestionPipeline(fetcher.data_dir, fetcher).run(
+            ['fetch'],
+            token=job.esios_token,
+            download_indicators=job.download_indicators,
+            years_back=job.years_back,
+            sync=job.sync,
+            progress=progress,
+        )
+        result = {**results['fetch'], 'timings': results['timings']}
+        job.result = result
+        if result['errors'] and not result['downloaded_files']:
+            job.status = DownloadJob.STATUS_FAILED
+            job.error = f'La descarga ha fallado: {result["errors"][0]}'
+        else:
+            job.status = DownloadJob.STATUS_SUCCEEDED
+        progress.progress['stage'] = 'done'
+    except Exception as e:
+        job.status = DownloadJob.STATUS_FAILED
+        job.error = f'La descarga ha fallado: {str(e)}'
+
+    job.progress = progress.snapshot()
+    job.finished_at = timezone.now()
+    # The token isn't needed anymore
+    job.esios_token = ''
+    finished = DownloadJob.objects.filter(id=job.id, status=DownloadJob.STATUS_RUNNING, worker=job.worker).update(
+        status=job.status, result=job.result, error=job.error, progress=job.progress,
+        finished_at=job.finished_at, esios_token=job.esios_token
+    )
+    if not finished:
+        job.refresh_from_db()
+    return job
+
+
+def run_worker(poll_interval=2.0, once=False, worker=None, stdout=None):
+    """Poll the queue and run downloads one at a time. With once=True, drain the queue and return"""
+    worker = worker or get_worker_name()
+    jobs_run = 0
+
+    while True:
+        close_old_connections()
+        fail_stale_download_jobs()
+        job = claim_next_job(worker, job_model=DownloadJob)
+
+        if job is None:
+            if once:
+                return jobs_run
+            time.sleep(poll_interval)
+            continue
+
+        if stdout is not None:
+            stdout.write(f'Ejecutando trabajo de descarga {job.id}')
+        job = run_job(job)
+        jobs_run += 1
+        if stdout is not None:
+            stdout.write(f'Trabajo {job.id} terminado: {job.status}')
@@ -0,0 +1,89 @@
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def _scaled(values):
+    """Every series scaled to its own range, so large series don't drown the small ones"""
+    missing = np.isnan(values)
+    low = np.where(missing, np.inf, values).min(axis=0)
+    high = np.where(missing, -np.inf, values).max(axis=0)
+    with np.errstate(invalid='ignore'):
+        span = high - low
+    span = np.where(np.isfinite(span) & (span > 0), span, 1.0)
+    return (values - np.where(np.isfinite(low), low, 0.0)) / span
+
+
+def lttb_indices(values, max_points):
+    """
+    Row positions Largest-Triangle-Three-Buckets keeps out of `values` (rows x series),
+    with the row position as x. The rows are shared by all the series: in each bucket
+    the row whose triangles, added over the scaled series, are largest is kept.
+    NaN values add no area.
+
+    Each bucket depends on the row kept in the previous one, so the buckets are a loop,
+    but the averages and the areas of each bucket are computed for all rows and series at once.
+    """
+    n = len(values)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    y = _scaled(values)
+    x = np.arange(n, dtype=np.float64)
+    # max_points - 2 buckets between the first and the last row, which are always kept
+    edges = np.floor(np.linspace(1, n - 1, max_points - 1)).astype(np.int64)
+    counts = np.add.reduceat(~np.isnan(y), edges[:-1], axis=0)
+    with np.errstate(all='ignore'):
+        average_y = np.add.reduceat(np.nan_to_num(y), edges[:-1], axis=0) / counts
+    average_x = (edges[:-1] + edges[1:] - 1) / 2
+    # The last bucket looks ahead at the last row
+    average_y = np.vstack([average_y[1:], y[-1:]])
+    average_x = np.append(average_x[1:], x[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = average_x[i], average_y[i]
+        with np.errstate(invalid='ignore'):
+            area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi, None]) * (cy - y[a]))
+        a = lo + int(np.argmax(np.nansum(area, axis=1)))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_buckets(values, max_points):
+    """
+    (row positions, values) of max_points // 2 buckets of consecutive rows, each one
+    as two rows: the first and last row of the bucket, holding the min and the max
+    of every series in the order they happen. The envelope of the series is kept.
+    """
+    n, n_series = values.shape
+    if n <= max_points or max_points < 2:
+        return np.arange(n), values
+
+    size = -(-n // (max_points // 2))
+    n_buckets = -(-n // size)
+    blocks = np.full((n_buckets * size, n_series), np.nan)
+    blocks[:n] = values
+    blocks = blocks.reshape(n_buckets, size, n_series)
+
+    missing = np.isnan(blocks)
+    low = np.where(missing, np.inf, blocks).argmin(axis=1)
+    high = np.where(missing, -np.inf, blocks).argmax(axis=1)
+    # All-NaN buckets point at a NaN, so they stay NaN
+    low_values = np.take_along_axis(blocks, low[:, None, :], axis=1)[:, 0]
+    high_values = np.take_along_axis(blocks, high[:, None, :], axis=1)[:, 0]
+    low_first = low <= high
+    first = np.where(low_first, low_values, high_values)
+    second = np.where(low_first, high_values, low_values)
+
+    starts = np.arange(n_buckets) * size
+    ends = np.minimum(starts + size, n) - 1
+    positions = np.column_stack([starts, ends]).ravel()
+    out = np.stack([first, second], axis=1).reshape(-1, n_series)
+    # A single-row bucket (the last one can be) is one row, not two
+    keep = np.ones(len(positions), dtype=bool)
+    keep[1::2] = ends > starts
+    return positions[keep], out[keep]
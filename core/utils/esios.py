@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ESIOS_BASE_ENDPOINT = 'https://api.esios.ree.es/indicators'
+
+# The format of this dicc is: path -> [ids]
+# Price vars are the variables to predict
+DATA_TO_DOWNLOAD = {
+    "energy_generation/hydraulic": [1, 36, 71],
+    "energy_generation/nuclear": [4, 39, 74],
+    "energy_generation/wind": [12],
+    "energy_generation/solar": [14],
+    "energy_demand/peninsula_forecast": [460],
+    "energy_demand/scheduled_demand": [358, 365, 372],
+    "price/daily_spot_market": [600],
+    "price/average_demand_price": [573]
+}
+
+# Rate limited or a temporary server error, worth another try
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def esios_headers(token):
+    """API headers for the provided token"""
+    return {
+        'Accept': 'application/json; application/vnd.esios-api-v2+json',
+        'Content-Type': 'application/json',
+        'Host': 'api.esios.ree.es',
+        'Cookie': '',
+        'Authorization': f'Token token={token}',
+        'x-api-key': f'{token}',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache'
+    }
+
+
+def month_date_range(year, month, today=None):
+    """(start, end) dates of a month, end is today for the current month"""
+    today = today or datetime.today()
+    start_date = datetime(year, month, 1)
+
+    # If it's the current year and month, use today as the end date
+    if year == today.year and month == today.month:
+        end_date = today
+    else:
+        # Otherwise, use the last day of the month
+        if month == 12:
+            end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
+        else:
+            end_date = datetime(year, month + 1, 1) - timedelta(days=1)
+
+    return start_date, end_date
+
+
+def monthly_endpoint(base_endpoint, indicator_id, start_date, end_date):
+    """Indicator URL for five minute values between two dates"""
+    return (f"{base_endpoint}/{indicator_id}?"
+            f"start_date={start_date.strftime('%Y-%m-%d')}T00:00&"
+            f"end_date={end_date.strftime('%Y-%m-%d')}T23:59&"
+            f"time_trunc=five_minutes")
+
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a request may be sent"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EsiosClient:
+    """
+    HTTP client for the ESIOS API shared by the threads of a download.
+
+    Every thread keeps its own requests.Session, so connections (and their TLS
+    handshake) are reused between requests. All threads share one token bucket,
+    and 429/5xx answers and connection errors are retried with exponential
+    backoff, honouring Retry-After when the server sends it.
+    """
+
+    def __init__(self, headers, max_workers=6, requests_per_second=5.0,
+                 max_retries=5, backoff=1.0, max_backoff=60.0, timeout=60):
+        self.headers = headers
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        # Body bytes of the successful responses, read by the download progress
+        self.bytes_received = 0
+        self._bytes_lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        # Jitter keeps the workers from retrying in lockstep
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def get(self, url, stream=False):
+        """GET url through the rate limiter, retrying 429/5xx. Returns the response"""
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self._session().get(url, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                response.close()
+                time.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            if not stream:
+                with self._bytes_lock:
+                    self.bytes_received += len(response.content)
+            return response
+
+    def iter_content(self, url, chunk_size=64 * 1024):
+        """GET url like get() and yield the body in chunks, it's never held whole"""
+        response = self.get(url, stream=True)
+        try:
+            for chunk in response.iter_content(chunk_size):
+                with self._bytes_lock:
+                    self.bytes_received += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+
+    def get_json(self, url):
+        return self.get(url).json()
+
+    def close(self):
+        """Close the connections of every thread's session"""
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
@@ -0,0 +1,190 @@
+import codecs
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Records turned into arrays at a time, only these are ever held as Python objects
+RECORD_BATCH_SIZE = 10000
+
+_WHITESPACE = re.compile(r'[\s,]*')
+
+
+def iter_json_array(chunks, key):
+    """
+    Yield the items of the first "key": [...] array of a JSON document that
+    arrives as byte chunks, without holding the whole document or parsing the
+    rest of it. Raises ValueError when the document ends before the array does.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    start = re.compile(r'(?<!\\)"%s"\s*:\s*\[' % re.escape(key))
+    chunks = iter(chunks)
+    buffer, pos, in_array, eof = '', 0, False, False
+
+    while True:
+        if not in_array:
+            match = start.search(buffer)
+            if match:
+                pos, in_array = match.end(), True
+                continue
+            # The key can be split between two chunks
+            buffer = buffer[-(len(key) + 64):]
+        else:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if buffer.startswith(']', pos):
+                return
+            if pos < len(buffer):
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"Truncated '{key}' array in the response")
+                else:
+                    yield item
+                    continue
+
+        if eof:
+            if not in_array:
+                raise ValueError(f"'{key}' not found in the response")
+            raise ValueError(f"Truncated '{key}' array in the response")
+
+        chunk = next(chunks, None)
+        buffer = buffer[pos:]
+        pos = 0
+        if chunk is None:
+            eof = True
+            buffer += utf8.decode(b'', final=True)
+        else:
+            buffer += utf8.decode(chunk)
+
+
+def _utc_offset_minutes(local_datetime):
+    """Minutes east of UTC of an ISO string like 2024-01-01T00:00:00.000+01:00"""
+    if not local_datetime or local_datetime.endswith('Z'):
+        return 0
+    suffix = local_datetime[-6:]
+    if suffix[0] not in '+-' or suffix[3] != ':':
+        return 0
+    minutes = int(suffix[1:3]) * 60 + int(suffix[4:6])
+    return -minutes if suffix[0] == '-' else minutes
+
+
+def _compact_batch(batch, has_geo):
+    columns = {
+        'value': np.array([np.nan if r.get('value') is None else r['value'] for r in batch], dtype=np.float32),
+        'datetime_utc': pd.to_datetime([r.get('datetime_utc') for r in batch], utc=True, format='ISO8601')
+                          .as_unit('ns').asi8,
+        'utc_offset': np.array([_utc_offset_minutes(r.get('datetime')) for r in batch], dtype=np.int16),
+    }
+    if has_geo:
+        columns['geo_id'] = np.array([-1 if r.get('geo_id') is None else r['geo_id'] for r in batch], dtype=np.int32)
+        columns['geo_name'] = pd.Categorical([r.get('geo_name') for r in batch])
+    return columns
+
+
+def compact_values(records, batch_size=RECORD_BATCH_SIZE):
+    """
+    Compact DataFrame of ESIOS value records: float32 value, datetime_utc as int64
+    epoch nanoseconds, utc_offset (minutes) of the local datetime and, when the
+    records have them, int32 geo_id and a categorical geo_name.
+    """
+    batches, batch, has_geo = [], [], False
+
+    for record in records:
+        batch.append(record)
+        has_geo = has_geo or 'geo_name' in record
+        if len(batch) >= batch_size:
+            batches.append(_compact_batch(batch, has_geo))
+            batch = []
+    if batch or not batches:
+        batches.append(_compact_batch(batch, has_geo))
+
+    frame = {}
+    for name in ('value', 'datetime_utc', 'utc_offset'):
+        frame[name] = np.concatenate([b[name] for b in batches])
+    if has_geo:
+        # Batches read before the first geo had none
+        frame['geo_id'] = np.concatenate([b.get('geo_id', np.full(len(b['value']), -1, np.int32)) for b in batches])
+        frame['geo_name'] = pd.api.types.union_categoricals(
+            [b.get('geo_name', pd.Categorical([None] * len(b['value']))) for b in batches])
+    return pd.DataFrame(frame)
+
+
+def expand_values(df):
+    """
+    Frame in the layout of the yearly CSVs from a compact one: ISO strings for
+    datetime_utc, tz_time and the local datetime rebuilt from utc_offset, as
+    ESIOS sends them. Columns that aren't compact are left as they are.
+    """
+    df = df.copy()
+    if 'datetime_utc' not in df.columns or df['datetime_utc'].dtype.kind != 'i':
+        return df
+
+    utc = df['datetime_utc'].to_numpy().astype('datetime64[ns]')
+    if 'utc_offset' in df.columns:
+        offsets = df.pop('utc_offset').to_numpy(dtype=np.int64)
+        local = utc + offsets.astype('timedelta64[m]')
+        suffixes = np.array([f"{'-' if offset < 0 else '+'}{abs(offset) // 60:02d}:{abs(offset) % 60:02d}"
+                             for offset in range(-24 * 60, 24 * 60 + 1)])
+        df.insert(df.columns.get_loc('datetime_utc'), 'datetime',
+                  np.char.add(np.datetime_as_string(local, unit='ms'), suffixes[offsets + 24 * 60]))
+    df['datetime_utc'] = np.char.add(np.datetime_as_string(utc, unit='s'), 'Z')
+    # Same instant as datetime_utc with milliseconds, the yearly files always had it
+    df.insert(df.columns.get_loc('datetime_utc') + 1, 'tz_time',
+              np.char.add(np.datetime_as_string(utc, unit='ms'), 'Z'))
+    return df
+
+
+def write_chunk(df, path):
+    """Save a frame as an uncompressed .npz, categoricals as codes plus categories"""
+    arrays = {'__columns__': np.array(df.columns, dtype=str)}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays[f'{name}__codes'] = column.cat.codes.to_numpy()
+            arrays[f'{name}__categories'] = np.array(column.cat.categories, dtype=str)
+        elif column.dtype == object:
+            arrays[name] = column.to_numpy(dtype=str)
+        else:
+            arrays[name] = column.to_numpy()
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+    return path
+
+
+def read_chunk(path):
+    """Frame written by write_chunk"""
+    with np.load(path) as arrays:
+        frame = {}
+        for name in arrays['__columns__']:
+            if f'{name}__codes' in arrays:
+                frame[name] = pd.Categorical.from_codes(arrays[f'{name}__codes'], arrays[f'{name}__categories'])
+            else:
+                frame[name] = arrays[name]
+        return pd.DataFrame(frame)
+
+
+def read_expanded_chunk(path):
+    """Month chunk in the layout of the yearly CSVs"""
+    return expand_values(read_chunk(path))
+
+
+def write_yearly_file(file_path, chunk_paths):
+    """
+    Write the month chunks, in order, as one yearly CSV. Months are appended one
+    at a time, so only one of them is in memory.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    columns = None
+    with open(f'{file_path}.tmp', 'w', newline='') as f:
+        for chunk_path in chunk_paths:
+            month = read_expanded_chunk(chunk_path)
+            if columns is None:
+                columns = list(month.columns)
+                month.to_csv(f, index=False)
+            else:
+                month.reindex(columns=columns).to_csv(f, index=False, header=False)
+    os.replace(f'{file_path}.tmp', file_path)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+MANIFEST_NAME = 'esios_manifest.json'
+
+
+def month_key(year, month):
+    return f'{year}-{month:02d}'
+
+
+def _month_column(df):
+    """Local time column, the one the monthly requests are cut by"""
+    return 'datetime' if 'datetime' in df.columns else 'datetime_utc'
+
+
+def month_fingerprint(df):
+    """Rows, content hash and last timestamp of a downloaded month"""
+    column = _month_column(df)
+    last_timestamp = df[column].max() if column in df.columns and len(df) else None
+    if last_timestamp is not None and df[column].dtype.kind == 'i':
+        # Compact months keep datetime_utc as epoch nanoseconds
+        last_timestamp = pd.Timestamp(last_timestamp, tz='UTC')
+    return {
+        'rows': len(df),
+        'sha256': hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest(),
+        'last_timestamp': str(last_timestamp) if last_timestamp is not None else None,
+    }
+
+
+# Fingerprint of a month ESIOS had no values for, it never gets a row in the yearly file
+EMPTY_MONTH = {'rows': 0, 'sha256': None, 'last_timestamp': None}
+
+
+# Rows of an existing yearly file read at a time while it is rewritten
+YEARLY_FILE_READ_ROWS = 50000
+
+
+def merge_months_into_yearly_file(file_path, year, monthly_data, chunksize=YEARLY_FILE_READ_ROWS):
+    """
+    Replace the rows of the given months in a yearly {indicator_id}_{year}.csv
+    and keep the others. monthly_data maps month -> downloaded DataFrame, or a
+    callable returning it so only one month is loaded at a time.
+
+    The file is rewritten as it is read, chunksize rows at a time, with every
+    refreshed month written in place of its old rows, so memory stays flat in
+    the size of the year. Months keep the columns of the existing file.
+    """
+    pending = sorted(monthly_data)
+    refreshed = {month_key(year, month) for month in pending}
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    columns = None
+
+    def write(f, frame):
+        nonlocal columns
+        if columns is None:
+            columns = list(frame.columns)
+            frame.to_csv(f, index=False)
+        else:
+            frame.reindex(columns=columns).to_csv(f, index=False, header=False)
+
+    def write_month(f, month):
+        frame = monthly_data[month]
+        frame = frame() if callable(frame) else frame
+        column = _month_column(frame)
+        write(f, frame.sort_values(column, kind='stable') if column in frame.columns else frame)
+
+    with open(f'{file_path}.tmp', 'w', newline='') as f:
+        if os.path.exists(file_path):
+            for existing in pd.read_csv(file_path, chunksize=chunksize):
+                if columns is None:
+                    # The header goes first even if the first rows are replaced
+                    write(f, existing.iloc[:0])
+                keys = existing[_month_column(existing)].astype(str).str[:7]
+                # Yearly files are in time order, so are the months of a chunk
+                for key in keys.unique():
+                    while pending and month_key(year, pending[0]) < key:
+                        write_month(f, pending.pop(0))
+                    if key not in refreshed:
+                        write(f, existing[keys == key])
+        for month in pending:
+            write_month(f, month)
+    os.replace(f'{file_path}.tmp', file_path)
+
+
+class EsiosManifest:
+    """
+    Months already downloaded for every indicator, kept in data/esios_manifest.json.
+
+    A month is closed once it was fetched settle_days after it ended, ESIOS keeps
+    revising recent values for a while. Closed months whose yearly file is still
+    there are skipped by a sync, the rest are downloaded again. Closed months
+    that came back empty (EMPTY_MONTH) are skipped with or without a file, there
+    is nothing of theirs to lose.
+    """
+
+    def __init__(self, path, indicators=None):
+        self.path = path
+        self.indicators = indicators or {}
+
+    @classmethod
+    def load(cls, data_dir):
+        path = os.path.join(data_dir, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                return cls(path, json.load(f).get('indicators', {}))
+        except FileNotFoundError:
+            return cls(path)
+        except Exception as e:
+            print(f"Warning: Could not load the ESIOS manifest, every month will be downloaded: {e}")
+            return cls(path)
+
+    def entry(self, indicator_id, year, month):
+        return self.indicators.get(str(indicator_id), {}).get(month_key(year, month))
+
+    def is_closed(self, indicator_id, year, month, settle_days):
+        entry = self.entry(indicator_id, year, month)
+        if entry is None:
+            return False
+        month_end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        return datetime.fromisoformat(entry['fetched_at']) >= month_end + timedelta(days=settle_days)
+
+    def is_empty(self, indicator_id, year, month):
+        entry = self.entry(indicator_id, year, month)
+        return entry is not None and entry['rows'] == 0
+
+    def months_to_fetch(self, indicator_id, year, months, file_path, settle_days):
+        """Months of a year that are missing or still open"""
+        has_file = os.path.exists(file_path)
+        return [month for month in months
+                if not (self.is_closed(indicator_id, year, month, settle_days)
+                        and (has_file or self.is_empty(indicator_id, year, month)))]
+
+    def changed(self, indicator_id, year, month, fingerprint):
+        """Whether a downloaded month differs from the one recorded"""
+        entry = self.entry(indicator_id, year, month)
+        return entry is None or entry['sha256'] != fingerprint['sha256']
+
+    def record(self, indicator_id, year, month, fingerprint, fetched_at):
+        """Store what was fetched for a month, call it once the month is saved"""
+        months = self.indicators.setdefault(str(indicator_id), {})
+        months[month_key(year, month)] = {**fingerprint, 'fetched_at': fetched_at.isoformat()}
+
+    def forget_year(self, indicator_id, year):
+        """Drop the months of a year, its file is being rewritten from scratch"""
+        months = self.indicators.get(str(indicator_id), {})
+        for key in [key for key in months if key.startswith(f'{year}-')]:
+            del months[key]
+
+    def save(self):
+        """Write the manifest atomically, a failed write only costs downloading again"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f'{self.path}.tmp', 'w') as f:
+                json.dump({'indicators': self.indicators}, f, indent=2, sort_keys=True)
+            os.replace(f'{self.path}.tmp', self.path)
+        except Exception as e:
+            print(f"Warning: Could not save the ESIOS manifest: {e}")
@@ -0,0 +1,134 @@
+import struct
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+
+from ..models import TimeSeriesData
+from .downsampling import lttb_indices, minmax_buckets
+from .historical_stream import dumps
+from .timeseries_store import HOUR, _hour_offsets
+
+
+class ColumnarSeries:
+    """
+    A /historical/ range as one float64 array per column, for format=columnar and
+    format=binary. Hourly rows (or daily, weekly rollups) go on a dense grid, `start`
+    plus `step` seconds per value, with NaN for the missing ones, so no timestamps
+    are sent. Rows off the grid, and months, keep their `timestamps` instead.
+    """
+
+    def __init__(self, columns, values, start=None, timestamps=None, step=HOUR):
+        self.columns = columns
+        self.values = values
+        self.start = start
+        self.timestamps = timestamps
+        self.step = step
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def from_window(cls, window):
+        """Series of a TimeSeriesWindow of the store"""
+        if not len(window):
+            return cls(window.columns, window.values)
+
+        hours = window.hours - window.hours[0]
+        n_hours = int(hours[-1]) + 1
+        if n_hours == len(hours):
+            values = window.values
+        else:
+            values = np.full((n_hours, len(window.columns)), np.nan)
+            values[hours] = window.values
+        return cls(window.columns, values, start=window.epoch + timedelta(hours=int(window.hours[0])))
+
+    @classmethod
+    def query(cls, start_time, end_time, columns):
+        """Series of the range read through the ORM, when the store can't serve it"""
+        rows = list(
+            TimeSeriesData.objects.filter(datetime_utc__range=[start_time, end_time])
+            .order_by('datetime_utc').values_list('datetime_utc', *columns)
+        )
+        return cls.from_rows(columns, rows, HOUR)
+
+    @classmethod
+    def from_rows(cls, columns, rows, step=None):
+        """Series of values_list rows (datetime, *columns), on a grid of `step` if they fit one"""
+        values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(columns))
+        if not rows:
+            return cls(columns, values)
+
+        datetimes = [row[0] for row in rows]
+        start = datetimes[0].astimezone(dt_timezone.utc)
+        offsets = _hour_offsets(datetimes, start, step) if step is not None else None
+        if offsets is None:
+            return cls(columns, values, timestamps=datetimes)
+
+        grid = np.full((int(offsets[-1]) + 1, len(columns)), np.nan)
+        grid[offsets] = values
+        return cls(columns, grid, start=start, step=step)
+
+    def timestamp(self, position):
+        if self.timestamps is not None:
+            return self.timestamps[position]
+        return self.start + self.step * int(position)
+
+    def downsample(self, max_points, method='lttb'):
+        """
+        At most max_points rows, chosen by Largest-Triangle-Three-Buckets or as the
+        min/max of buckets of rows (see core.utils.downsampling). The rows left are
+        not evenly spaced, so the result has timestamps.
+        """
+        if len(self) <= max_points:
+            return self
+        if method == 'minmax':
+            positions, values = minmax_buckets(self.values, max_points)
+        else:
+            positions = lttb_indices(self.values, max_points)
+            values = self.values[positions]
+        return ColumnarSeries(self.columns, values, timestamps=[self.timestamp(p) for p in positions])
+
+    def _present(self):
+        """Positions of the rows with any value, the hours the table has"""
+        return np.flatnonzero(~np.isnan(self.values).all(axis=1))
+
+    def _nullable(self, positions, i):
+        values = self.values[positions, i].astype(object)
+        values[np.isnan(self.values[positions, i])] = None
+        return values.tolist()
+
+    def records(self):
+        """One {'datetime', column: value} dict per row with values, like the rows of /historical/"""
+        positions = self._present()
+        keys = ['datetime'] + self.columns
+        columns = zip(*(self._nullable(positions, i) for i in range(len(self.columns))))
+        return [dict(zip(keys, (self.timestamp(p), *row))) for p, row in zip(positions, columns)]
+
+    def by_column(self):
+        """The rows with values as {'datetime': [...], column: [...]}, the shape=columns of /historical/"""
+        positions = self._present()
+        data = {'datetime': [self.timestamp(p) for p in positions]}
+        for i, column in enumerate(self.columns):
+            data[column] = self._nullable(positions, i)
+        return data
+
+    def _axis(self):
+        if self.timestamps is not None:
+            return {'start': None, 'step': None, 'timestamps': self.timestamps}
+        return {'start': self.start, 'step': int(self.step.total_seconds())}
+
+    def to_json(self):
+        """{'start', 'step', 'data': {column: [values, null for NaN]}}"""
+        data = {column: self._nullable(slice(None), i) for i, column in enumerate(self.columns)}
+        return {**self._axis(), 'data': data}
+
+    def to_binary(self, metadata):
+        """
+        uint32 little-endian length of a UTF-8 JSON header (the axis, `series` with
+        the column order and `metadata`), padded with spaces to a multiple of 4
+        bytes, then every column as little-endian float32 one after another.
+        """
+        header = dumps({**self._axis(), 'series': self.columns, 'dtype': '<f4', **metadata}).encode()
+        header += b' ' * (-(4 + len(header)) % 4)
+        values = np.ascontiguousarray(self.values.T, dtype='<f4')
+        return struct.pack('<I', len(header)) + header + values.tobytes()
@@ -0,0 +1,112 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Max
+from rest_framework.utils.encoders import JSONEncoder
+
+from ..models import TimeSeriesData
+from .timeseries_store import FEATURE_COLUMNS
+
+
+def dumps(value):
+    """JSON like DRF's JSONRenderer writes it: compact, UTF-8 and datetimes in ISO 8601"""
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def _join(chunks):
+    """Lists serialized as the items of one JSON array, a chunk at a time"""
+    first = True
+    for chunk in chunks:
+        if chunk:
+            yield dumps(chunk)[1:-1] if first else ',' + dumps(chunk)[1:-1]
+            first = False
+
+
+class HistoricalStream:
+    """
+    /historical/ rows read from a values_list cursor and serialized a chunk at a time,
+    so a response over years of hours holds one chunk of rows in memory, not all of them.
+
+    The 'rows' shape gives one object per hour, the 'columns' shape one array per column
+    (and one of datetimes), each read by its own query so it can be written in one go.
+    Those queries are pinned to the rows that existed when they started, so a load
+    committing while the response streams can't leave arrays of different lengths.
+    """
+
+    def __init__(self, start_time, end_time, columns, shape='rows', chunk_size=None):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.columns = [col for col in columns if col in FEATURE_COLUMNS]
+        self.shape = shape
+        self.chunk_size = chunk_size or getattr(settings, 'HISTORICAL_STREAM_CHUNK_SIZE', 2000)
+        self.count = 0
+
+    def _queryset(self):
+        return TimeSeriesData.objects.filter(
+            datetime_utc__range=[self.start_time, self.end_time]
+        ).order_by('datetime_utc')
+
+    def exists(self):
+        return self._queryset().exists()
+
+    def _values(self, *fields, last_id=None):
+        """Lists of up to chunk_size values_list rows, flat for a single field. last_id pins the rows"""
+        queryset = self._queryset()
+        if last_id is not None:
+            queryset = queryset.filter(id__lte=last_id)
+        cursor = queryset.values_list(*fields, flat=len(fields) == 1).iterator(chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(cursor, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _counted(self, chunks):
+        for chunk in chunks:
+            self.count += len(chunk)
+            yield chunk
+
+    def _rows(self):
+        keys = ['datetime'] + self.columns
+        for chunk in self._counted(self._values('datetime_utc', *self.columns)):
+            yield [dict(zip(keys, row)) for row in chunk]
+
+    def _series(self):
+        """(name, chunks of its values) for the datetimes and then every column, all of the same rows"""
+        # Loads upsert, rows already there keep their id and new ones get higher ids
+        last_id = self._queryset().aggregate(last_id=Max('id'))['last_id'] or 0
+        yield 'datetime', self._counted(self._values('datetime_utc', last_id=last_id))
+        for column in self.columns:
+            yield column, self._values(column, last_id=last_id)
+
+    def json(self, metadata):
+        """
+        The /historical/ document: {"data": ..., **metadata(count)}. `data` is streamed
+        first, so the fields that depend on the row count can follow it.
+        """
+        if self.shape == 'columns':
+            yield '{"data":{'
+            for i, (name, chunks) in enumerate(self._series()):
+                yield f'{"," if i else ""}{dumps(name)}:['
+                yield from _join(chunks)
+                yield ']'
+            yield '}'
+        else:
+            yield '{"data":['
+            yield from _join(self._rows())
+            yield ']'
+
+        fields = dumps(metadata(self.count))
+        yield ',' + fields[1:] if fields != '{}' else '}'
+
+    def ndjson(self):
+        """One line per row, or per column with the 'columns' shape"""
+        if self.shape == 'columns':
+            for name, chunks in self._series():
+                yield f'{{"column":{dumps(name)},"values":['
+                yield from _join(chunks)
+                yield ']}\n'
+        else:
+            for chunk in self._rows():
+                yield ''.join(dumps(row) + '\n' for row in chunk)
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+
+class BatchMetrics:
+    """Counters for batch sizes and queue waits, safe to update from many threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.batches = 0
+            self.max_batch_size = 0
+            self.batch_size_histogram = defaultdict(int)
+            self.total_queue_wait = 0.0
+            self.max_queue_wait = 0.0
+            self.total_inference_time = 0.0
+            self.per_model = defaultdict(lambda: {'requests': 0, 'batches': 0})
+
+    def record_batch(self, model_name, queue_waits, inference_time):
+        batch_size = len(queue_waits)
+        with self._lock:
+            self.requests += batch_size
+            self.batches += 1
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.batch_size_histogram[batch_size] += 1
+            self.total_queue_wait += sum(queue_waits)
+            self.max_queue_wait = max(self.max_queue_wait, max(queue_waits))
+            self.total_inference_time += inference_time
+            self.per_model[model_name]['requests'] += batch_size
+            self.per_model[model_name]['batches'] += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'avg_batch_size': round(self.requests / self.batches, 3) if self.batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+                'avg_queue_wait_ms': round(self.total_queue_wait / self.requests * 1000, 3) if self.requests else 0,
+                'max_queue_wait_ms': round(self.max_queue_wait * 1000, 3),
+                'avg_batch_inference_ms': round(self.total_inference_time / self.batches * 1000, 3) if self.batches else 0,
+                'per_model': {name: dict(counts) for name, counts in self.per_model.items()},
+            }
+
+
+class _PendingBatch:
+    """Requests collected for one (model, input width) during a batch window"""
+
+    def __init__(self):
+        self.inputs = []
+        self.enqueued_at = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.outputs = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-sample predictions into one forward pass.
+
+    The first request for a given model and input width becomes the leader of a
+    new batch: it waits up to `window_ms` (or until `max_batch_size` requests
+    joined), runs the model once on the stacked inputs and hands every caller
+    its own row back. Requests that arrive while a batch is open just join it.
+    """
+
+    def __init__(self, window_ms=5, max_batch_size=32):
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.metrics = BatchMetrics()
+        self._lock = threading.Lock()
+        self._open_batches = {}
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_batch_size > 1
+
+    def predict(self, model_name, forward, input_data):
+        """
+        Predict a (1, input_hours, n_features) array, batched with concurrent calls.
+        `forward` runs the model on a stacked (batch, input_hours, n_features) array.
+        """
+        if not self.enabled:
+            return forward(input_data)
+
+        # The forward callable is part of the key so a registry swap never mixes generations
+        key = (model_name, id(forward), input_data.shape[1:])
+
+        with self._lock:
+            batch = self._open_batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = _PendingBatch()
+                self._open_batches[key] = batch
+
+            index = len(batch.inputs)
+            batch.inputs.append(input_data)
+            batch.enqueued_at.append(time.perf_counter())
+
+            if len(batch.inputs) >= self.max_batch_size:
+                del self._open_batches[key]
+                batch.full.set()
+
+        if is_leader:
+            self._run_batch(key, model_name, forward, batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+        return batch.outputs[index:index + 1]
+
+    def _run_batch(self, key, model_name, forward, batch):
+        batch.full.wait(self.window_ms / 1000)
+
+        # Close the batch so late arrivals start a new one
+        with self._lock:
+            if self._open_batches.get(key) is batch:
+                del self._open_batches[key]
+
+        started = time.perf_counter()
+        try:
+            batch.outputs = forward(np.concatenate(batch.inputs, axis=0))
+        except Exception as e:
+            batch.error = e
+        finally:
+            finished = time.perf_counter()
+            queue_waits = [started - enqueued for enqueued in batch.enqueued_at]
+            self.metrics.record_batch(model_name, queue_waits, finished - started)
+            batch.done.set()
+
+    def config(self):
+        return {
+            'enabled': self.enabled,
+            'window_ms': self.window_ms,
+            'max_batch_size': self.max_batch_size,
+        }
+
+
+_inference_batcher = None
+_inference_batcher_lock = threading.Lock()
+
+
+def get_inference_batcher():
+    """Process-wide batcher configured from PREDICTION_BATCH_WINDOW_MS / PREDICTION_MAX_BATCH_SIZE"""
+    global _inference_batcher
+    if _inference_batcher is None:
+        with _inference_batcher_lock:
+            if _inference_batcher is None:
+                _inference_batcher = MicroBatcher(
+                    window_ms=getattr(settings, 'PREDICTION_BATCH_WINDOW_MS', 5),
+                    max_batch_size=getattr(settings, 'PREDICTION_MAX_BATCH_SIZE', 32),
+                )
+    return _inference_batcher
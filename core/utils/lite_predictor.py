@@ -0,0 +1,90 @@
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from .predictor_base import BasePredictor
+
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        Interpreter = None
+
+
+class LitePredictor(BasePredictor):
+    """
+    Serves the TFLite flatbuffers exported by TimeSeriesPredictor.export_tflite()
+    with the standalone LiteRT interpreter, so workers never import TensorFlow.
+    `models` maps each model name to its flatbuffer bytes.
+    """
+
+    def __init__(self, max_horizon=24):
+        super().__init__(max_horizon=max_horizon)
+        self._forward_fns = {}
+        self._forward_fns_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, models_dir, model_names):
+        """Build a LitePredictor from normalization_params.pkl and the {name}_model.tflite files"""
+        if Interpreter is None:
+            raise ImportError("El backend 'tflite' necesita ai-edge-litert o tflite-runtime instalado")
+
+        with open(os.path.join(models_dir, 'normalization_params.pkl'), 'rb') as f:
+            norm_params = pickle.load(f)
+
+        predictor = cls()
+        predictor.train_mean = norm_params['train_mean']
+        predictor.train_std = norm_params['train_std']
+        predictor.column_indices = norm_params['column_indices']
+
+        for model_name in model_names:
+            model_path = os.path.join(models_dir, f'{model_name}_model.tflite')
+            if os.path.exists(model_path):
+                with open(model_path, 'rb') as f:
+                    predictor.models[model_name] = f.read()
+
+        return predictor
+
+    def is_batchable(self, model_name: str) -> bool:
+        """Flatbuffers are exported with batch 1 and run row by row, a batch window would only add latency"""
+        return False
+
+    def get_forward_fn(self, model_name: str, input_hours: int, n_features: int):
+        """Return the cached interpreter call for a model and input shape, allocating it on first use"""
+        model_content = self.models[model_name]
+        key = (model_name, id(model_content), input_hours, n_features)
+        forward = self._forward_fns.get(key)
+
+        if forward is None:
+            with self._forward_fns_lock:
+                forward = self._forward_fns.get(key)
+                if forward is None:
+                    forward = self._build_forward_fn(model_content, input_hours, n_features)
+                    self._forward_fns[key] = forward
+
+        return forward
+
+    def _build_forward_fn(self, model_content, input_hours, n_features):
+        interpreter = Interpreter(model_content=model_content)
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+        interpreter.resize_tensor_input(input_index, [1, input_hours, n_features])
+        interpreter.allocate_tensors()
+        # An interpreter holds its tensors, so concurrent calls must take turns
+        lock = threading.Lock()
+
+        def forward(inputs):
+            outputs = []
+            with lock:
+                # Exported with batch 1, micro-batches are run row by row
+                for row in inputs:
+                    interpreter.set_tensor(input_index, row[np.newaxis].astype(np.float32))
+                    interpreter.invoke()
+                    outputs.append(interpreter.get_tensor(output_index).copy())
+            return np.concatenate(outputs, axis=0)
+
+        return forward
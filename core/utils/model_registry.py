@@ -0,0 +1,251 @@
+import os
+import pickle
+import shutil
+import threading
+import time
+
+from django.conf import settings
+
+from .inference_batching import get_inference_batcher
+from .columnar_dataset import read_dataset
+
+MODEL_NAMES = ['linear', 'dense', 'conv', 'lstm']
+NORMALIZATION_FILE = 'normalization_params.pkl'
+# Written last by run_training, so a half-saved generation is never picked up
+GENERATION_FILE = 'generation.txt'
+# Every training saves its artifacts into models_dir/generation-<id>/, never over a published one
+GENERATION_DIR_PREFIX = 'generation-'
+
+
+def get_models_dir():
+    """Directory where the trained models are stored (MEDIA_ROOT/models)"""
+    return os.path.join(settings.MEDIA_ROOT, 'models')
+
+
+def generation_dir(models_dir, generation):
+    """Directory a training generation saves its artifacts into"""
+    return os.path.join(models_dir, f'{GENERATION_DIR_PREFIX}{generation}')
+
+
+def artifacts_dir(models_dir, generation=None):
+    """
+    Directory to load the models of a generation from: its generation directory,
+    or models_dir itself for models saved before generations had one.
+    """
+    if generation is not None and os.path.isdir(generation_dir(models_dir, generation)):
+        return generation_dir(models_dir, generation)
+    return models_dir
+
+
+def read_generation_marker(models_dir):
+    """Generation currently published in models_dir, None without a marker"""
+    try:
+        with open(os.path.join(models_dir, GENERATION_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_generation_marker(models_dir, generation, keep=2):
+    """
+    Publish a new training generation in models_dir (call after every artifact is
+    saved). The marker is replaced atomically, then generation directories older
+    than the last `keep` are removed.
+    """
+    with open(os.path.join(models_dir, f'{GENERATION_FILE}.tmp'), 'w') as f:
+        f.write(str(generation))
+    os.replace(os.path.join(models_dir, f'{GENERATION_FILE}.tmp'), os.path.join(models_dir, GENERATION_FILE))
+
+    # Generation ids sort by time, the ones before the current are kept while a worker may still load them
+    current = os.path.basename(generation_dir(models_dir, generation))
+    older = sorted(name for name in os.listdir(models_dir)
+                   if name.startswith(GENERATION_DIR_PREFIX) and name != current)
+    for name in older[:max(len(older) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(models_dir, name), ignore_errors=True)
+
+
+def get_prediction_backend():
+    """Inference backend used by /predict/: 'keras', 'tflite' (LiteRT) or 'numpy' (Dense models in NumPy)"""
+    return getattr(settings, 'PREDICTION_BACKEND', 'keras')
+
+
+def load_predictor(models_dir):
+    """Build the predictor of the configured backend from the artifacts saved in models_dir"""
+    backend = get_prediction_backend()
+    if backend == 'tflite':
+        return load_lite_predictor(models_dir)
+    if backend == 'numpy':
+        return load_numpy_predictor(models_dir)
+    return load_keras_predictor(models_dir)
+
+
+def load_numpy_predictor(models_dir):
+    """Build a NumpyPredictor from the .h5 weights saved in models_dir"""
+    try:
+        from .numpy_predictor import NumpyPredictor
+
+        predictor = NumpyPredictor.load(models_dir, MODEL_NAMES)
+        predictor.batcher = get_inference_batcher()
+        return predictor
+
+    except Exception as e:
+        print(f"Warning: Could not load models: {e}")
+        return None
+
+
+def load_lite_predictor(models_dir):
+    """Build a LitePredictor from the TFLite flatbuffers saved in models_dir"""
+    try:
+        from .lite_predictor import LitePredictor
+
+        predictor = LitePredictor.load(models_dir, MODEL_NAMES)
+        predictor.batcher = get_inference_batcher()
+        return predictor
+
+    except Exception as e:
+        print(f"Warning: Could not load models: {e}")
+        return None
+
+
+def load_keras_predictor(models_dir):
+    """Build a TimeSeriesPredictor from the Keras models saved in models_dir"""
+    try:
+        # Imported here so the tflite backend never pulls TensorFlow in
+        import tensorflow as tf
+        from .time_series_utils import TimeSeriesPredictor
+
+        # Load normalization parameters
+        with open(os.path.join(models_dir, NORMALIZATION_FILE), 'rb') as f:
+            norm_params = pickle.load(f)
+
+        predictor = TimeSeriesPredictor()
+        predictor.train_mean = norm_params['train_mean']
+        predictor.train_std = norm_params['train_std']
+        predictor.column_indices = norm_params['column_indices']
+        # Concurrent /predict/ calls share forward passes
+        predictor.batcher = get_inference_batcher()
+
+        # Load models
+        for model_name in MODEL_NAMES:
+            model_path = os.path.join(models_dir, f'{model_name}_model.h5')
+            if os.path.exists(model_path):
+                predictor.models[model_name] = tf.keras.models.load_model(model_path)
+
+        return predictor
+
+    except Exception as e:
+        print(f"Warning: Could not load models: {e}")
+        return None
+
+
+def load_sample_data():
+    """Load sample data CSV for demo purposes"""
+    try:
+        sample_data_path = os.path.join(settings.BASE_DIR, 'data', 'sample_data.csv')
+        if os.path.exists(sample_data_path):
+            sample_data = read_dataset(sample_data_path)
+            print("Sample data loaded successfully")
+            return sample_data
+        else:
+            print(f"Sample data file not found at: {sample_data_path}")
+            return None
+    except Exception as e:
+        print(f"Warning: Could not load sample data: {e}")
+        return None
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the trained predictor and the demo sample data.
+
+    DRF builds a new view instance per request, so anything loaded in a view's
+    __init__ would be reloaded every time. The registry loads the models once,
+    checks media/models for a new training generation on every access and swaps
+    the whole predictor in a single assignment, so readers never see a mix of
+    old and new models.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (generation, predictor, retry_at) is replaced as a whole, never mutated
+        self._state = None
+        self._sample_data = None
+        self._sample_data_loaded = False
+
+    def current_generation(self, models_dir=None):
+        """Fingerprint of the training generation currently on disk"""
+        models_dir = models_dir or get_models_dir()
+
+        marker = read_generation_marker(models_dir)
+        if marker is not None:
+            return (models_dir, marker)
+
+        # Models trained before the marker existed: fall back to file stats
+        signature = [models_dir]
+        model_files = [f'{name}_model.{extension}' for name in MODEL_NAMES for extension in ('h5', 'tflite')]
+        for file_name in [NORMALIZATION_FILE] + model_files:
+            try:
+                stat = os.stat(os.path.join(models_dir, file_name))
+            except OSError:
+                continue
+            signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _cached(self, generation):
+        """The cached predictor of generation, or False when it has to be loaded"""
+        state = self._state
+        if state is None or state[0] != generation:
+            return False
+        # A failed load is only retried after MODEL_LOAD_RETRY_SECONDS, not on every request
+        if state[1] is None and time.monotonic() >= state[2]:
+            return False
+        return state[1]
+
+    def get_predictor(self):
+        """Return the predictor for the latest generation, loading it if needed"""
+        models_dir = get_models_dir()
+        generation = self.current_generation(models_dir)
+
+        predictor = self._cached(generation)
+        if predictor is not False:
+            return predictor
+
+        with self._lock:
+            # Another thread may have loaded this generation while we waited
+            predictor = self._cached(generation)
+            if predictor is not False:
+                return predictor
+
+            # (models_dir, marker), or the file stats of models saved before the marker existed
+            marker = generation[1] if len(generation) == 2 and isinstance(generation[1], str) else None
+            predictor = load_predictor(artifacts_dir(models_dir, marker))
+            retry_at = time.monotonic() + getattr(settings, 'MODEL_LOAD_RETRY_SECONDS', 30)
+            self._state = (generation, predictor, retry_at)
+            return predictor
+
+    @property
+    def generation(self):
+        """Generation of the predictor currently cached (None if nothing loaded)"""
+        state = self._state
+        return state[0] if state is not None else None
+
+    def get_sample_data(self):
+        """Return the demo sample data, parsing the CSV only once per process"""
+        if self._sample_data_loaded:
+            return self._sample_data
+
+        with self._lock:
+            if not self._sample_data_loaded:
+                self._sample_data = load_sample_data()
+                self._sample_data_loaded = True
+            return self._sample_data
+
+    def reset(self):
+        """Drop everything cached so the next access reloads from disk"""
+        with self._lock:
+            self._state = None
+            self._sample_data = None
+            self._sample_data_loaded = False
+
+
+model_registry = ModelRegistry()
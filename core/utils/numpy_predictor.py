@@ -0,0 +1,115 @@
+import json
+import os
+import pickle
+import threading
+
+import h5py
+import numpy as np
+
+from .predictor_base import BasePredictor
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+}
+
+
+class DenseStack:
+    """A Sequential model made only of Dense layers, evaluated with np.matmul"""
+
+    def __init__(self, layers):
+        # [(kernel, bias, activation_name), ...]
+        self.layers = layers
+
+    @classmethod
+    def from_h5(cls, model_path):
+        """Read the Dense weights from a Keras .h5 file, None if the model has any other layer"""
+        with h5py.File(model_path, 'r') as f:
+            model_config = json.loads(f.attrs['model_config'])
+            if model_config.get('class_name') != 'Sequential':
+                return None
+
+            weights_group = f['model_weights']
+            layers = []
+            for layer in model_config['config']['layers']:
+                layer_config = layer['config']
+                if layer['class_name'] == 'InputLayer':
+                    continue
+                if layer['class_name'] != 'Dense' or layer_config.get('activation') not in ACTIVATIONS:
+                    return None
+
+                layer_group = weights_group[layer_config['name']]
+                weights = {}
+                for weight_name in layer_group.attrs['weight_names']:
+                    weight_name = weight_name.decode() if isinstance(weight_name, bytes) else weight_name
+                    kind = 'kernel' if 'kernel' in weight_name.rsplit('/', 1)[-1] else 'bias'
+                    weights[kind] = np.asarray(layer_group[weight_name], dtype=np.float32)
+
+                bias = weights.get('bias', np.zeros(weights['kernel'].shape[-1], dtype=np.float32))
+                layers.append((weights['kernel'], bias, layer_config.get('activation')))
+
+        return cls(layers)
+
+    def __call__(self, inputs):
+        outputs = np.asarray(inputs, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            outputs = ACTIVATIONS[activation](np.matmul(outputs, kernel) + bias)
+        return outputs
+
+
+class NumpyPredictor(BasePredictor):
+    """
+    Serves the Dense-only models (linear, dense) straight from their .h5 weights
+    with NumPy. Every other model (conv, lstm) falls back to TensorFlow, which is
+    only imported the first time one of them is requested.
+    `models` maps each model name to a DenseStack or, for fallbacks, to its .h5 path.
+    """
+
+    def __init__(self, max_horizon=24):
+        super().__init__(max_horizon=max_horizon)
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, models_dir, model_names):
+        """Build a NumpyPredictor from normalization_params.pkl and the {name}_model.h5 files"""
+        with open(os.path.join(models_dir, 'normalization_params.pkl'), 'rb') as f:
+            norm_params = pickle.load(f)
+
+        predictor = cls()
+        predictor.train_mean = norm_params['train_mean']
+        predictor.train_std = norm_params['train_std']
+        predictor.column_indices = norm_params['column_indices']
+
+        for model_name in model_names:
+            model_path = os.path.join(models_dir, f'{model_name}_model.h5')
+            if os.path.exists(model_path):
+                predictor.models[model_name] = DenseStack.from_h5(model_path) or model_path
+
+        return predictor
+
+    def _get_fallback(self):
+        """TimeSeriesPredictor holding the Keras models NumPy can't run, created on first use"""
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    import tensorflow as tf
+                    from .time_series_utils import TimeSeriesPredictor
+
+                    fallback = TimeSeriesPredictor(max_horizon=self.max_horizon)
+                    for model_name, model_path in self.models.items():
+                        if not isinstance(model_path, DenseStack):
+                            fallback.models[model_name] = tf.keras.models.load_model(model_path)
+                    self._fallback = fallback
+        return self._fallback
+
+    def is_batchable(self, model_name: str) -> bool:
+        """A DenseStack runs in microseconds, waiting for a batch window would only add latency"""
+        return not isinstance(self.models[model_name], DenseStack)
+
+    def get_forward_fn(self, model_name: str, input_hours: int, n_features: int):
+        """DenseStack models don't depend on the input shape, the rest use the traced TensorFlow path"""
+        model = self.models[model_name]
+        if isinstance(model, DenseStack):
+            return model
+        return self._get_fallback().get_forward_fn(model_name, input_hours, n_features)
@@ -0,0 +1,80 @@
+import abc
+
+import numpy as np
+
+
+class BasePredictor(abc.ABC):
+    """
+    Prediction logic shared by every inference backend. It doesn't import
+    TensorFlow, subclasses only have to provide get_forward_fn().
+    """
+
+    LABEL_COLUMNS = ['scheduled_demand_372', 'daily_spot_market_600_España', 'daily_spot_market_600_Portugal']
+
+    def __init__(self, max_horizon=24):
+        self.models = {}
+        self.train_mean = None
+        self.train_std = None
+        self.column_indices = None
+        self.max_horizon = max_horizon
+        # Optional MicroBatcher that coalesces concurrent predict() calls
+        self.batcher = None
+
+    @abc.abstractmethod
+    def get_forward_fn(self, model_name: str, input_hours: int, n_features: int):
+        """Return a callable running the model on a (batch, input_hours, n_features) float32 array"""
+
+    def is_batchable(self, model_name: str) -> bool:
+        """Whether concurrent calls to this model are worth coalescing in the batcher"""
+        return True
+
+    def predict(self, model_name: str, recent_data: np.ndarray, hours_ahead: int = 1) -> dict:
+        """Make predictions for any number of hours ahead (up to max_horizon) with any model"""
+
+        if not self.models:
+            raise ValueError("Modelos no entrenados. Llama train_models() primero.")
+
+        if model_name not in self.models:
+            available_models = ', '.join(self.models.keys())
+            raise ValueError(f"Modelo '{model_name}' no encontrado. Modelos disponibles: {available_models}")
+
+        if hours_ahead > self.max_horizon:
+            raise ValueError(f"Se solicitaron {hours_ahead} horas, pero el modelo fue entrenado para máximo {self.max_horizon} horas")
+
+        if hours_ahead < 1:
+            raise ValueError("El número de horas debe ser mayor a 0")
+
+        try:
+
+            normalized_data = (recent_data - self.train_mean.values) / self.train_std.values
+            input_data = normalized_data.reshape(1, -1, len(self.column_indices)).astype(np.float32)
+            forward = self.get_forward_fn(model_name, input_data.shape[1], input_data.shape[2])
+
+            if self.batcher is not None and self.is_batchable(model_name):
+                prediction = self.batcher.predict(model_name, forward, input_data)
+            else:
+                prediction = forward(input_data)
+
+            if len(prediction.shape) == 3:
+                pred_values = prediction[0, :, :]
+            else:
+                pred_values = prediction[0, :].reshape(self.max_horizon, -1)
+
+            denormalized_predictions = {}
+
+            for i, feature_name in enumerate(self.LABEL_COLUMNS):
+                col_idx = self.column_indices[feature_name]
+                denorm_pred = (pred_values[:, i] * self.train_std.iloc[col_idx] +
+                              self.train_mean.iloc[col_idx])
+                denormalized_predictions[feature_name] = denorm_pred[:hours_ahead].tolist()
+
+
+            return {
+                'predictions': denormalized_predictions,
+                'model_used': model_name,
+                'hours_ahead': hours_ahead,
+                'max_available': self.max_horizon
+            }
+
+        except Exception as e:
+            raise ValueError(f"Error al hacer la predicción con el modelo {model_name}: {str(e)}")
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.apps import apps
+
+from ..models import ROLLUP_STATS
+from .historical_columnar import ColumnarSeries
+
+RESOLUTIONS = ('day', 'week', 'month')
+# Grid step of each resolution, months have no fixed one
+RESOLUTION_STEPS = {'day': timedelta(days=1), 'week': timedelta(days=7), 'month': None}
+
+
+def _models(hourly_model=None, aggregate_model=None):
+    # Migrations pass their historical models
+    return (hourly_model or apps.get_model('core', 'TimeSeriesData'),
+            aggregate_model or apps.get_model('core', 'TimeSeriesAggregate'))
+
+
+def _features(hourly_model):
+    return [field.name for field in hourly_model._meta.concrete_fields if field.name not in ('id', 'datetime_utc')]
+
+
+def period_starts(datetimes, resolution):
+    """Start (UTC midnight) of the day, ISO week or month of every datetime in a UTC DatetimeIndex"""
+    days = datetimes.floor('D')
+    if resolution == 'week':
+        return days - pd.to_timedelta(days.weekday, unit='D')
+    if resolution == 'month':
+        return days - pd.to_timedelta(days.day - 1, unit='D')
+    return days
+
+
+def next_period(start, resolution):
+    if resolution == 'week':
+        return start + pd.Timedelta(days=7)
+    if resolution == 'month':
+        return start + pd.DateOffset(months=1)
+    return start + pd.Timedelta(days=1)
+
+
+def aggregate_hours(frame, resolution, features):
+    """One row per period of frame (datetime_utc plus features): hours and ROLLUP_STATS of every feature"""
+    grouped = frame[features].groupby(period_starts(pd.DatetimeIndex(frame['datetime_utc']), resolution))
+    stats = {
+        'min': grouped.min(),
+        'max': grouped.max(),
+        'mean': grouped.mean(),
+        # A period without values has no sum, not 0
+        'sum': grouped.sum(min_count=1),
+    }
+    result = pd.DataFrame({'hours': grouped.size()})
+    for name in features:
+        for stat in ROLLUP_STATS:
+            result[f'{name}_{stat}'] = stats[stat][name]
+    return result
+
+
+def update_rollups(range_start, range_end, hourly_model=None, aggregate_model=None):
+    """
+    Recompute the aggregates of every period that holds an hour between range_start
+    and range_end from its hourly rows. Call it in the transaction of the load, like
+    bump_data_generation. Returns the number of aggregates written.
+    """
+    hourly_model, aggregate_model = _models(hourly_model, aggregate_model)
+    features = _features(hourly_model)
+
+    bounds = pd.DatetimeIndex([range_start, range_end])
+    bounds = bounds.tz_convert('UTC') if bounds.tz is not None else bounds.tz_localize('UTC')
+    spans = {}
+    for resolution in RESOLUTIONS:
+        first, last = period_starts(bounds, resolution)
+        spans[resolution] = (first, next_period(last, resolution))
+
+    # One read covers the widest span, weeks cross month boundaries
+    read_start = min(start for start, _ in spans.values())
+    read_end = max(end for _, end in spans.values())
+    rows = list(
+        hourly_model.objects.filter(datetime_utc__gte=read_start, datetime_utc__lt=read_end)
+        .order_by('datetime_utc').values_list('datetime_utc', *features)
+    )
+    frame = pd.DataFrame(rows, columns=['datetime_utc'] + features)
+    frame['datetime_utc'] = pd.to_datetime(frame['datetime_utc'], utc=True)
+    frame[features] = frame[features].astype(np.float64)
+
+    written = 0
+    for resolution, (start, end) in spans.items():
+        in_span = frame[(frame['datetime_utc'] >= start) & (frame['datetime_utc'] < end)]
+        aggregates = aggregate_hours(in_span, resolution, features)
+        values = aggregates.astype(object).where(aggregates.notna(), None)
+
+        aggregate_model.objects.filter(
+            resolution=resolution, period_start__gte=start, period_start__lt=end
+        ).delete()
+        aggregate_model.objects.bulk_create([
+            aggregate_model(resolution=resolution, period_start=period.to_pydatetime(), **row)
+            for period, row in zip(values.index, values.to_dict('records'))
+        ], batch_size=500)
+        written += len(values)
+    return written
+
+
+def rebuild_rollups(hourly_model=None, aggregate_model=None):
+    """Recompute every aggregate from the whole table. Returns the number written"""
+    hourly_model, aggregate_model = _models(hourly_model, aggregate_model)
+    aggregate_model.objects.all().delete()
+    first = hourly_model.objects.order_by('datetime_utc').first()
+    if first is None:
+        return 0
+    last = hourly_model.objects.order_by('-datetime_utc').first()
+    return update_rollups(first.datetime_utc, last.datetime_utc, hourly_model, aggregate_model)
+
+
+def rollup_series(start_time, end_time, columns, resolution, stat='mean'):
+    """ColumnarSeries with the `stat` of every column for each period of start_time..end_time"""
+    _, aggregate_model = _models()
+    first = period_starts(pd.DatetimeIndex([start_time]).tz_convert('UTC'), resolution)[0]
+    rows = list(
+        aggregate_model.objects.filter(
+            resolution=resolution, period_start__gte=first, period_start__lte=end_time
+        ).order_by('period_start').values_list('period_start', *[f'{name}_{stat}' for name in columns])
+    )
+    return ColumnarSeries.from_rows(columns, rows, RESOLUTION_STEPS[resolution])
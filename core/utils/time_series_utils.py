@@ -1,8 +1,16 @@
 import pandas as pd
 import numpy as np
 import tensorflow as tf
+import tempfile
+import os
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from typing import Optional
 
+from .predictor_base import BasePredictor
+from .columnar_dataset import read_dataset
+
 class WindowGenerator():
     def __init__(self, input_width, label_width, shift,
                  train_df, val_df, test_df,
@@ -94,19 +102,20 @@ class WindowGenerator():
             f'Label column name(s): {self.label_columns}'])
 
 
-class TimeSeriesPredictor:
+class TimeSeriesPredictor(BasePredictor):
     def __init__(self, max_horizon=24):
-        self.models = {}
+        super().__init__(max_horizon=max_horizon)
         self.window = None
-        self.train_mean = None
-        self.train_std = None
-        self.column_indices = None
-        self.max_horizon = max_horizon
+        # Run inference through a tf.function traced once per input shape instead of model.predict
+        self.fast_inference = True
+        self._forward_fns = {}
         
-    def load_data_from_csv(self, csv_path: str) -> pd.DataFrame:
-        """Load and preprocess data from CSV"""
-        df = pd.read_csv(csv_path)
-        date_time = pd.to_datetime(df.pop('datetime_utc'))
+    def load_data_from_csv(self, csv_path: str, since=None) -> pd.DataFrame:
+        """Load and preprocess data from CSV, or from its binary copy when MergeDataView wrote one"""
+        df = read_dataset(csv_path)
+        if since is not None:
+            df = df[df['datetime_utc'] >= since].reset_index(drop=True)
+        date_time = df.pop('datetime_utc')
         
         # Fill missing values
         df = df.ffill()
@@ -184,7 +193,7 @@ class TimeSeriesPredictor:
         
         return models
         
-    def compile_and_fit(self, model, window, patience=2, max_epochs=20):
+    def compile_and_fit(self, model, window, patience=2, max_epochs=20, callbacks=None):
         """Training function"""
         early_stopping = tf.keras.callbacks.EarlyStopping(
             monitor='val_loss', patience=patience, mode='min')
@@ -199,15 +208,33 @@ class TimeSeriesPredictor:
             window.train, 
             epochs=max_epochs,
             validation_data=window.val,
-            callbacks=[early_stopping],
+            callbacks=[early_stopping] + list(callbacks or []),
             verbose=0  # Silent training for web app
         )
         return history
     
-    def train_models(self, train_df, val_df, test_df):
-        """Train all four models with maximum horizon"""
+    def fit_model(self, name, model, max_epochs=20, progress_callback=None):
+        """Fit one model on self.window and return its test performance"""
+        callbacks = []
+        if progress_callback is not None:
+            progress_callback(name, 'started', max_epochs=max_epochs)
+            callbacks.append(tf.keras.callbacks.LambdaCallback(
+                on_epoch_end=lambda epoch, logs: progress_callback(
+                    name, 'epoch', epoch=epoch + 1, logs=dict(logs or {}))
+            ))
+
+        self.compile_and_fit(model, self.window, max_epochs=max_epochs, callbacks=callbacks)
+        return model.evaluate(self.window.test, verbose=0, return_dict=True)
+
+    def train_models(self, train_df, val_df, test_df, progress_callback=None, workers=1, threads_per_worker=None):
+        """
+        Train all four models with maximum horizon.
+        progress_callback(model_name, event, **info) is called with the events
+        'started', 'epoch' (after every epoch), 'finished' and 'failed'.
+        With workers > 1 the models are trained concurrently in a process pool.
+        """
         
-        label_columns=['scheduled_demand_372', 'daily_spot_market_600_España', 'daily_spot_market_600_Portugal']
+        label_columns = self.LABEL_COLUMNS
 
         self.window = WindowGenerator(
             input_width=24, 
@@ -217,67 +244,174 @@ class TimeSeriesPredictor:
             label_columns=label_columns
         )
         
+        if workers > 1:
+            return self._train_models_parallel(
+                train_df, val_df, test_df, progress_callback, workers, threads_per_worker
+            )
+
         # Create all models
         models = self.create_models(num_features=len(label_columns))
         performance = {}
         
         for name, model in models.items():
             try:
-                history = self.compile_and_fit(model, self.window)
-                perf = model.evaluate(self.window.test, verbose=0, return_dict=True)
-                performance[name] = perf
-                self.models[name] = model
-                print(f"✓ Modelo {name} entrenado exitosamente - Loss: {perf['loss']:.4f}, MAE: {perf['mean_absolute_error']:.4f}")
+                perf = self.fit_model(name, model, progress_callback=progress_callback)
+                self._model_trained(name, model, perf, performance, progress_callback)
             except Exception as e:
-                print(f"✗ Error al entrenar el modelo {name}: {str(e)}")
+                self._model_failed(name, e, progress_callback)
                 
         return performance
 
-    def predict(self, model_name: str, recent_data: np.ndarray, hours_ahead: int = 1) -> dict:
-        """Make predictions for any number of hours ahead (up to max_horizon) with any model"""
+    def _model_trained(self, name, model, perf, performance, progress_callback):
+        performance[name] = perf
+        self.models[name] = model
+        print(f"✓ Modelo {name} entrenado exitosamente - Loss: {perf['loss']:.4f}, MAE: {perf['mean_absolute_error']:.4f}")
+        if progress_callback is not None:
+            progress_callback(name, 'finished', performance=perf)
+
+    def _model_failed(self, name, error, progress_callback):
+        print(f"✗ Error al entrenar el modelo {name}: {str(error)}")
+        if progress_callback is not None:
+            progress_callback(name, 'failed', error=str(error))
+
+    def _train_models_parallel(self, train_df, val_df, test_df, progress_callback, workers, threads_per_worker):
+        """
+        Train each model family in its own process. Every worker sets its own TensorFlow
+        intra/inter-op thread budget, trains on a copy of the data, saves the model to a
+        temporary .h5 and the parent loads it back, so the wall-clock time is roughly
+        that of the slowest model.
+        """
+        model_names = list(self.create_models(num_features=len(self.LABEL_COLUMNS)).keys())
+        workers = min(workers, len(model_names))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+        # TensorFlow's runtime isn't fork-safe, workers start from a clean interpreter
+        context = multiprocessing.get_context('spawn')
+        performance = {}
+
+        with tempfile.TemporaryDirectory() as out_dir, context.Manager() as manager:
+            # Workers can't call progress_callback directly, they send their events through a queue
+            events = manager.Queue() if progress_callback is not None else None
+
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_training_worker,
+                                     initargs=(threads_per_worker,)) as pool:
+                futures = {
+                    pool.submit(_train_model_in_worker, name, self.max_horizon, train_df, val_df, test_df,
+                                os.path.join(out_dir, f'{name}_model.h5'), events): name
+                    for name in model_names
+                }
+
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    _drain_events(events, progress_callback)
+
+                _drain_events(events, progress_callback)
+                results = {}
+                for future, name in futures.items():
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        self._model_failed(name, e, progress_callback)
+
+            # Keep the usual linear, dense, conv, lstm order
+            for name in model_names:
+                if name in results:
+                    perf, model_path = results[name]
+                    model = tf.keras.models.load_model(model_path)
+                    self._model_trained(name, model, perf, performance, progress_callback)
+
+        return performance
+
+    def get_forward_fn(self, model_name: str, input_hours: int, n_features: int):
+        """Return the cached inference callable for a model and input shape, tracing it on first use"""
+        model = self.models[model_name]
+        key = (model_name, id(model), self.fast_inference, input_hours, n_features)
+        forward = self._forward_fns.get(key)
         
-        if not self.models:
-            raise ValueError("Modelos no entrenados. Llama train_models() primero.")
-            
-        if model_name not in self.models:
-            available_models = ', '.join(self.models.keys())
-            raise ValueError(f"Modelo '{model_name}' no encontrado. Modelos disponibles: {available_models}")
+        if forward is None:
+            if self.fast_inference:
+                # The batch dimension is left open so micro-batches reuse the same trace
+                traced = tf.function(
+                    lambda x: model(x, training=False),
+                    input_signature=[tf.TensorSpec(shape=(None, input_hours, n_features), dtype=tf.float32)],
+                )
+                
+                def forward(inputs):
+                    return traced(tf.convert_to_tensor(inputs, dtype=tf.float32)).numpy()
+            else:
+                def forward(inputs):
+                    return model.predict(inputs, verbose=0)
             
-        if hours_ahead > self.max_horizon:
-            raise ValueError(f"Se solicitaron {hours_ahead} horas, pero el modelo fue entrenado para máximo {self.max_horizon} horas")
+            self._forward_fns[key] = forward
         
-        if hours_ahead < 1:
-            raise ValueError("El número de horas debe ser mayor a 0")
+        return forward
+
+    def export_tflite(self, models_dir: str) -> list:
+        """Export every trained model to a TFLite flatbuffer ({name}_model.tflite) for the TensorFlow-free backend"""
+        n_features = len(self.column_indices)
+        exported = []
         
-        model = self.models[model_name]
+        for name, model in self.models.items():
+            try:
+                with tempfile.TemporaryDirectory() as saved_model_dir:
+                    # Batch is fixed to 1 because the LSTM can't be lowered with a dynamic batch,
+                    # the time dimension stays open so every input_hours works
+                    model.export(
+                        saved_model_dir,
+                        format='tf_saved_model',
+                        input_signature=[tf.TensorSpec(shape=(1, None, n_features), dtype=tf.float32)],
+                        verbose=False,
+                    )
+                    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+                    tflite_model = converter.convert()
+                
+                with open(os.path.join(models_dir, f'{name}_model.tflite'), 'wb') as f:
+                    f.write(tflite_model)
+                exported.append(name)
+            except Exception as e:
+                print(f"✗ Error al exportar el modelo {name} a TFLite: {str(e)}")
         
-        try:
+        return exported
 
-            normalized_data = (recent_data - self.train_mean.values) / self.train_std.values
-            input_data = normalized_data.reshape(1, -1, len(self.column_indices))
-            prediction = model.predict(input_data, verbose=0)
-            
-            if len(prediction.shape) == 3:  
-                pred_values = prediction[0, :, :]
-            else:  
-                pred_values = prediction[0, :].reshape(self.max_horizon, -1)
-                
-            feature_names = ['scheduled_demand_372', 'daily_spot_market_600_España', 'daily_spot_market_600_Portugal']
-            denormalized_predictions = {}
-
-            for i, feature_name in enumerate(feature_names):
-                col_idx = self.column_indices[feature_name]
-                denorm_pred = (pred_values[:, i] * self.train_std.iloc[col_idx] + 
-                              self.train_mean.iloc[col_idx])
-                denormalized_predictions[feature_name] = denorm_pred[:hours_ahead].tolist()
-    
-            
-            return {
-                'predictions': denormalized_predictions, 
-                'model_used': model_name,
-                'hours_ahead': hours_ahead,
-                'max_available': self.max_horizon
-            }
-            
-        except Exception as e:
-            raise ValueError(f"Error al hacer la predicción con el modelo {model_name}: {str(e)}")
+
+def _init_training_worker(threads):
+    """Give each training process its own TensorFlow thread budget, before any op runs"""
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+
+
+def _train_model_in_worker(name, max_horizon, train_df, val_df, test_df, model_path, events):
+    """Train a single model family in a pool worker, returns (performance, saved model path)"""
+    predictor = TimeSeriesPredictor(max_horizon=max_horizon)
+    predictor.window = WindowGenerator(
+        input_width=24,
+        label_width=max_horizon,
+        shift=1,
+        train_df=train_df, val_df=val_df, test_df=test_df,
+        label_columns=predictor.LABEL_COLUMNS
+    )
+    model = predictor.create_models(num_features=len(predictor.LABEL_COLUMNS))[name]
+
+    progress_callback = None
+    if events is not None:
+        # 'finished' is reported by the parent once the model is loaded back
+        def progress_callback(model_name, event, **info):
+            events.put((model_name, event, info))
+
+    perf = predictor.fit_model(name, model, progress_callback=progress_callback)
+    model.save(model_path)
+    return {key: float(value) for key, value in perf.items()}, model_path
+
+
+def _drain_events(events, progress_callback):
+    if events is None:
+        return
+    while True:
+        try:
+            model_name, event, info = events.get_nowait()
+        except queue.Empty:
+            return
+        progress_callback(model_name, event, **info)
@@ -0,0 +1,237 @@
+import math
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+
+from ..models import TimeSeriesData
+from .data_generation import get_data_generation
+
+HOUR = timedelta(hours=1)
+# Every float column of TimeSeriesData, in model order (the order PredictView feeds the models).
+# Read from the app registry, which always holds the real model class
+FEATURE_COLUMNS = [
+    field.name for field in apps.get_model('core', 'TimeSeriesData')._meta.concrete_fields
+    if field.name not in ('id', 'datetime_utc')
+]
+
+
+class TimeSeriesWindow:
+    """Rows of a range read: hour offsets from the store epoch and their values"""
+
+    def __init__(self, epoch, hours, values, columns):
+        self.epoch = epoch
+        self.hours = hours
+        self.values = values
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.hours)
+
+    @property
+    def timestamps(self):
+        return [self.epoch + timedelta(hours=int(hour)) for hour in self.hours]
+
+    @property
+    def last_timestamp(self):
+        return self.epoch + timedelta(hours=int(self.hours[-1])) if len(self.hours) else None
+
+
+class TimeSeriesSnapshot:
+    """
+    Immutable copy of TimeSeriesData: one float64 row per hour from `epoch`, NaN for
+    missing values and `present` marking the hours that have a row.
+    """
+
+    def __init__(self, epoch, values, present, generation):
+        self.epoch = epoch
+        self.values = values
+        self.present = present
+        self.generation = generation
+        self.column_index = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    @classmethod
+    def empty(cls, generation=None):
+        return cls(None, np.empty((0, len(FEATURE_COLUMNS))), np.zeros(0, dtype=bool), generation)
+
+    def get_range(self, start_time, end_time, columns=None):
+        """Rows with start_time <= datetime_utc <= end_time, like datetime_utc__range"""
+        if columns is None:
+            columns = FEATURE_COLUMNS
+        column_indices = [self.column_index[name] for name in columns]
+
+        if self.epoch is None:
+            return TimeSeriesWindow(self.epoch, np.empty(0, dtype=np.int64), np.empty((0, len(columns))), columns)
+
+        first = max(math.ceil((start_time - self.epoch) / HOUR), 0)
+        last = min(math.floor((end_time - self.epoch) / HOUR) + 1, len(self.present))
+        if first >= last:
+            return TimeSeriesWindow(self.epoch, np.empty(0, dtype=np.int64), np.empty((0, len(columns))), columns)
+
+        present = self.present[first:last]
+        if present.all():
+            # The common case: a contiguous slice, no copy of the full matrix
+            hours = np.arange(first, last)
+            values = self.values[first:last]
+        else:
+            hours = np.flatnonzero(present) + first
+            values = self.values[hours]
+
+        if columns != FEATURE_COLUMNS:
+            values = values[:, column_indices]
+        return TimeSeriesWindow(self.epoch, hours, values, columns)
+
+
+def _rows_to_arrays(rows):
+    """values_list rows (datetime_utc, *features) to (datetimes, float matrix with NaN for NULL)"""
+    datetimes = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(FEATURE_COLUMNS))
+    return datetimes, values
+
+
+def _hour_offsets(datetimes, epoch, step=HOUR):
+    """Hour (or step) offsets from epoch, None if any timestamp is not on the grid"""
+    offsets = []
+    for value in datetimes:
+        delta = value - epoch
+        steps, remainder = divmod(delta, step)
+        if remainder:
+            return None
+        offsets.append(steps)
+    return np.array(offsets, dtype=np.int64)
+
+
+class TimeSeriesStore:
+    """
+    Process-wide columnar cache of TimeSeriesData for range reads.
+
+    The whole table is kept as a matrix indexed by hour offset, so a 24-168 hour
+    window is a slice instead of an ORM query and a DataFrame. Every
+    TIME_SERIES_CACHE_CHECK_SECONDS the DataGeneration row is checked: when the
+    loader bumped it once, only the hours it touched are re-read, otherwise the
+    table is loaded again. Snapshots are replaced as a whole, never mutated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+        # Tables that aren't on an hourly grid can't be cached, readers fall back to the ORM
+        self._unsupported = False
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'TIME_SERIES_CACHE', True)
+
+    def get_range(self, start_time, end_time, columns=None, generation=None):
+        """
+        TimeSeriesWindow for the range, None if the cache is disabled or can't serve it.
+        With a generation the window is at least that recent, for answers tagged with it.
+        """
+        if not self.enabled:
+            return None
+
+        snapshot = self.get_snapshot(generation)
+        if snapshot is None:
+            return None
+        return snapshot.get_range(start_time, end_time, columns)
+
+    def get_snapshot(self, generation=None):
+        """Current snapshot, refreshed if the data generation moved or isn't `generation` yet"""
+        snapshot = self._snapshot
+        interval = getattr(settings, 'TIME_SERIES_CACHE_CHECK_SECONDS', 1.0)
+        if (snapshot is not None and time.monotonic() - self._checked_at < interval
+                and (generation is None or snapshot.generation == generation)):
+            return None if self._unsupported else snapshot
+
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Warning: Could not load the time series cache: {e}")
+                return None
+            self._checked_at = time.monotonic()
+            return None if self._unsupported else self._snapshot
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = 0.0
+            self._unsupported = False
+
+    def _refresh(self):
+        current = get_data_generation()
+        generation = current.generation if current is not None else None
+        snapshot = self._snapshot
+
+        if snapshot is not None and snapshot.generation == generation:
+            return
+
+        if (snapshot is not None and snapshot.epoch is not None and not self._unsupported
+                and generation is not None and snapshot.generation is not None
+                and generation == snapshot.generation + 1
+                and current.range_start is not None and current.range_end is not None):
+            self._snapshot = self._patch(snapshot, generation, current.range_start, current.range_end)
+        else:
+            self._snapshot = self._load(generation)
+
+    def _load(self, generation):
+        """Read the whole table into a new snapshot"""
+        rows = list(TimeSeriesData.objects.order_by('datetime_utc').values_list('datetime_utc', *FEATURE_COLUMNS))
+        self._unsupported = False
+        if not rows:
+            return TimeSeriesSnapshot.empty(generation)
+
+        datetimes, row_values = _rows_to_arrays(rows)
+        epoch = datetimes[0].astimezone(dt_timezone.utc)
+        offsets = _hour_offsets(datetimes, epoch)
+        if offsets is None:
+            self._unsupported = True
+            return TimeSeriesSnapshot.empty(generation)
+
+        n_hours = int(offsets[-1]) + 1
+        values = np.full((n_hours, len(FEATURE_COLUMNS)), np.nan)
+        present = np.zeros(n_hours, dtype=bool)
+        values[offsets] = row_values
+        present[offsets] = True
+        return TimeSeriesSnapshot(epoch, values, present, generation)
+
+    def _patch(self, snapshot, generation, range_start, range_end):
+        """Copy the snapshot and re-read only the hours between range_start and range_end"""
+        rows = list(
+            TimeSeriesData.objects.filter(datetime_utc__range=[range_start, range_end])
+            .order_by('datetime_utc').values_list('datetime_utc', *FEATURE_COLUMNS)
+        )
+        epoch = snapshot.epoch
+        start = min(range_start, rows[0][0]) if rows else range_start
+        if start < epoch:
+            # New hours before the cached ones, cheaper to reload than to shift
+            return self._load(generation)
+
+        datetimes, row_values = _rows_to_arrays(rows)
+        offsets = _hour_offsets(datetimes, epoch)
+        if offsets is None:
+            return self._load(generation)
+
+        n_hours = max(len(snapshot.present), int(offsets[-1]) + 1 if len(offsets) else 0)
+        values = np.full((n_hours, len(FEATURE_COLUMNS)), np.nan)
+        present = np.zeros(n_hours, dtype=bool)
+        values[:len(snapshot.present)] = snapshot.values
+        present[:len(snapshot.present)] = snapshot.present
+
+        # Rows of the touched range that are gone must disappear from the cache too
+        first = max(math.ceil((range_start - epoch) / HOUR), 0)
+        last = min(math.floor((range_end - epoch) / HOUR) + 1, n_hours)
+        if first < last:
+            values[first:last] = np.nan
+            present[first:last] = False
+
+        values[offsets] = row_values
+        present[offsets] = True
+        return TimeSeriesSnapshot(epoch, values, present, generation)
+
+
+timeseries_store = TimeSeriesStore()
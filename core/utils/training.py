@@ -0,0 +1,238 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from ..models import TimeSeriesData
+from .model_registry import generation_dir, write_generation_marker
+from .data_generation import bump_data_generation
+from .rollups import update_rollups
+from .columnar_dataset import read_dataset
+
+
+def since_timestamp(since):
+    """UTC Timestamp of a date or datetime, naive ones are taken as UTC"""
+    since = pd.Timestamp(since)
+    return since.tz_localize('UTC') if since.tzinfo is None else since.tz_convert('UTC')
+
+
+class NoTrainingDataError(Exception):
+    """Neither a CSV nor rows in the database to train on"""
+
+
+def utc_hours(datetimes):
+    """UTC DatetimeIndex of the datetime_utc column, naive ones in the default time zone as Django stores them"""
+    hours = pd.DatetimeIndex(datetimes)
+    if hours.tz is None:
+        hours = hours.tz_localize(timezone.get_default_timezone())
+    return hours.tz_convert('UTC')
+
+
+def changed_rows(df, features):
+    """
+    Mask of the rows of df that are not in TimeSeriesData yet or whose values differ
+    from the stored ones. NULL and NaN count as the same value.
+    """
+    if df.empty:
+        return np.zeros(0, dtype=bool)
+    stored_rows = list(
+        TimeSeriesData.objects.filter(datetime_utc__range=[df['datetime_utc'].min(), df['datetime_utc'].max()])
+        .values_list('datetime_utc', *features)
+    )
+    if not stored_rows:
+        return np.ones(len(df), dtype=bool)
+
+    stored = pd.DataFrame(stored_rows, columns=['datetime_utc'] + features)
+    stored.index = utc_hours(stored.pop('datetime_utc'))
+    hours = utc_hours(df['datetime_utc'])
+    exists = hours.isin(stored.index)
+    old = stored.reindex(hours).to_numpy(dtype=np.float64)
+    new = df[features].to_numpy(dtype=np.float64)
+    same = (old == new) | (np.isnan(old) & np.isnan(new))
+    return ~exists | ~same.all(axis=1)
+
+
+def upsert_time_series_rows(field_names, columns, batch_size=1000):
+    """
+    Upsert column arrays into TimeSeriesData with cursor.executemany, one call per batch.
+    Hours already in the table are updated in place (the ON CONFLICT clause
+    bulk_create(update_conflicts=True) would emit), new hours are inserted. Skips
+    building a model instance and running the ORM field preparation for every value,
+    which is where bulk_create spends most of its time.
+    """
+    ops = connection.ops
+    table = ops.quote_name(TimeSeriesData._meta.db_table)
+    on_conflict = ops.on_conflict_suffix_sql(
+        [TimeSeriesData._meta.get_field(name) for name in field_names],
+        OnConflict.UPDATE,
+        update_fields=[name for name in field_names if name != 'datetime_utc'],
+        unique_fields=['datetime_utc'],
+    )
+    sql = (
+        f"INSERT INTO {table} ({', '.join(ops.quote_name(name) for name in field_names)}) "
+        f"VALUES ({', '.join(['%s'] * len(field_names))}) {on_conflict}"
+    )
+
+    rows = list(zip(*columns))
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[offset:offset + batch_size])
+
+    return len(rows)
+
+
+def populate_database_from_csv(csv_path, batch_size=None, since=None):
+    """
+    Load CSV data into database after training. Loading the same hours again updates the
+    ones whose values changed and leaves the rest alone.
+    With since (a datetime) only the hours from then on are loaded, still forward filled
+    from the ones before.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'TIME_SERIES_LOAD_BATCH_SIZE', 1000)
+
+    try:
+        start = time.perf_counter()
+        df = read_dataset(csv_path)
+        df = df.ffill()
+        if since is not None:
+            df = df[df['datetime_utc'] >= since_timestamp(since)]
+        total_rows = len(df)
+
+        # One array per column instead of a Series per row. NaN becomes None so it's stored as NULL
+        field_names = list(df.columns)
+        columns = []
+        for name in field_names:
+            if name == 'datetime_utc':
+                datetime_field = TimeSeriesData._meta.get_field('datetime_utc')
+                values = np.array([datetime_field.get_db_prep_save(value, connection) for value in df[name]], dtype=object)
+            else:
+                values = df[name].to_numpy(dtype=object)
+                values[pd.isna(values)] = None
+            columns.append(values)
+
+        # A failing batch rolls back the whole load
+        with transaction.atomic():
+            # Hours already stored with the same values are left alone, so a reload of
+            # the same CSV writes nothing and keeps caches, ETags and rollups
+            changed = changed_rows(df, [name for name in field_names if name != 'datetime_utc'])
+            rows_loaded = upsert_time_series_rows(field_names, [values[changed] for values in columns], batch_size)
+            if rows_loaded:
+                range_start, range_end = df['datetime_utc'][changed].min(), df['datetime_utc'][changed].max()
+                # Tells the time series caches of every process which hours changed
+                bump_data_generation(range_start=range_start, range_end=range_end)
+                update_rollups(range_start, range_end)
+
+        elapsed = time.perf_counter() - start
+        print(f"✓ {rows_loaded} registros nuevos o cambiados de {total_rows} en {elapsed:.2f}s "
+              f"({total_rows / max(elapsed, 1e-9):.0f} filas/s)")
+        return TimeSeriesData.objects.count()
+
+    except Exception as e:
+        raise Exception(f"Failed to populate database: {str(e)}")
+
+
+def run_training(populate_database=False, progress_callback=None, report_stage=None, workers=None, since=None):
+    """
+    Load the data, train the four models and publish them in MEDIA_ROOT/models.
+    Returns the summary /train/ answers with. progress_callback is handed to
+    TimeSeriesPredictor.train_models() and report_stage(stage) is called between steps.
+    workers overrides TRAINING_WORKERS and since (a datetime) trains on the hours
+    from then on only.
+    """
+    # Imported here so prediction workers on the tflite backend don't load TensorFlow
+    from .time_series_utils import TimeSeriesPredictor
+
+    def stage(name):
+        if report_stage is not None:
+            report_stage(name)
+
+    predictor = TimeSeriesPredictor()
+
+    db_is_empty = not TimeSeriesData.objects.exists()
+    should_populate_db = db_is_empty or populate_database
+
+    stage('loading_data')
+    # Option 1: Load from CSV. This should be the default approach here.
+    if hasattr(settings, 'TIME_SERIES_CSV_PATH'):
+        train_df, val_df, test_df, date_time = predictor.load_data_from_csv(
+            settings.TIME_SERIES_CSV_PATH, since=since_timestamp(since) if since is not None else None
+        )
+
+        # POPULATE DATABASE FROM CSV only if conditions are met
+        if should_populate_db:
+            stage('populating_database')
+            records_created = populate_database_from_csv(settings.TIME_SERIES_CSV_PATH)
+        else:
+            # Count existing records for response
+            records_created = TimeSeriesData.objects.count()
+
+    else:
+        # Option 2: Load from database
+        queryset = TimeSeriesData.objects.all().order_by('datetime_utc')
+        if since is not None:
+            queryset = queryset.filter(datetime_utc__gte=since_timestamp(since))
+        if not queryset.exists():
+            raise NoTrainingDataError('No se han encontrado los datos.')
+
+        train_df, val_df, test_df, date_time = predictor.load_data_from_queryset(queryset)
+        records_created = queryset.count()
+
+    # Train all models
+    stage('training')
+    performance = predictor.train_models(
+        train_df, val_df, test_df,
+        progress_callback=progress_callback,
+        workers=workers or getattr(settings, 'TRAINING_WORKERS', 1),
+        threads_per_worker=getattr(settings, 'TRAINING_THREADS_PER_WORKER', None),
+    )
+
+    # Save models to disk, in a directory of their own so workers loading the
+    # published generation never read a mix of old and new files
+    stage('saving_models')
+    models_dir = os.path.join(settings.MEDIA_ROOT, 'models')
+    generation = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    output_dir = generation_dir(models_dir, generation)
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, model in predictor.models.items():
+        model.save(os.path.join(output_dir, f'{name}_model.h5'))
+
+    # Save normalization parameters
+    norm_params = {
+        'train_mean': predictor.train_mean,
+        'train_std': predictor.train_std,
+        'column_indices': predictor.column_indices
+    }
+    with open(os.path.join(output_dir, 'normalization_params.pkl'), 'wb') as f:
+        pickle.dump(norm_params, f)
+
+    # Compact copies for the TensorFlow-free tflite backend
+    models_exported = list(predictor.export_tflite(output_dir))
+
+    # Publish the new generation so every worker's registry swaps models in
+    write_generation_marker(models_dir, generation)
+
+    response_data = {
+        'message': 'Modelos entrenados correctamente',
+        'performance': performance,
+        'models_saved': list(predictor.models.keys()),
+        'models_exported_tflite': models_exported,
+        'database_records': records_created,
+        'training_rows': len(train_df) + len(val_df) + len(test_df)
+    }
+
+    # Add info about database population
+    if should_populate_db and hasattr(settings, 'TIME_SERIES_CSV_PATH'):
+        response_data['database_populated'] = True
+        response_data['population_reason'] = 'empty_database' if db_is_empty else 'explicitly_requested'
+    else:
+        response_data['database_populated'] = False
+
+    return response_data
@@ -0,0 +1,191 @@
+import json
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from ..models import TrainingJob
+from .training import run_training
+
+
+def get_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _to_json(value):
+    """Keras metrics come back as numpy scalars, JSONField wants plain floats"""
+    return json.loads(json.dumps(value, default=float))
+
+
+def enqueue_training_job(populate_database=False):
+    """Queue a training run for the worker, returns the TrainingJob"""
+    return TrainingJob.objects.create(populate_database=populate_database)
+
+
+def claim_next_job(worker=None, job_model=TrainingJob):
+    """
+    Mark the oldest queued job as running and return it, None if the queue is empty.
+    The conditional UPDATE makes sure two workers never pick the same job.
+    """
+    worker = worker or get_worker_name()
+
+    for job_id in job_model.objects.filter(status=job_model.STATUS_QUEUED).order_by('created_at').values_list('id', flat=True)[:5]:
+        now = timezone.now()
+        claimed = job_model.objects.filter(id=job_id, status=job_model.STATUS_QUEUED).update(
+            status=job_model.STATUS_RUNNING, started_at=now, heartbeat_at=now, worker=worker
+        )
+        if claimed:
+            return job_model.objects.get(id=job_id)
+
+    return None
+
+
+def fail_stale_jobs(stale_after=None, job_model=TrainingJob,
+                    error='El worker dejó de responder durante el entrenamiento', reset_fields=None):
+    """
+    Fail running jobs whose worker stopped sending heartbeats (killed or crashed).
+    reset_fields are set on the failed rows too, for what a finished job mustn't keep.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'TRAINING_JOB_STALE_SECONDS', 600)
+
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return job_model.objects.filter(status=job_model.STATUS_RUNNING, heartbeat_at__lt=cutoff).update(
+        status=job_model.STATUS_FAILED,
+        finished_at=timezone.now(),
+        error=error,
+        **(reset_fields or {})
+    )
+
+
+class JobProgress:
+    """Collects stage and per-model/per-epoch progress of a job and saves it to the row"""
+
+    def __init__(self, job):
+        self.job = job
+        self.progress = {'stage': None, 'models': {}}
+
+    def _save(self):
+        self.job.progress = _to_json(self.progress)
+        self.job.heartbeat_at = timezone.now()
+        TrainingJob.objects.filter(id=self.job.id).update(
+            progress=self.job.progress, heartbeat_at=self.job.heartbeat_at
+        )
+
+    def stage(self, name):
+        self.progress['stage'] = name
+        self._save()
+
+    def model_event(self, model_name, event, **info):
+        model_progress = self.progress['models'].setdefault(model_name, {'status': 'pending'})
+
+        if event == 'started':
+            model_progress.update(status='training', epoch=0, max_epochs=info['max_epochs'])
+        elif event == 'epoch':
+            model_progress['epoch'] = info['epoch']
+            model_progress.update(info['logs'])
+        elif event == 'finished':
+            model_progress.update(status='finished', performance=info['performance'])
+        elif event == 'failed':
+            model_progress.update(status='failed', error=info['error'])
+
+        self._save()
+
+
+class Heartbeat:
+    """
+    Writes heartbeat_at of a running job every `interval` seconds from a daemon thread
+    while the block runs. Loading the data, saving the models or a slow epoch send no
+    progress for a long time, without it fail_stale_jobs would take them for a dead worker.
+    """
+
+    def __init__(self, job, interval=None, job_model=TrainingJob):
+        if interval is None:
+            interval = getattr(settings, 'TRAINING_JOB_HEARTBEAT_SECONDS', 30)
+        self.job = job
+        self.interval = interval
+        self.job_model = job_model
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.job_model.objects.filter(id=self.job.id, status=self.job_model.STATUS_RUNNING).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except Exception as e:
+                    print(f"Warning: Could not save the heartbeat of job {self.job.id}: {e}")
+        finally:
+            # The thread has its own database connection
+            connection.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{self.job.id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(job):
+    """
+    Run a claimed job to completion, recording the result or the error. A job another
+    worker failed as stale in the meantime keeps that status.
+    """
+    progress = JobProgress(job)
+
+    try:
+        with Heartbeat(job):
+            result = run_training(
+                populate_database=job.populate_database,
+                progress_callback=progress.model_event,
+                report_stage=progress.stage,
+            )
+        job.status = TrainingJob.STATUS_SUCCEEDED
+        job.result = _to_json(result)
+        progress.progress['stage'] = 'done'
+    except Exception as e:
+        job.status = TrainingJob.STATUS_FAILED
+        job.error = f'El entrenamiento ha fallado: {str(e)}'
+
+    job.progress = _to_json(progress.progress)
+    job.finished_at = timezone.now()
+    finished = TrainingJob.objects.filter(id=job.id, status=TrainingJob.STATUS_RUNNING, worker=job.worker).update(
+        status=job.status, result=job.result, error=job.error, progress=job.progress, finished_at=job.finished_at
+    )
+    if not finished:
+        job.refresh_from_db()
+    return job
+
+
+def run_worker(poll_interval=2.0, once=False, worker=None, stdout=None):
+    """Poll the queue and run jobs one at a time. With once=True, drain the queue and return"""
+    worker = worker or get_worker_name()
+    jobs_run = 0
+
+    while True:
+        close_old_connections()
+        fail_stale_jobs()
+        job = claim_next_job(worker)
+
+        if job is None:
+            if once:
+                return jobs_run
+            time.sleep(poll_interval)
+            continue
+
+        if stdout is not None:
+            stdout.write(f'Ejecutando trabajo de entrenamiento {job.id}')
+        job = run_job(job)
+        jobs_run += 1
+        if stdout is not None:
+            stdout.write(f'Trabajo {job.id} terminado: {job.status}')
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+# The widths /predict/ gets most: the API default (PredictionRequestSerializer) and the frontend's
+DEFAULT_WARMUP_INPUT_HOURS = [24, 168]
+
+
+def get_warmup_input_hours():
+    """Input widths to trace during warm-up (PREDICTION_WARMUP_INPUT_HOURS or DEFAULT_WARMUP_INPUT_HOURS)"""
+    input_hours = getattr(settings, 'PREDICTION_WARMUP_INPUT_HOURS', None)
+    if input_hours is None:
+        input_hours = DEFAULT_WARMUP_INPUT_HOURS
+    return sorted(set(input_hours))
+
+
+class WarmupState:
+    """Thread-safe record of the warm-up progress, read by the readiness endpoint"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    READY = 'ready'
+    FAILED = 'failed'
+    DISABLED = 'disabled'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.status = self.PENDING
+            self.started_at = None
+            self.finished_at = None
+            self.duration_seconds = None
+            self.models = []
+            self.input_hours_warmed = 0
+            self.skipped = []
+            self.error = None
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    @property
+    def is_ready(self):
+        return self.status in (self.READY, self.DISABLED)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'status': self.status,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'duration_seconds': self.duration_seconds,
+                'models': list(self.models),
+                'input_hours_warmed': self.input_hours_warmed,
+                'skipped': list(self.skipped),
+                'error': self.error,
+            }
+
+
+warmup_state = WarmupState()
+
+
+def warm_up(predictor, input_hours_list):
+    """
+    Run a dummy prediction through every model at every input width so the
+    first real request doesn't pay for graph tracing. Returns the (model, hours)
+    pairs that could not be run, e.g. conv with fewer hours than its kernel.
+    """
+    skipped = []
+    n_features = len(predictor.column_indices)
+
+    for model_name in list(predictor.models.keys()):
+        for input_hours in input_hours_list:
+            dummy_data = np.zeros((input_hours, n_features), dtype=np.float32)
+            try:
+                predictor.predict(model_name, dummy_data, hours_ahead=1)
+            except ValueError as e:
+                skipped.append({'model': model_name, 'input_hours': input_hours, 'error': str(e)})
+
+    return skipped
+
+
+def run_warmup():
+    """Load the registry and warm every model up, recording the outcome in warmup_state"""
+    # Imported here so AppConfig.ready() doesn't pull TensorFlow into every manage.py command
+    from .model_registry import model_registry
+
+    start = time.perf_counter()
+    warmup_state.update(status=WarmupState.RUNNING, started_at=timezone.now())
+
+    try:
+        predictor = model_registry.get_predictor()
+        model_registry.get_sample_data()
+
+        if predictor is None or not predictor.models:
+            # Nothing trained yet: the rest of the API must still be served so models can be trained
+            models, skipped, input_hours_list = [], [], []
+        else:
+            input_hours_list = get_warmup_input_hours()
+            skipped = warm_up(predictor, input_hours_list)
+            models = list(predictor.models.keys())
+
+        warmup_state.update(
+            status=WarmupState.READY,
+            models=models,
+            input_hours_warmed=len(input_hours_list),
+            skipped=skipped,
+            finished_at=timezone.now(),
+            duration_seconds=round(time.perf_counter() - start, 3),
+        )
+        print(f"Prediction warm-up finished for models: {models}")
+
+    except Exception as e:
+        warmup_state.update(
+            status=WarmupState.FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+            duration_seconds=round(time.perf_counter() - start, 3),
+        )
+        print(f"Warning: Prediction warm-up failed: {e}")
+
+
+def start_warmup_thread():
+    """Warm up in the background so the worker boots immediately and reports not-ready meanwhile"""
+    thread = threading.Thread(target=run_warmup, name='prediction-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -1,144 +1,98 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework import status
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Avg
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Avg, Count, Max, Q
 from datetime import timedelta, datetime
-from collections import defaultdict
+from types import SimpleNamespace
+import numpy as np
 import pandas as pd
-import requests
 import os
-import html
 
-from .models import TimeSeriesData, PredictionHistory
-from .utils.time_series_utils import TimeSeriesPredictor
+from .models import TimeSeriesData, PredictionHistory, TrainingJob, DownloadJob
+from .utils.model_registry import model_registry
+from .utils.training import run_training, NoTrainingDataError
+from .utils.training_jobs import enqueue_training_job
+from .utils.download_jobs import enqueue_download_job
+from .utils.timeseries_store import timeseries_store, FEATURE_COLUMNS
+from .utils.data_generation import (
+    TIMESERIES, conditional_get, generation_condition, get_data_generation
+)
+from .utils.historical_stream import HistoricalStream, dumps
+from .utils.historical_columnar import ColumnarSeries
+from .utils.rollups import rollup_series
+from .utils.dataset_merge import SELECTED_GEO, source_data_id
+from .ingestion import EsiosFetcher, IngestionPipeline, settings_data_dir
+from .utils.warmup import warmup_state
+from .utils.inference_batching import get_inference_batcher
 from .serializers import (
     PredictionRequestSerializer, 
     DataDownloadRequestSerializer,
+    DatasetMergeRequestSerializer,
     HistoricalDataRequestSerializer,
     PredictionHistoryFilterSerializer,
     PredictionHistoryListSerializer,
     PredictionHistorySerializer,
+    TrainingJobSerializer,
+    DownloadJobSerializer,
     # PredictionResponseSerializer,
     # TimeSeriesDataSerializer
 )
 
 class TrainModelsView(APIView):
     """
-    One-time endpoint to train all models
+    Queue a job that trains all models. The training_worker command runs it and
+    GET /train/<job_id>/ reports its progress. With TRAINING_JOBS_EAGER the models
+    are trained inside the request, as before.
     """
     
-    def _populate_database_from_csv(self, csv_path):
-        """Load CSV data into database after training"""
-        try:
-            df = pd.read_csv(csv_path)
-            df['datetime_utc'] = pd.to_datetime(df['datetime_utc'])
-            df = df.ffill()
-            
-            # Create records in batches for efficiency
-            batch_size = 1000
-            records = []
-            
-            for _, row in df.iterrows():
-                # Create a record dict, excluding datetime_utc which needs special handling
-                record_data = row.to_dict()
-                datetime_val = record_data.pop('datetime_utc')
-                
-                record = TimeSeriesData(
-                    datetime_utc=datetime_val,
-                    **record_data
-                )
-                records.append(record)
-                
-                # Bulk create when batch is full
-                if len(records) >= batch_size:
-                    TimeSeriesData.objects.bulk_create(records)
-                    records = []
-            
-            # Create remaining records
-            if records:
-                TimeSeriesData.objects.bulk_create(records)
-                
-            return TimeSeriesData.objects.count()
-            
-        except Exception as e:
-            raise Exception(f"Failed to populate database: {str(e)}")
-    
     def post(self, request):
+        populate_database = request.data.get('populate_database', False)
+
+        if not getattr(settings, 'TRAINING_JOBS_EAGER', False):
+            job = enqueue_training_job(populate_database=populate_database)
+            return Response({
+                'message': 'Entrenamiento en cola',
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': request.build_absolute_uri(reverse('training-job-detail', args=[job.id]))
+            }, status=status.HTTP_202_ACCEPTED)
+
         try:
-            predictor = TimeSeriesPredictor()
+            return Response(run_training(populate_database=populate_database))
 
-            force_populate = request.data.get('populate_database', False)
-            db_is_empty = not TimeSeriesData.objects.exists()
-            should_populate_db = db_is_empty or force_populate
-            
-            # Option 1: Load from CSV. This should be the default approach here.
-            if hasattr(settings, 'TIME_SERIES_CSV_PATH'):
-                train_df, val_df, test_df, date_time = predictor.load_data_from_csv(
-                    settings.TIME_SERIES_CSV_PATH
-                )
-                
-                # POPULATE DATABASE FROM CSV only if conditions are met
-                if should_populate_db:
-                    records_created = self._populate_database_from_csv(settings.TIME_SERIES_CSV_PATH)
-                else:
-                    # Count existing records for response
-                    records_created = TimeSeriesData.objects.count()
-                    
-            else:
-                # Option 2: Load from database
-                queryset = TimeSeriesData.objects.all().order_by('datetime_utc')
-                if not queryset.exists():
-                    return Response({
-                        'error': 'No se han encontrado los datos.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                train_df, val_df, test_df, date_time = predictor.load_data_from_queryset(queryset)
-                records_created = queryset.count()
-            
-            # Train all models
-            performance = predictor.train_models(train_df, val_df, test_df)
-            
-            # Save models to disk (optional)
-            models_dir = os.path.join(settings.MEDIA_ROOT, 'models')
-            os.makedirs(models_dir, exist_ok=True)
-            
-            for name, model in predictor.models.items():
-                model.save(os.path.join(models_dir, f'{name}_model.h5'))
-            
-            # Save normalization parameters
-            import pickle
-            norm_params = {
-                'train_mean': predictor.train_mean,
-                'train_std': predictor.train_std,
-                'column_indices': predictor.column_indices
-            }
-            with open(os.path.join(models_dir, 'normalization_params.pkl'), 'wb') as f:
-                pickle.dump(norm_params, f)
-            
-            response_data = {
-                'message': 'Modelos entrenados correctamente',
-                'performance': performance,
-                'models_saved': list(predictor.models.keys()),
-                'database_records': records_created
-            }
-            
-            # Add info about database population
-            if should_populate_db and hasattr(settings, 'TIME_SERIES_CSV_PATH'):
-                response_data['database_populated'] = True
-                response_data['population_reason'] = 'empty_database' if db_is_empty else 'explicitly_requested'
-            else:
-                response_data['database_populated'] = False
-            
-            return Response(response_data)
+        except NoTrainingDataError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
             
         except Exception as e:
             return Response({
                 'error': f'El entrenamiento ha fallado: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class TrainingJobDetailView(APIView):
+    """
+    Status and per-model/per-epoch progress of a training job
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = TrainingJob.objects.get(pk=job_id)
+        except TrainingJob.DoesNotExist:
+            return Response({
+                'error': 'Trabajo de entrenamiento no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(TrainingJobSerializer(job).data)
+
 class PredictView(APIView):
     """
     Main prediction endpoint
@@ -153,47 +107,12 @@ class PredictView(APIView):
         self._load_sample_data()
     
     def _load_models(self):
-        """Load trained models and normalization parameters"""
-        try:
-            import pickle
-            import tensorflow as tf
-            
-            models_dir = os.path.join(settings.MEDIA_ROOT, 'models')
-            
-            # Load normalization parameters
-            with open(os.path.join(models_dir, 'normalization_params.pkl'), 'rb') as f:
-                norm_params = pickle.load(f)
-            
-            self.predictor = TimeSeriesPredictor()
-            self.predictor.train_mean = norm_params['train_mean']
-            self.predictor.train_std = norm_params['train_std']
-            self.predictor.column_indices = norm_params['column_indices']
-            
-            # Load models
-            for model_name in ['linear', 'dense', 'conv', 'lstm']:
-                model_path = os.path.join(models_dir, f'{model_name}_model.h5')
-                if os.path.exists(model_path):
-                    self.predictor.models[model_name] = tf.keras.models.load_model(model_path)
-                    
-        except Exception as e:
-            print(f"Warning: Could not load models: {e}")
-            self.predictor = None
+        """Get the trained models from the process-wide registry"""
+        self.predictor = model_registry.get_predictor()
     
     def _load_sample_data(self):
-        """Load sample data CSV for demo purposes"""
-        try:
-            sample_data_path = os.path.join(settings.BASE_DIR, 'data', 'sample_data.csv')
-            if os.path.exists(sample_data_path):
-                self.sample_data = pd.read_csv(sample_data_path)
-                # Convert datetime column to datetime type
-                self.sample_data['datetime_utc'] = pd.to_datetime(self.sample_data['datetime_utc'])
-                print("Sample data loaded successfully")
-            else:
-                print(f"Sample data file not found at: {sample_data_path}")
-                self.sample_data = None
-        except Exception as e:
-            print(f"Warning: Could not load sample data: {e}")
-            self.sample_data = None
+        """Get the sample data for demo purposes from the process-wide registry"""
+        self.sample_data = model_registry.get_sample_data()
     
     def _is_date_in_sample_range(self, date):
         """Check if a date is within the sample data range"""
@@ -279,14 +198,19 @@ class PredictView(APIView):
             
             start_time = end_time - timedelta(hours=input_hours)
             
-            # First, try to get data from database
-            recent_data = TimeSeriesData.objects.filter(
-                datetime_utc__range=[start_time, end_time]
-            ).order_by('datetime_utc')
+            # First, try to get data from database (through the in-process cache when it's available)
+            window = timeseries_store.get_range(start_time, end_time)
+            if window is not None:
+                available_hours = len(window)
+            else:
+                recent_data = TimeSeriesData.objects.filter(
+                    datetime_utc__range=[start_time, end_time]
+                ).order_by('datetime_utc')
+                available_hours = recent_data.count()
             
             using_sample_data = False
             
-            if recent_data.count() < input_hours:
+            if available_hours < input_hours:
                 if prediction_date:
                     if (self._is_date_in_sample_range(prediction_date) and 
                         self.sample_data is not None):
@@ -303,20 +227,7 @@ class PredictView(APIView):
                             df = sample_df.drop(['datetime_utc'], axis=1, errors='ignore')
                             data_array = df.values
                             using_sample_data = True
-                            
-                            # Create fake recent_data object for timestamp calculation
-                            class FakeLast:
-                                def __init__(self, dt):
-                                    self.datetime_utc = dt
-                            
-                            class FakeRecentData:
-                                def __init__(self, last_dt):
-                                    self._last = FakeLast(last_dt)
-                                
-                                def last(self):
-                                    return self._last
-                            
-                            recent_data = FakeRecentData(sample_df['datetime_utc'].iloc[-1])
+                            last_timestamp = sample_df['datetime_utc'].iloc[-1]
                         else:
                             return Response({
                                 'error': f'No existen suficientes datos de muestra para la fecha seleccionada. Se necesitan {input_hours} horas.'
@@ -332,20 +243,23 @@ class PredictView(APIView):
                         }, status=status.HTTP_400_BAD_REQUEST)
                 else:
                     return Response({
-                        'error': f'No existen suficientes datos para la fecha seleccionada. Se necesitan {input_hours} horas, se encontraron {recent_data.count()}'
+                        'error': f'No existen suficientes datos para la fecha seleccionada. Se necesitan {input_hours} horas, se encontraron {available_hours}'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
             # If we're not using sample data, process DB data normally
-            if not using_sample_data:
+            if not using_sample_data and window is not None:
+                data_array = window.values
+                last_timestamp = window.last_timestamp
+            elif not using_sample_data:
                 df = pd.DataFrame.from_records(recent_data.values())
                 df = df.drop(['id', 'datetime_utc'], axis=1)
                 data_array = df.values
+                last_timestamp = recent_data.last().datetime_utc
             
             # Make prediction
             result = self.predictor.predict(model_name, data_array, hours_ahead)
             
             # Generate future timestamps
-            last_timestamp = recent_data.last().datetime_utc
             future_timestamps = [
                 last_timestamp + timedelta(hours=i+1) 
                 for i in range(hours_ahead)
@@ -388,10 +302,23 @@ class PredictView(APIView):
                 'error': f'Fallo en la predicción: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class PayloadFormatNegotiation(DefaultContentNegotiation):
+    """Content negotiation that leaves the `format` query parameter to the view"""
+    settings = SimpleNamespace(URL_FORMAT_OVERRIDE=None)
+
+
+@method_decorator(generation_condition(TIMESERIES), name='get')
 class HistoricalDataView(APIView):
     """
-    Get historical data for charts
+    Get historical data for charts. ndjson, stream=true and, if HISTORICAL_STREAM_MIN_DAYS
+    is set, ranges that long are streamed from a database cursor (see HistoricalStream), shape=columns gives one array per column.
+    format=columnar and format=binary send only the values, see ColumnarSeries.
+    max_points downsamples the range (LTTB or min/max buckets) to at most that many rows.
+    resolution=day|week|month reads one row per period from TimeSeriesAggregate.
+    Answers carry an ETag of the data generation, unchanged data gets a 304.
     """
+    content_negotiation_class = PayloadFormatNegotiation
+
     def get(self, request):
         try:
             serializer = HistoricalDataRequestSerializer(data=request.query_params)
@@ -402,6 +329,13 @@ class HistoricalDataView(APIView):
             days = serializer.validated_data['days']
             columns = serializer.validated_data.get('columns', [])
             end_date = serializer.validated_data.get('end_date')
+            output_format = serializer.validated_data['format']
+            shape = serializer.validated_data['shape']
+            max_points = serializer.validated_data.get('max_points')
+            resolution = serializer.validated_data['resolution']
+            # The ETag carries this generation, the cached window must be at least as recent
+            current = get_data_generation()
+            generation = current.generation if current is not None else None
             
             # Default columns if none specified
             if not columns:
@@ -438,38 +372,115 @@ class HistoricalDataView(APIView):
             
             start_time = end_time - timedelta(days=days)
             
-            queryset = TimeSeriesData.objects.filter(
-                datetime_utc__range=[start_time, end_time]
-            ).order_by('datetime_utc')
+            def metadata(count):
+                return {
+                    'columns': columns,
+                    'count': count,
+                    'time_range': {
+                        'start': start_time,
+                        'end': end_time
+                    },
+                    'parameters': {
+                        'days': days,
+                        'end_date': end_date.isoformat() if end_date else None,
+                        'columns_count': len(columns),
+                        'max_points': max_points,
+                        'resolution': resolution
+                    }
+                }
             
-            if not queryset.exists():
-                return Response({
-                    'error': 'No se han encontrado datos para el rango de tiempo especificado'
-                }, status=status.HTTP_404_NOT_FOUND)
+            # Rollups and downsampled ranges are small, built from arrays in every format
+            if output_format in ('columnar', 'binary') or max_points or resolution != 'hour':
+                feature_columns = [col for col in columns if col in FEATURE_COLUMNS]
+                if resolution != 'hour':
+                    series = rollup_series(start_time, end_time, feature_columns, resolution,
+                                           serializer.validated_data['stat'])
+                else:
+                    window = timeseries_store.get_range(start_time, end_time, feature_columns, generation)
+                    if window is not None:
+                        series = ColumnarSeries.from_window(window)
+                    else:
+                        series = ColumnarSeries.query(start_time, end_time, feature_columns)
+                
+                if not len(series):
+                    return Response({
+                        'error': 'No se han encontrado datos para el rango de tiempo especificado'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                
+                if max_points:
+                    series = series.downsample(max_points, serializer.validated_data['downsample'])
+                
+                if output_format == 'binary':
+                    return HttpResponse(series.to_binary(metadata(len(series))), content_type='application/octet-stream')
+                if output_format == 'columnar':
+                    return Response({**series.to_json(), **metadata(len(series))})
+                
+                data = series.by_column() if shape == 'columns' else series.records()
+                if output_format == 'ndjson':
+                    if shape == 'columns':
+                        lines = [{'column': name, 'values': values} for name, values in data.items()]
+                    else:
+                        lines = data
+                    return HttpResponse(''.join(dumps(line) + '\n' for line in lines), content_type='application/x-ndjson')
+                count = len(data['datetime']) if shape == 'columns' else len(data)
+                return Response({'data': data, **metadata(count)})
+            
+            stream_min_days = getattr(settings, 'HISTORICAL_STREAM_MIN_DAYS', None)
+            if (serializer.validated_data['stream'] or output_format == 'ndjson'
+                    or (stream_min_days is not None and days >= stream_min_days)):
+                stream = HistoricalStream(start_time, end_time, columns, shape)
+                if not stream.exists():
+                    return Response({
+                        'error': 'No se han encontrado datos para el rango de tiempo especificado'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                
+                if output_format == 'ndjson':
+                    return StreamingHttpResponse(stream.ndjson(), content_type='application/x-ndjson')
+                return StreamingHttpResponse(stream.json(metadata), content_type='application/json')
             
-            # Convert to format suitable for frontend charts
-            data = []
-            for record in queryset:
-                row = {'datetime': record.datetime_utc}
-                for col in columns:
-                    if hasattr(record, col):
-                        row[col] = getattr(record, col)
-                data.append(row)
+            window = timeseries_store.get_range(
+                start_time, end_time, [col for col in columns if col in FEATURE_COLUMNS], generation
+            )
             
-            return Response({
-                'data': data,
-                'columns': columns,
-                'count': len(data),
-                'time_range': {
-                    'start': start_time,
-                    'end': end_time
-                },
-                'parameters': {
-                    'days': days,
-                    'end_date': end_date.isoformat() if end_date else None,
-                    'columns_count': len(columns)
-                }
-            })
+            if window is not None:
+                if not len(window):
+                    return Response({
+                        'error': 'No se han encontrado datos para el rango de tiempo especificado'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                
+                # Convert to format suitable for frontend charts, NaN back to null
+                values = window.values.astype(object)
+                values[np.isnan(window.values)] = None
+                keys = ['datetime'] + window.columns
+                data = [
+                    dict(zip(keys, (timestamp, *row)))
+                    for timestamp, row in zip(window.timestamps, values.tolist())
+                ]
+            else:
+                queryset = TimeSeriesData.objects.filter(
+                    datetime_utc__range=[start_time, end_time]
+                ).order_by('datetime_utc')
+                
+                if not queryset.exists():
+                    return Response({
+                        'error': 'No se han encontrado datos para el rango de tiempo especificado'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                
+                # Convert to format suitable for frontend charts
+                data = []
+                for record in queryset:
+                    row = {'datetime': record.datetime_utc}
+                    for col in columns:
+                        if hasattr(record, col):
+                            row[col] = getattr(record, col)
+                    data.append(row)
+            
+            count = len(data)
+            if shape == 'columns':
+                keys = data[0].keys()
+                data = {key: [row[key] for row in data] for key in keys}
+            
+            return Response({'data': data, **metadata(count)})
             
         except Exception as e:
             return Response({
@@ -479,99 +490,10 @@ class HistoricalDataView(APIView):
 
 class DownloadDataView(APIView):
     """
-    Endpoint to download data from ESIOS API
+    Endpoint to download data from ESIOS API. The download is the fetch step of
+    core.ingestion, with the EsiosFetcher configured from the Django settings.
     """
 
-    def __init__(self):
-        super().__init__()
-        self.BASE_ENDPOINT = 'https://api.esios.ree.es/indicators'
-        
-        self.DATA_TO_DOWNLOAD = {
-            "energy_generation/hydraulic": [1, 36, 71],
-            "energy_generation/nuclear": [4, 39, 74],
-            "energy_generation/wind": [12],
-            "energy_generation/solar": [14],
-            "energy_demand/peninsula_forecast": [460],
-            "energy_demand/scheduled_demand": [358, 365, 372],
-            "price/daily_spot_market": [600],
-            "price/average_demand_price": [573]
-        }
-
-    def _get_headers(self, token):
-        """Get API headers with the provided token"""
-        return {
-            'Accept': 'application/json; application/vnd.esios-api-v2+json',
-            'Content-Type': 'application/json',
-            'Host': 'api.esios.ree.es',
-            'Cookie': '',
-            'Authorization': f'Token token={token}',
-            'x-api-key': f'{token}',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache'
-        }
-
-    def _get_data_dir(self):
-        """Get the data directory path (time_series_tfg/data/)"""
-        project_root = getattr(settings, 'BASE_DIR', os.getcwd())
-        return os.path.join(project_root, "data")
-
-    def _get_indicators(self, headers):
-        """Get all available indicators from the API."""
-        try:
-            response = requests.get(self.BASE_ENDPOINT, headers=headers)
-            response.raise_for_status()
-            response_data = response.json()
-
-            return (pd
-                    .json_normalize(data=response_data['indicators'], errors='ignore')
-                    .assign(description=lambda df_: df_.apply(
-                        lambda df__: html.unescape(df__['description']
-                                                   .replace('</p>', '')
-                                                   .replace('<p>', '')
-                                                   .replace('<b>', '')
-                                                   .replace('</b>', ''))
-                        if isinstance(df__['description'], str) else df__['description'],
-                        axis=1)
-                    ))
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to fetch indicators: {str(e)}")
-
-    def _get_data_by_id_month(self, indicator_id, year, month, headers):
-        """Get data for a specific indicator by ID for a given month."""
-        start_date = datetime(year, month, 1)
-        
-        # If it's the current year and month, use today as the end date
-        if year == datetime.today().year and month == datetime.today().month:
-            end_date = datetime.today()
-        else:
-            # Otherwise, use the last day of the month
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = datetime(year, month + 1, 1) - timedelta(days=1)
-
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-
-        endpoint = (f"{self.BASE_ENDPOINT}/{indicator_id}?"
-                   f"start_date={start_date_str}T00:00&"
-                   f"end_date={end_date_str}T23:59&"
-                   f"time_trunc=five_minutes")
-        
-        try:
-            response = requests.get(endpoint, headers=headers)
-            response.raise_for_status()
-            response_data = response.json()
-            return pd.json_normalize(data=response_data['indicator'], 
-                                   record_path='values', errors='ignore')
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to fetch data for indicator {indicator_id}: {str(e)}")
-
-    def _save_data(self, data, file_path):
-        """Save DataFrame to CSV file."""
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        data.to_csv(file_path, index=False)
-
     def post(self, request):
         try:
             serializer = DataDownloadRequestSerializer(data=request.data)
@@ -581,71 +503,21 @@ class DownloadDataView(APIView):
             token = serializer.validated_data['esios_token']
             download_indicators = serializer.validated_data.get('download_indicators', True)
             years_back = serializer.validated_data.get('years_back', 5)
-            
-            headers = self._get_headers(token)
-            data_dir = self._get_data_dir()
-            
-            os.makedirs(data_dir, exist_ok=True)
-            
-            results = {
-                'message': 'Data download completed',
-                'data_directory': data_dir,
-                'downloaded_files': [],
-                'errors': []
-            }
+            sync = serializer.validated_data.get('sync', False)
 
-            if download_indicators:
-                try:
-                    indicators = self._get_indicators(headers)
-                    indicators_path = os.path.join(data_dir, "indicators.csv")
-                    self._save_data(indicators, indicators_path)
-                    results['downloaded_files'].append('indicators.csv')
-                except Exception as e:
-                    results['errors'].append(f"Failed to download indicators: {str(e)}")
-
-            end_date = datetime.today()
-            start_date = end_date - timedelta(days=years_back * 365)
-            start_year = start_date.year
-            current_year = end_date.year
-
-            for category, indicator_ids in self.DATA_TO_DOWNLOAD.items():
-                category_dir = os.path.join(data_dir, category)
-                os.makedirs(category_dir, exist_ok=True)
-                
-                for indicator_id in indicator_ids:
-                    try:
-                        for year in range(start_year, current_year + 1):
-                            yearly_data = []
-                            
-                            for month in range(1, 13):
-                                # Skip future months for the current year
-                                if year == current_year and month > datetime.today().month:
-                                    break
-                                
-                                try:
-                                    monthly_data = self._get_data_by_id_month(
-                                        indicator_id, year, month, headers)
-                                    
-                                    if not monthly_data.empty:
-                                        yearly_data.append(monthly_data)
-                                        
-                                except Exception as e:
-                                    results['errors'].append(
-                                        f"Error downloading indicator {indicator_id} "
-                                        f"for {year}-{month:02d}: {str(e)}")
-                            
-                            # Combine and save yearly data
-                            if yearly_data:
-                                combined_yearly_data = pd.concat(yearly_data, ignore_index=True)
-                                file_name = f"{indicator_id}_{year}.csv"
-                                file_path = os.path.join(category_dir, file_name)
-                                self._save_data(combined_yearly_data, file_path)
-                                results['downloaded_files'].append(f"{category}/{file_name}")
-                                
-                    except Exception as e:
-                        results['errors'].append(
-                            f"Failed to download indicator {indicator_id} "
-                            f"in category {category}: {str(e)}")
+            if not getattr(settings, 'DOWNLOAD_JOBS_EAGER', False):
+                job = enqueue_download_job(token, download_indicators, years_back, sync)
+                return Response({
+                    'message': 'Descarga en cola',
+                    'job_id': job.id,
+                    'status': job.status,
+                    'status_url': request.build_absolute_uri(reverse('download-job-detail', args=[job.id]))
+                }, status=status.HTTP_202_ACCEPTED)
+
+            fetcher = EsiosFetcher.from_settings()
+            results = IngestionPipeline(fetcher.data_dir, fetcher).run(
+                ['fetch'], token=token, download_indicators=download_indicators, years_back=years_back, sync=sync
+            )['fetch']
 
             # Determine response status
             if results['errors'] and not results['downloaded_files']:
@@ -661,6 +533,22 @@ class DownloadDataView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class DownloadJobDetailView(APIView):
+    """
+    Status and per-indicator/per-month progress of a download job
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = DownloadJob.objects.get(pk=job_id)
+        except DownloadJob.DoesNotExist:
+            return Response({
+                'error': 'Trabajo de descarga no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(DownloadJobSerializer(job).data)
+
+
 class MergeDataView(APIView):
     """
     Endpoint to merge downloaded data files
@@ -668,38 +556,22 @@ class MergeDataView(APIView):
     
     def __init__(self):
         super().__init__()
-        self.SELECTED_GEO = {"Península", "España", "Portugal", "Baleares", "Canarias", "Ceuta", "Melilla"}
+        self.SELECTED_GEO = SELECTED_GEO
 
     def _get_data_dir(self):
         """Get the data directory path (project_root/data/)"""
-        project_root = getattr(settings, 'BASE_DIR', os.getcwd())
-        return os.path.join(project_root, "data")
+        return settings_data_dir()
 
     def _get_data_id(self, path):
         """Extract data ID from file path"""
-        parts = path.replace("\\", "/").split("/")
-        if len(parts) < 2:
-            return None
-        category = parts[-2]
-        filename = os.path.splitext(parts[-1])[0]
-        sensor_id = filename.split("_")[0]
-        return f"{category}_{sensor_id}"
-
-    def _resample_to_hourly(self, df):
-        """Resample data to hourly frequency, calculating mean for sub-hourly data"""
-        df['hour'] = df['datetime_utc'].dt.floor('h')
-        
-        if 'geo_name' in df.columns:
-            hourly_df = df.groupby(['hour', 'geo_name'])['value'].mean().reset_index()
-            hourly_df.rename(columns={'hour': 'datetime_utc'}, inplace=True)
-        else:
-            hourly_df = df.groupby('hour')['value'].mean().reset_index()
-            hourly_df.rename(columns={'hour': 'datetime_utc'}, inplace=True)
-        
-        return hourly_df
+        return source_data_id(path)
 
     def post(self, request):
         try:
+            serializer = DatasetMergeRequestSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
             data_dir = self._get_data_dir()
             
             if not os.path.exists(data_dir):
@@ -707,98 +579,40 @@ class MergeDataView(APIView):
                     'error': f'Directorio de datos no encontrado: {data_dir}. Descarga los datos primero.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            data = defaultdict(list)
-            processed_files = []
-            errors = []
+            pipeline = IngestionPipeline(data_dir)
+            merge = pipeline.run(['merge'], workers=getattr(settings, 'MERGE_WORKERS', 1),
+                                 selected_geo=self.SELECTED_GEO, full=serializer.validated_data['full'])['merge']
+            merged_df = merge['merged']
+            errors = merge['errors']
+            timings = merge['timings']
 
-            for root, _, files in os.walk(data_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    if not file.endswith(".csv") or os.path.dirname(file_path) == data_dir:
-                        continue
-                    
-                    data_id = self._get_data_id(file_path)
-                    if not data_id:
-                        continue
-                    
-                    try:
-                        df = pd.read_csv(file_path)
-                        df['datetime_utc'] = pd.to_datetime(df['datetime_utc'], utc=True)
-                        
-                        df = self._resample_to_hourly(df)
-                        
-                        if 'geo_name' in df.columns:
-                            df = df[df['geo_name'].isin(self.SELECTED_GEO)]
-                        
-                            unique_geos = df['geo_name'].nunique()
-                            if unique_geos > 1:
-                                pivot_df = df.pivot_table(
-                                    index="datetime_utc",
-                                    columns="geo_name",
-                                    values="value",
-                                    aggfunc="first"
-                                )
-                                pivot_df = pivot_df.rename(columns=lambda g: f"{data_id}_{g}")
-                                pivot_df = pivot_df.reset_index()
-                                data[data_id].append(pivot_df)
-                            else:
-                                df = df[['datetime_utc', 'value']]
-                                data[data_id].append(df)
-                        else:
-                            if 'value' in df.columns:
-                                df = df[['datetime_utc', 'value']]
-                                data[data_id].append(df)
-                        
-                        processed_files.append(file_path)
-                        
-                    except Exception as e:
-                        error_msg = f"Error reading {file_path}: {str(e)}"
-                        errors.append(error_msg)
-
-            if not data:
+            if not merge['data_ids']:
                 return Response({
                     'error': 'No se han encontrado datos validos para construir el dataset de entrenamiento',
-                    'processed_files': processed_files,
+                    'processed_files': merge['processed_files'],
                     'errors': errors
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            all_dfs = []
-            for data_id, dfs in data.items():
-                if dfs:
-                    combined = pd.concat(dfs, ignore_index=True)
-                    combined = combined.sort_values("datetime_utc").drop_duplicates("datetime_utc")
-                    combined.rename(columns={'value': data_id}, inplace=True)
-                    all_dfs.append(combined)
-
-            merged_df = None
-            for df in all_dfs:
-                if merged_df is None:
-                    merged_df = df
-                else:
-                    merged_df = pd.merge(merged_df, df, on="datetime_utc", how="outer")
-
             if merged_df is None or merged_df.empty:
                 return Response({
                     'error': 'Fallo al unir los datos',
                     'errors': errors
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            merged_df = merged_df.sort_values("datetime_utc")
-            output_file = os.path.join(data_dir, "merged_dataset.csv")
-            merged_df.to_csv(output_file, index=False)
-
             return Response({
                 'message': 'Dataset construido con éxito',
-                'output_file': output_file,
-                'processed_files_count': len(processed_files),
-                'data_categories': list(data.keys()),
+                'output_file': merge['output_file'],
+                'binary_file': merge['binary_file'],
+                'mode': merge['mode'],
+                'processed_files_count': len(merge['processed_files']),
+                'data_categories': merge['data_ids'],
                 'merged_rows': len(merged_df),
                 'merged_columns': len(merged_df.columns),
                 'date_range': {
                     'start': merged_df['datetime_utc'].min().isoformat() if not merged_df.empty else None,
                     'end': merged_df['datetime_utc'].max().isoformat() if not merged_df.empty else None
                 },
+                'timings_ms': {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()},
                 'errors': errors if errors else None
             }, status=status.HTTP_200_OK)
 
@@ -807,6 +621,7 @@ class MergeDataView(APIView):
                 'error': f'Hubo un error al unir los datos: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@method_decorator(generation_condition(TIMESERIES), name='get')
 class LatestDataDateView(APIView):
     """
     Get the most recent date available in the database
@@ -922,6 +737,29 @@ class PredictionHistoryDetailView(APIView):
         return Response(serializer.data)
 
 
+def _prediction_stats_state(request):
+    """
+    Count, last id and 7 day count of the history in one aggregate, what the stats
+    answer depends on. The count also changes when rows are deleted, and the 7 day
+    count when a prediction leaves the window, without any write.
+    """
+    if not hasattr(request, '_prediction_stats_state'):
+        week_ago = timezone.now() - timezone.timedelta(days=7)
+        request._prediction_stats_state = PredictionHistory.objects.aggregate(
+            total=Count('id'),
+            last_id=Max('id'),
+            recent=Count('id', filter=Q(created_at__gte=week_ago)),
+        )
+    return request._prediction_stats_state
+
+
+def _prediction_stats_etag(request):
+    state = _prediction_stats_state(request)
+    return [state['total'], state['last_id'], state['recent']]
+
+
+# Only the ETag, no timestamp of the history moves when rows are deleted
+@method_decorator(conditional_get(_prediction_stats_etag), name='get')
 class PredictionHistoryStatsView(APIView):
     """
     Get statistics about prediction history
@@ -967,3 +805,30 @@ class PredictionHistoryStatsView(APIView):
             'average_hours_ahead': round(avg_hours, 2) if avg_hours else 0,
             'recent_predictions_7_days': recent_predictions,
         })
+
+
+class ReadinessView(APIView):
+    """
+    Readiness probe for the load balancer: 200 only once the models are warmed up
+    """
+    
+    def get(self, request):
+        state = warmup_state.as_dict()
+        
+        if not warmup_state.is_ready:
+            return Response(state, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        return Response(state)
+
+
+class InferenceMetricsView(APIView):
+    """
+    Batch-size and queue-wait metrics of the prediction micro-batcher
+    """
+    
+    def get(self, request):
+        batcher = get_inference_batcher()
+        return Response({
+            'config': batcher.config(),
+            'metrics': batcher.metrics.as_dict(),
+        })
@@ -7,6 +7,8 @@ const DownloadConfig = ({
   setYearsBack,
   downloadIndicators,
   setDownloadIndicators,
+  syncOnly,
+  setSyncOnly,
   isDownloading,
   onDownload
 }: DownloadConfigProps) => (
@@ -71,6 +73,25 @@ const DownloadConfig = ({
         </label>
       </div>
 
+      <div className="flex items-center">
+        <label className="flex items-center cursor-pointer">
+          <input
+            type="checkbox"
+            checked={syncOnly}
+            onChange={(e) => setSyncOnly(e.target.checked)}
+            className="mr-3 h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded"
+          />
+          <div>
+            <span className="text-sm font-medium text-gray-700">
+              Descargar solo los meses que faltan
+            </span>
+            <p className="text-xs text-gray-500 mt-1">
+              Los meses ya descargados y cerrados se mantienen, solo se piden los nuevos y el mes en curso
+            </p>
+          </div>
+        </label>
+      </div>
+
       <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-4">
         <div className="flex">
           <div className="text-yellow-400">⚠️</div>
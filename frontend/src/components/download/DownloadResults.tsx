@@ -18,6 +18,12 @@ const DownloadResults = ({ downloadResults, isMerging, onMergeData }: DownloadRe
             <span className="text-green-700">Directorio:</span>
             <span className="font-medium text-xs">{downloadResults.data_directory}</span>
           </div>
+          {downloadResults.mode === 'sync' && (
+            <div className="flex justify-between">
+              <span className="text-green-700">Meses descargados / ya al día:</span>
+              <span className="font-medium">{downloadResults.fetched_months} / {downloadResults.skipped_months}</span>
+            </div>
+          )}
           {downloadResults.errors.length > 0 && (
             <div className="flex justify-between">
               <span className="text-orange-700">Errores:</span>
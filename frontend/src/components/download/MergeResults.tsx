@@ -30,6 +30,22 @@ const MergeResults = ({ mergeResults }: MergeResultsProps) => (
             <span className="text-green-700">Categorías:</span>
             <span className="font-medium">{mergeResults.data_categories.length}</span>
           </div>
+          {mergeResults.mode && (
+            <div className="flex justify-between">
+              <span className="text-green-700">Modo:</span>
+              <span className="font-medium">
+                {{ unchanged: 'Sin cambios', incremental: 'Incremental', full: 'Completo' }[mergeResults.mode]}
+              </span>
+            </div>
+          )}
+          {mergeResults.timings_ms && (
+            <div className="flex justify-between">
+              <span className="text-green-700">Tiempo:</span>
+              <span className="font-medium">
+                {(Object.values(mergeResults.timings_ms).reduce((total, ms) => total + ms, 0) / 1000).toFixed(1)} s
+              </span>
+            </div>
+          )}
         </div>
       </div>
 
@@ -12,7 +12,7 @@ import RegionalPriceComparison from '@/components/dashboard/plots/RegionalPriceC
 import RegionalAveragesBar from '@/components/dashboard/plots/AverageRegionalPrices';
 import PriceGenerationScatter from '@/components/dashboard/plots/PriceGenerationScatter';
 import DateNavigation from '@/components/dashboard/DateNavigation';
-import type { HistoricalData } from '@/types/HistoricalData';
+import type { HistoricalColumnarData, EnergyDataColumn } from '@/types/HistoricalData';
 
 // I obviously know that is not a good practice. But this is not aim to be deployed
 const API_URL = 'http://127.0.0.1:7777'
@@ -59,21 +59,37 @@ const TimeSeriesDashboard = () => {
   };
   
   // Build API URL with date parameters - only make the call if we have date info
-  const apiUrl = currentDate ? `${API_URL}/api/v1/historical?end_date=${formatDateForAPI(currentDate)}&days=${daysToShow}` : null;
+  // The columnar format sends only the values, a fraction of the bytes of one object per hour
+  const apiUrl = currentDate ? `${API_URL}/api/v1/historical?end_date=${formatDateForAPI(currentDate)}&days=${daysToShow}&format=columnar` : null;
   
-  const { data: historicalData, loading: historicalLoading, error } = useFetch<HistoricalData>(apiUrl);
+  const { data: historicalData, loading: historicalLoading, error } = useFetch<HistoricalColumnarData>(apiUrl);
   
   const loading = isLoadingLatestDate || historicalLoading;
   
   const processedData = useMemo(() => {
     if (!historicalData?.data) return [];
     
-    return historicalData.data.map(item => ({
-      ...item,
-      date: new Date(item.datetime).toLocaleDateString(),
-      day: new Date(item.datetime).getDate(),
-      fullDate: new Date(item.datetime)
-    }));
+    const { data, count, start, step, timestamps } = historicalData;
+    const columns = Object.keys(data) as EnergyDataColumn[];
+    const startMs = start ? Date.parse(start) : 0;
+    const records = [];
+    for (let i = 0; i < count; i++) {
+      // Hours missing from the table are all null on the grid, the charts never got them
+      if (columns.every(column => data[column]![i] === null)) continue;
+      
+      const fullDate = timestamps ? new Date(timestamps[i]) : new Date(startMs + i * step! * 1000);
+      const item: Record<string, string | number | null> = { datetime: fullDate.toISOString() };
+      columns.forEach(column => {
+        item[column] = data[column]![i];
+      });
+      records.push({
+        ...item,
+        date: fullDate.toLocaleDateString(),
+        day: fullDate.getDate(),
+        fullDate
+      });
+    }
+    return records;
   }, [historicalData]);
 
   const goToPreviousWeek = () => {
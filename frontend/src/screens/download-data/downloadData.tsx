@@ -6,7 +6,7 @@ import EmptyState from "@/components/download/EmptyState";
 import ErrorDisplay from "@/components/download/ErrorDisplay";
 import ESIOSInfo from "@/components/download/ESIOSInfo";
 import MergeResults from "@/components/download/MergeResults";
-import type { DownloadResponse } from "@/types/DownloadData";
+import type { DownloadJob, DownloadResponse } from "@/types/DownloadData";
 import type { MergeResponse } from "@/types/MergeData";
 import { useState } from "react";
 
@@ -17,11 +17,13 @@ const DownloadData = () => {
   const [isDownloading, setIsDownloading] = useState(false);
   const [isMerging, setIsMerging] = useState(false);
   const [downloadResults, setDownloadResults] = useState<DownloadResponse | null>(null);
+  const [downloadJob, setDownloadJob] = useState<DownloadJob | null>(null);
   const [mergeResults, setMergeResults] = useState<MergeResponse | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [esiosToken, setEsiosToken] = useState('');
   const [downloadIndicators, setDownloadIndicators] = useState(false);
   const [yearsBack, setYearsBack] = useState(5);
+  const [syncOnly, setSyncOnly] = useState(true);
   const [skipToMerge, setSkipToMerge] = useState(false);
 
   const handleDownloadData = async () => {
@@ -33,6 +35,7 @@ const DownloadData = () => {
     setIsDownloading(true);
     setError(null);
     setDownloadResults(null);
+    setDownloadJob(null);
     setMergeResults(null);
 
     try {
@@ -44,7 +47,8 @@ const DownloadData = () => {
         body: JSON.stringify({
           esios_token: esiosToken,
           download_indicators: downloadIndicators,
-          years_back: yearsBack
+          years_back: yearsBack,
+          sync: syncOnly
         }),
       });
 
@@ -53,7 +57,24 @@ const DownloadData = () => {
         throw new Error(errorData.error || 'Error en la descarga de datos');
       }
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // The backend queues the download and answers 202 with a job to poll
+      if (response.status === 202) {
+        let job: DownloadJob;
+        do {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          const jobResponse = await fetch(`${API_URL}/api/v1/data/download/${data.job_id}/`);
+          job = await jobResponse.json();
+          setDownloadJob(job);
+        } while (job.status === 'queued' || job.status === 'running');
+
+        if (job.status === 'failed' || !job.result) {
+          throw new Error(job.error || 'Error en la descarga de datos');
+        }
+        data = job.result;
+      }
+
       setDownloadResults(data);
       
       // Here I need to wait a bit so the fetch is fully processed and the 
@@ -164,10 +185,43 @@ const DownloadData = () => {
           setYearsBack={setYearsBack}
           downloadIndicators={downloadIndicators}
           setDownloadIndicators={setDownloadIndicators}
+          syncOnly={syncOnly}
+          setSyncOnly={setSyncOnly}
           isDownloading={isDownloading}
           onDownload={handleDownloadData}
         />
 
+        {isDownloading && downloadJob && (
+          <div className="bg-white rounded-lg shadow-sm p-6 mb-6">
+            <div className="flex justify-between text-sm text-gray-700 mb-2">
+              <span>
+                {downloadJob.status === 'queued'
+                  ? 'En cola...'
+                  : `${downloadJob.progress.done_months ?? 0} de ${downloadJob.progress.total_months ?? 0} meses descargados`}
+              </span>
+              <span>
+                {((downloadJob.progress.bytes ?? 0) / 1024 / 1024).toFixed(1)} MB
+                {downloadJob.progress.eta_seconds != null && ` · ${Math.ceil(downloadJob.progress.eta_seconds)} s restantes`}
+              </span>
+            </div>
+            <div className="w-full bg-gray-200 rounded-full h-2">
+              <div
+                className="bg-blue-600 h-2 rounded-full transition-all duration-500"
+                style={{
+                  width: `${downloadJob.progress.total_months
+                    ? Math.round(100 * (downloadJob.progress.done_months ?? 0) / downloadJob.progress.total_months)
+                    : 0}%`
+                }}
+              ></div>
+            </div>
+            {(downloadJob.progress.failed_months ?? 0) > 0 && (
+              <p className="text-xs text-red-600 mt-2">
+                {downloadJob.progress.failed_months} meses con errores
+              </p>
+            )}
+          </div>
+        )}
+
         <DataCategories />
 
         {error && <ErrorDisplay error={error} />}
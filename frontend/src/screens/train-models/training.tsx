@@ -1,4 +1,4 @@
-import type { TrainingResponse } from '@/types/TrainingData';
+import type { TrainingJob, TrainingResponse } from '@/types/TrainingData';
 import { useState } from 'react';
 
 // I obviously know that is not a good practice. But this is not aim to be deployed
@@ -9,6 +9,7 @@ const TrainModels = () => {
   const [trainingResults, setTrainingResults] = useState<TrainingResponse | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [populateDatabase, setPopulateDatabase] = useState(false);
+  const [trainingJob, setTrainingJob] = useState<TrainingJob | null>(null);
 
   const modelDescriptions = [
     { name: 'linear', label: 'Modelo Lineal', description: 'Regresión lineal simple para capturar relaciones básicas'},
@@ -21,6 +22,7 @@ const TrainModels = () => {
     setIsTraining(true);
     setError(null);
     setTrainingResults(null);
+    setTrainingJob(null);
 
     try {
       const response = await fetch(`${API_URL}/api/v1/train/`, {
@@ -38,7 +40,24 @@ const TrainModels = () => {
         throw new Error(errorData.error || 'Error en el entrenamiento');
       }
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // The backend queues the training and answers 202 with a job to poll
+      if (response.status === 202) {
+        let job: TrainingJob;
+        do {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          const jobResponse = await fetch(`${API_URL}/api/v1/train/${data.job_id}/`);
+          job = await jobResponse.json();
+          setTrainingJob(job);
+        } while (job.status === 'queued' || job.status === 'running');
+
+        if (job.status === 'failed' || !job.result) {
+          throw new Error(job.error || 'Error en el entrenamiento');
+        }
+        data = job.result;
+      }
+
       setTrainingResults(data);
       
       // Here I need to wait a bit so the fetch is fully processed and the 
@@ -141,6 +160,13 @@ const TrainModels = () => {
                   <h4 className="font-medium text-gray-800">{model.label}</h4>
                 </div>
                 <p className="text-sm text-gray-600">{model.description}</p>
+                {isTraining && trainingJob?.progress.models?.[model.name] && (
+                  <p className="text-xs text-blue-700 mt-2">
+                    {trainingJob.progress.models[model.name].status === 'finished'
+                      ? 'Entrenado'
+                      : `Época ${trainingJob.progress.models[model.name].epoch ?? 0} de ${trainingJob.progress.models[model.name].max_epochs ?? '-'}`}
+                  </p>
+                )}
               </div>
             ))}
           </div>
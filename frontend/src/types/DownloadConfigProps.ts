@@ -5,6 +5,8 @@ export interface DownloadConfigProps {
   setYearsBack: (years: number) => void;
   downloadIndicators: boolean;
   setDownloadIndicators: (download: boolean) => void;
+  syncOnly: boolean;
+  setSyncOnly: (sync: boolean) => void;
   isDownloading: boolean;
   onDownload: () => void;
 }
@@ -1,10 +1,39 @@
 export interface DownloadResponse {
   message: string;
   data_directory: string;
+  mode?: 'full' | 'sync';
   downloaded_files: string[];
+  fetched_months?: number;
+  skipped_months?: number;
   errors: string[];
 }
 
+export interface DownloadIndicatorProgress {
+  category: string;
+  total: number;
+  done: number;
+  failed: number;
+  skipped: number;
+  months: { [month: string]: 'pending' | 'done' | 'failed' };
+}
+
+export interface DownloadJob {
+  id: number;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  progress: {
+    stage?: string | null;
+    total_months?: number;
+    done_months?: number;
+    failed_months?: number;
+    skipped_months?: number;
+    bytes?: number;
+    eta_seconds?: number | null;
+    indicators?: { [indicatorId: string]: DownloadIndicatorProgress };
+  };
+  result: DownloadResponse | null;
+  error: string | null;
+}
+
 export interface DownloadResultsProps {
   downloadResults: DownloadResponse;
   isMerging: boolean;
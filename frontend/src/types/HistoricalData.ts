@@ -5,6 +5,18 @@ export interface HistoricalData {
   time_range: TimeRange;
 }
 
+// format=columnar: one array per column over start + i * step seconds,
+// or over timestamps when the rows are not hourly. null for missing hours
+export interface HistoricalColumnarData {
+  start: string | null; // ISO 8601
+  step: number | null;  // seconds
+  timestamps?: string[];
+  data: Partial<Record<EnergyDataColumn, (number | null)[]>>;
+  columns: EnergyDataColumn[];
+  count: number;
+  time_range: TimeRange;
+}
+
 interface HistoricalDataRecord {
   datetime: string; // ISO 8601 
   daily_spot_market_600_España: number;
@@ -32,7 +44,7 @@ interface TimeRange {
   end: string;   // ISO 8601 
 }
 
-type EnergyDataColumn = 
+export type EnergyDataColumn = 
   | 'daily_spot_market_600_España'
   | 'daily_spot_market_600_Portugal'
   | 'scheduled_demand_365'
@@ -1,6 +1,7 @@
 export interface MergeResponse {
   message: string;
   output_file: string;
+  mode?: 'unchanged' | 'incremental' | 'full';
   processed_files_count: number;
   data_categories: string[];
   merged_rows: number;
@@ -9,6 +10,7 @@ export interface MergeResponse {
     start: string | null;
     end: string | null;
   };
+  timings_ms?: { [stage: string]: number };
   errors: string[] | null;
 }
 
@@ -12,3 +12,23 @@ export interface TrainingResponse {
   population_reason?: string;
 }
 
+
+export interface TrainingModelProgress {
+  status: 'pending' | 'training' | 'finished' | 'failed';
+  epoch?: number;
+  max_epochs?: number;
+  loss?: number;
+  val_loss?: number;
+  error?: string;
+}
+
+export interface TrainingJob {
+  id: number;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  progress: {
+    stage?: string | null;
+    models?: { [modelName: string]: TrainingModelProgress };
+  };
+  result: TrainingResponse | null;
+  error: string | null;
+}
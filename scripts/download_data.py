@@ -1,136 +1,62 @@
-import pandas as pd
-import requests
+import argparse
 import os
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-
 import sys
+from dotenv import load_dotenv
 
-import html
+# The download is the fetch stage of core.ingestion, shared with DownloadDataView
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.ingestion import EsiosFetcher, IngestionPipeline
+from core.utils.esios import DATA_TO_DOWNLOAD
 
 # from env import TOKEN_ESIOS
 
 load_dotenv()
 TOKEN_ESIOS = os.getenv("TOKEN_ESIOS")
 
-BASE_ENDPOINT = 'https://api.esios.ree.es/indicators'
-HEADERS = {'Accept': 'application/json; application/vnd.esios-api-v2+json',
-           'Content-Type': 'application/json',
-           'Host': 'api.esios.ree.es',
-           'Cookie': '',
-           'Authorization': f'Token token={TOKEN_ESIOS}',
-           'x-api-key': f'{TOKEN_ESIOS}',
-           'Cache-Control': 'no-cache',
-           'Pragma': 'no-cache'
-           }
-
 DATA_DIR = os.path.join("data")
 
-# The format of this dicc is: path -> [ids]
-# Price vars are the variables to predict
-DATA_TO_DOWNLOAD = {
-        "energy_generation/hydraulic" : [1, 36, 71],
-        "energy_generation/nuclear" : [4, 39, 74],
-        "energy_generation/wind" : [12],
-        "energy_generation/solar" : [14],
-        "energy_demand/peninsula_forecast": [460],
-        "energy_demand/scheduled_demand": [358, 365, 372],
-        "price/daily_spot_market": [600],
-        "price/average_demand_price": [573]
-        }
-
-def get_indicators() -> pd.DataFrame:
-    """Get all available indicators from the API."""
-    response = requests.get(BASE_ENDPOINT, headers=HEADERS).json()
-
-    return (pd
-            .json_normalize(data=response['indicators'], errors='ignore')
-            .assign(description = lambda df_: df_.apply(lambda df__: html.unescape(df__['description']
-                                                            .replace('<p>','')
-                                                            .replace('</p>','')
-                                                            .replace('<b>','')
-                                                            .replace('</b>',''))
-                                                        # Gotta add this cuz sometimes i was tryn to .replace a float var
-                                                        # I've just noticed that html.unescape() also expect only strings (solved too)
-                                                        if isinstance(df__['description'], str) else df__['description'],
-                                                  axis=1)
-                   ))
-           
-
-
-
-def get_data_by_id_month(indicator_id: int, year: int, month: int) -> pd.DataFrame:
-    """Get data for a specific indicator by ID for a given month."""
-    start_date = datetime(year, month, 1)
-    
-    # If it's the current year and month, use today as the end date
-    if year == datetime.today().year and month == datetime.today().month:
-        end_date = datetime.today()
-    else:
-        # Otherwise, use the last day of the month. We use the -1day cuz is the easiest way to
-        # know the last day of each mont dynamically
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1) - timedelta(days=1)
-
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
-
-    endpoint = (f"{BASE_ENDPOINT}/{indicator_id}?start_date={start_date_str}T00:00&end_date={end_date_str}T23:59&time_trunc=five_minutes")
-    response = requests.get(endpoint, headers=HEADERS).json()
-
-    return pd.json_normalize(data=response['indicator'], record_path='values', errors='ignore')
-
-
-def save_or_append_data(data: pd.DataFrame, file_path: str) -> None:
-    """Save or append DataFrame to CSV file."""
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    data.to_csv(file_path, index=False)
+OPTIONS = {
+    # Parallel requests and request rate of a download
+    'ESIOS_DOWNLOAD_WORKERS': int(os.getenv("ESIOS_DOWNLOAD_WORKERS", 6)),
+    'ESIOS_REQUESTS_PER_SECOND': float(os.getenv("ESIOS_REQUESTS_PER_SECOND", 5)),
+    # Days after its end a month is still downloaded again by --sync
+    'ESIOS_SYNC_SETTLE_DAYS': int(os.getenv("ESIOS_SYNC_SETTLE_DAYS", 7)),
+}
 
 
 def main() -> None:
     """Main function to orchestrate data downloading."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-    autoyes = "-y" in sys.argv
-    
-    if autoyes or input("Do you want to download and save the indicators? [y/N] ").lower() == 'y':
-        indicators = get_indicators()
-        file_path = os.path.join(DATA_DIR, "indicators.csv")
-        save_or_append_data(indicators, file_path)
- 
-    five_years_ago = datetime.today() - timedelta(days=5*365)
-    start_year = five_years_ago.year
-    current_year = datetime.today().year
-
+    parser = argparse.ArgumentParser(description='Download the ESIOS indicators into data/')
+    parser.add_argument('-y', dest='autoyes', action='store_true',
+                        help='Download the indicators list and every indicator without asking')
+    parser.add_argument('--sync', action='store_true',
+                        help='Only download the months missing from data/esios_manifest.json or still open')
+    parser.add_argument('--years-back', type=int, default=5,
+                        help='Number of years back to download (default 5)')
+    args = parser.parse_args()
+    autoyes = args.autoyes
+
+    download_indicators = autoyes or input("Do you want to download and save the indicators? [y/N] ").lower() == 'y'
+
+    # Ask first, then download every selected month concurrently
+    selected = {}
     for category, indicator_ids in DATA_TO_DOWNLOAD.items():
-        category_dir_name = os.path.join(DATA_DIR, category)
-        os.makedirs(category_dir_name, exist_ok=True)
         for indicator_id in indicator_ids:
             if autoyes or input(f"Do you want to download indicator {indicator_id} for {category}? [y/N] ").lower() == 'y':
-                for year in range(start_year, current_year + 1):
-                    yearly_data = []
-                    for month in range(1, 13):
-                        # Skip future months for the current year
-                        if year == current_year and month > datetime.today().month:
-                            break
-                        
-                        print(f"Downloading indicator {indicator_id} for {category} for {year}-{month:02d}...")
-                        try:
-                            monthly_data = get_data_by_id_month(indicator_id, year, month)
-                            
-                            # If data is not empty, add to yearly data
-                            if not monthly_data.empty:
-                                yearly_data.append(monthly_data)
-                        except Exception as e:
-                            print(f"Error downloading data for {year}-{month:02d}: {e}")
-                    
-                    # Combine monthly data for the year
-                    if yearly_data:
-                        combined_yearly_data = pd.concat(yearly_data, ignore_index=True)
-                        file_path_name = os.path.join(category_dir_name, f"{indicator_id}_{year}.csv")
-                        save_or_append_data(combined_yearly_data, file_path_name)
+                selected.setdefault(category, []).append(indicator_id)
+
+    fetcher = EsiosFetcher(DATA_DIR, OPTIONS, indicators=selected)
+    pipeline = IngestionPipeline(DATA_DIR, fetcher)
+    results = pipeline.run(['fetch'], token=TOKEN_ESIOS, download_indicators=download_indicators,
+                           years_back=args.years_back, sync=args.sync)
+
+    download = results['fetch']
+    for file_name in download['downloaded_files']:
+        print(f"Saved {file_name}")
+    for error in download['errors']:
+        print(error)
+    print(f"{download['fetched_months']} months downloaded, {download['skipped_months']} skipped "
+          f"({', '.join(f'{stage} {seconds:.1f}s' for stage, seconds in results['timings'].items())})")
 
 if __name__ == "__main__":
     main()
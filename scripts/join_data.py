@@ -1,74 +1,30 @@
 import os
-import pandas as pd
-from collections import defaultdict
+import sys
 
-DATA_DIR = "data"  
-SELECTED_GEO = {"Península", "España", "Portugal", "Baleares", "Canarias", "Ceuta", "Melilla"}
+# The merge is the resample and merge stages of core.ingestion, shared with MergeDataView
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.ingestion import IngestionPipeline
 
-def get_data_id(path):
-    parts = path.replace("\\", "/").split("/")
-    if len(parts) < 2:
-        return None
-    category = parts[-2]
-    filename = os.path.splitext(parts[-1])[0]  
-    sensor_id = filename.split("_")[0] 
-    return f"{category}_{sensor_id}"
+DATA_DIR = "data"
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", min(4, os.cpu_count() or 1)))
 
 
 def main():
-    data = defaultdict(list)
-
-    for root, _, files in os.walk(DATA_DIR):
-        for file in files:
-            path = os.path.join(root, file)
-            if not file.endswith(".csv") or os.path.dirname(path) == DATA_DIR:
-                continue
-
-            data_id = get_data_id(path)
-
-            try:
-                df = pd.read_csv(path)
-                df['datetime_utc'] = pd.to_datetime(df['datetime_utc'], utc=True)
-
-                # apply the filter here to keep the full dataset in case I need to adjust my approach later.
-                df = df[df['datetime_utc'].dt.minute == 0]                  
-                df = df[df['geo_name'].isin(SELECTED_GEO)]
-
-                unique_geos = df['geo_name'].nunique()
-                if unique_geos > 1:
-                    pivot_df = df.pivot_table(index="datetime_utc",
-                                              columns="geo_name",
-                                              values="value",
-                                              aggfunc="first")
-                    pivot_df = pivot_df.rename(columns=lambda g: f"{data_id}_{g}")
-                    pivot_df = pivot_df.reset_index()
-                    data[data_id].append(pivot_df)
-                else:
-                    df = df[['datetime_utc', 'value']]
-                    data[data_id].append(df)
-                
-            except Exception as e:
-                print(f"Error leyendo {path}: {e}")
-
-    all_dfs = []
-
-    for data_id, dfs in data.items():
-        combined = pd.concat(dfs)
-        combined = combined.sort_values("datetime_utc").drop_duplicates("datetime_utc")
-        combined.rename(columns={'value': data_id}, inplace=True)
-        all_dfs.append(combined)
-
-    merged_df = None
-    for df in all_dfs:
-        if merged_df is None:
-            merged_df = df
-        else:
-            merged_df = pd.merge(merged_df, df, on="datetime_utc", how="outer")
-
-    # merged_df.sort_values("datetime", inplace=True)
-    file_name = os.path.join(DATA_DIR, "merged_dataset.csv")
-    merged_df.to_csv(file_name, index=False)
-    print(f"File joined correctly on {file_name}")
+    # --full merges every file again instead of only the ones that changed
+    results = IngestionPipeline(DATA_DIR).run(['merge'], workers=MERGE_WORKERS, full="--full" in sys.argv)
+    merge = results['merge']
+
+    for error in merge['errors']:
+        print(error)
+    if merge['merged'] is None or merge['merged'].empty:
+        print("No data to join")
+        return
+
+    print(f"File joined correctly on {merge['output_file']} ({merge['mode']}, "
+          f"{len(merge['processed_files'])} files read)")
+    if merge['binary_file']:
+        print(f"Binary copy written on {merge['binary_file']}")
+    print(', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in results['timings'].items()))
 
 if __name__ == "__main__":
     main()
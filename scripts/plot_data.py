@@ -1,10 +1,15 @@
 import math
-import pandas as pd
+import os
+import sys
 import matplotlib
 matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 import argparse
 
+# Reads the binary copy of the dataset written by join_data.py when it's there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.utils.columnar_dataset import read_dataset
+
 def plot_merged_data(file_path='data/merged_dataset.csv', year=None, month=None):
     """
     Plots data from the merged dataset CSV file where all data is organized in columns.
@@ -41,7 +46,7 @@ def plot_merged_data(file_path='data/merged_dataset.csv', year=None, month=None)
     FEATURES = sorted(set(COLUMN_FEATURES.values()))
     
     try:
-        df = pd.read_csv(file_path, parse_dates=['datetime_utc'])
+        df = read_dataset(file_path)
         df.set_index('datetime_utc', inplace=True)
         
         if year is not None and month is not None:
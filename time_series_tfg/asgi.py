@@ -11,6 +11,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from core.apps import mark_serving_process
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'time_series_tfg.settings')
+# The ASGI server serves requests, so it warms up the models (see core.apps.serves_requests)
+mark_serving_process()
 
 application = get_asgi_application()
@@ -83,6 +83,77 @@ TIME_SERIES_CSV_PATH = os.path.join(BASE_DIR, 'data', 'merged_dataset.csv')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Inference backend for /predict/: 'keras' loads the .h5 models with TensorFlow, 'tflite'
+# serves the .tflite exports with LiteRT (ai-edge-litert) and never imports TensorFlow,
+# 'numpy' runs linear/dense from their .h5 weights with NumPy and TensorFlow only for conv/lstm
+PREDICTION_BACKEND = os.getenv('PREDICTION_BACKEND', 'keras')
+# Seconds before a failed model load is tried again, instead of on every request
+MODEL_LOAD_RETRY_SECONDS = 30
+
+# Run a dummy prediction through every model at startup so the first request doesn't pay
+# for graph tracing. /health/ready/ answers 503 until it finishes.
+PREDICTION_WARMUP = os.getenv('PREDICTION_WARMUP', 'false').lower() == 'true'
+# Only processes that serve requests warm up: WSGI/ASGI servers (wsgi.py/asgi.py call
+# core.apps.mark_serving_process) and these manage.py commands. migrate, shell, the workers and the pipeline commands don't
+PREDICTION_WARMUP_COMMANDS = ['runserver']
+# Input widths traced during warm-up, each one costs a trace per model. None means the
+# API default and the frontend's (24 and 168); other widths are traced on their first request
+PREDICTION_WARMUP_INPUT_HOURS = None
+
+# Concurrent predictions for the same model and input width are collected for up to
+# PREDICTION_BATCH_WINDOW_MS and run as one batch. A window of 0 disables batching.
+PREDICTION_BATCH_WINDOW_MS = 5
+PREDICTION_MAX_BATCH_SIZE = 32
+
+# POST /train/ queues a TrainingJob that `manage.py training_worker` runs. With
+# TRAINING_JOBS_EAGER the request trains the models itself and answers with the result.
+TRAINING_JOBS_EAGER = os.getenv('TRAINING_JOBS_EAGER', 'false').lower() == 'true'
+# A running job without a heartbeat for this long is marked as failed. The worker
+# writes one every TRAINING_JOB_HEARTBEAT_SECONDS while the job runs, besides progress
+TRAINING_JOB_STALE_SECONDS = 600
+TRAINING_JOB_HEARTBEAT_SECONDS = 30
+
+# Train the four model families concurrently in this many processes (1 trains them one
+# after another). Each process gets TRAINING_THREADS_PER_WORKER TensorFlow threads,
+# None splits the CPU cores evenly between them.
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '1'))
+TRAINING_THREADS_PER_WORKER = None
+
+# Rows per INSERT when loading the merged CSV into TimeSeriesData
+TIME_SERIES_LOAD_BATCH_SIZE = 1000
+
+# In-process columnar copy of TimeSeriesData for /predict/ and /historical/ range reads,
+# and how often (seconds) each process checks whether the loader changed the table
+TIME_SERIES_CACHE = True
+TIME_SERIES_CACHE_CHECK_SECONDS = 1.0
+
+# GET /historical/ with stream=true is streamed from a database cursor, HISTORICAL_STREAM_CHUNK_SIZE
+# rows at a time, instead of built in memory. Set a number of days to also stream every range
+# that long (None: only on request)
+HISTORICAL_STREAM_MIN_DAYS = None
+HISTORICAL_STREAM_CHUNK_SIZE = 2000
+
+# ESIOS downloads: parallel requests, request rate shared by all of them and
+# retries of 429/5xx answers. The endpoint can point to a local stub server
+ESIOS_BASE_ENDPOINT = 'https://api.esios.ree.es/indicators'
+ESIOS_DOWNLOAD_WORKERS = 6
+ESIOS_REQUESTS_PER_SECOND = 5.0
+ESIOS_MAX_RETRIES = 5
+# Downloaded months wait in compact chunk files here until their year is written, None uses the temp dir
+ESIOS_CHUNK_DIR = None
+
+# Days after its end a month is still downloaded again by a sync, ESIOS revises recent values
+ESIOS_SYNC_SETTLE_DAYS = 7
+
+# Processes that parse and resample the downloaded CSVs on POST /data/merge/ (1 reads them in the request)
+MERGE_WORKERS = int(os.getenv('MERGE_WORKERS', min(4, os.cpu_count() or 1)))
+
+# POST /data/download/ queues a DownloadJob that `manage.py download_worker` runs. With
+# DOWNLOAD_JOBS_EAGER the request downloads the data itself and answers with the result.
+DOWNLOAD_JOBS_EAGER = os.getenv('DOWNLOAD_JOBS_EAGER', 'false').lower() == 'true'
+# A running download without a progress update for this long is marked as failed
+DOWNLOAD_JOB_STALE_SECONDS = 300
+
 # Add swagger API docs
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',